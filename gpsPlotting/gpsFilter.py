@@ -0,0 +1,390 @@
+import sys
+import csv
+import argparse
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import gpsLoader
+import routeSimplification
+import trackMetrics
+
+
+"""
+ASPire GPS filter
+
+DESCRIPTION :
+Removes the GPS fixes jumping away from the route before they reach the map, and can smooth the positions that are left
+    - Speed limit : a point is removed when the speeds needed to reach it and to leave it are both above maxSpeed (single sample spike)
+    - Hampel filter : a point is removed when its latitude or longitude is further from the median of the hampelWindow points on each side
+      than hampelThreshold standard deviations (estimated from the median absolute deviation) and than minDeviation metres
+    - Kalman filter (optional) : positions are smoothed by a constant velocity Kalman filter, restarted after every timeskip
+Points are handed over chunk by chunk (see gpsLoader.iterGPSChunks) : only the last few points of a chunk are held until the next one, so memory stays bounded
+Removed points only depend on their neighbours in the original route, so filtering chunks or the whole route gives the same points
+The Hampel filter's spread is a median of deviations that are each taken from a median, so a point depends on 2 * hampelWindow positions on each side
+Rows without a position are never removed nor used as neighbours
+Used by gpsPlotting.py, and on its own to filter a CSV file created by logExtraction :
+    python3 gpsFilter.py <Input CSV> <Output CSV> [--max-speed <knots>] [--hampel <points>] [--hampel-threshold <threshold>] [--kalman]
+"""
+
+defaultHampelThreshold = 3.0
+defaultMinDeviation = 10.0 #Metres, GPS noise of a still boat is never an outlier
+madToStandardDeviation = 1.4826 #Median absolute deviation of normally distributed values to their standard deviation
+defaultMeasurementNoise = 5.0 #Metres, standard deviation of a GPS fix
+defaultAccelerationNoise = 0.5 #Metres per second squared, standard deviation of the boat's acceleration
+defaultResetSeconds = 30 #The Kalman filter restarts after a timeskip of more than this many seconds
+
+
+"""
+FUNCTION : rollingMedian
+Returns the median of each value and its halfWindow neighbours on each side, fewer at both ends of the array
+IN
+    :values - numpy array of float
+    :halfWindow - int
+OUT
+    :medians - numpy array of float
+"""
+def rollingMedian(values, halfWindow):
+
+    if not len(values):
+        return values.copy()
+
+    #Only the ends need nanmedian, which is twice slower
+    padded = np.pad(values, halfWindow, constant_values=np.nan)
+    windows = sliding_window_view(padded, 2 * halfWindow + 1)
+    medians = np.empty(len(values))
+    medians[halfWindow:len(values) - halfWindow] = np.median(windows[halfWindow:len(values) - halfWindow], axis=1)
+    ends = np.r_[0:min(halfWindow, len(values)), max(len(values) - halfWindow, halfWindow):len(values)]
+    medians[ends] = np.nanmedian(windows[ends], axis=1)
+
+    return medians
+
+"""
+FUNCTION : hampelOutliers
+Returns which values are further from their rolling median than threshold standard deviations of their window, and than minDeviation
+IN
+    :values - numpy array of float, metres
+    :halfWindow - int
+    :threshold - float
+    :minDeviation - float, metres
+OUT
+    :outliers - numpy array of bool
+"""
+def hampelOutliers(values, halfWindow, threshold, minDeviation):
+
+    medians = rollingMedian(values, halfWindow)
+    deviations = np.abs(values - medians)
+    spread = madToStandardDeviation * rollingMedian(deviations, halfWindow)
+
+    return deviations > np.maximum(threshold * spread, minDeviation)
+
+"""
+FUNCTION : spikeOutliers
+Returns which points are both reached and left faster than maxSpeed, the first and last points only have one speed to check
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :timestamps - numpy array of datetime64
+    :maxSpeed - float, metres per second
+OUT
+    :outliers - numpy array of bool
+"""
+def spikeOutliers(lats, lons, timestamps, maxSpeed):
+
+    if len(lats) < 2:
+        return np.zeros(len(lats), dtype=bool)
+
+    #Points sharing the same time have no speed, they are never too fast
+    tooFast = np.nan_to_num(trackMetrics.speedOverGround(lats, lons, timestamps)) > maxSpeed
+
+    return np.r_[True, tooFast] & np.r_[tooFast, True]
+
+"""
+CLASS : GPSFilter
+Removes outliers from the points handed over by process(), chunk after chunk, finish() returns the last points
+Points are numpy structured arrays with at least t_timestamp (str or datetime64), latitude and longitude fields, other fields are carried along
+maxSpeed is in metres per second, None turns the speed limit off, hampelWindow of 0 turns the Hampel filter off
+"""
+class GPSFilter:
+
+    def __init__(self, maxSpeed=None, hampelWindow=0, hampelThreshold=defaultHampelThreshold, minDeviation=defaultMinDeviation, kalman=False,
+                 measurementNoise=defaultMeasurementNoise, accelerationNoise=defaultAccelerationNoise, resetSeconds=defaultResetSeconds):
+
+        self.maxSpeed = maxSpeed
+        self.hampelWindow = hampelWindow
+        self.hampelThreshold = hampelThreshold
+        self.minDeviation = minDeviation
+        self.kalman = kalman
+        self.measurementNoise = measurementNoise
+        self.accelerationNoise = accelerationNoise
+        self.resetSeconds = resetSeconds
+
+        #Number of positioned neighbours on each side needed to decide if a point is kept
+        self.halo = max(1 if maxSpeed is not None else 0, 2 * hampelWindow)
+        self.pending = None #Points not decided yet, after self.context points already decided but still needed as neighbours
+        self.context = 0
+        self.origin = None #Latitude and longitude of the local plane, first position received
+        self.kalmanState = None
+        self.removed = 0
+
+    #Returns the points of the previous chunks and of chunk that can be decided, without the outliers
+    def process(self, chunk):
+
+        buffer = chunk if self.pending is None else np.concatenate((self.pending, chunk))
+        #Points followed by fewer than halo positions wait for the next chunk
+        positioned = getPositioned(buffer)
+        if not self.halo:
+            decidedEnd = len(buffer)
+        else:
+            decidedEnd = positioned[-self.halo] if len(positioned) >= self.halo else 0
+        if decidedEnd <= self.context:
+            self.pending = buffer
+            return buffer[:0]
+
+        return self.decide(buffer, decidedEnd, False)
+
+    #Returns the points still held, the route having ended
+    def finish(self):
+
+        if self.pending is None:
+            return None
+
+        return self.decide(self.pending, len(self.pending), True)
+
+    #Yields the points of each chunk without the outliers
+    def filterChunks(self, chunks):
+
+        for chunk in chunks:
+            points = self.process(chunk)
+            if len(points):
+                yield points
+        points = self.finish()
+        if points is not None and len(points):
+            yield points
+
+    def decide(self, buffer, decidedEnd, routeEnd):
+
+        outliers = self.getOutliers(buffer)
+        kept = buffer[self.context:decidedEnd][~outliers[self.context:decidedEnd]]
+        self.removed += (decidedEnd - self.context) - len(kept)
+        if self.kalman:
+            kept = self.smooth(kept)
+
+        #The last halo positions decided stay as neighbours of the next chunk's points, copied so the buffer can be freed
+        if routeEnd:
+            self.pending, self.context = None, 0
+        else:
+            positionedBefore = getPositioned(buffer[:decidedEnd])
+            if not self.halo:
+                newStart = decidedEnd
+            else:
+                newStart = positionedBefore[-self.halo] if len(positionedBefore) >= self.halo else 0
+            self.pending, self.context = buffer[newStart:].copy(), decidedEnd - newStart
+
+        return kept
+
+    def getOutliers(self, buffer):
+
+        outliers = np.zeros(len(buffer), dtype=bool)
+        positioned = getPositioned(buffer)
+        if not len(positioned):
+            return outliers
+
+        lats, lons = buffer['latitude'][positioned], buffer['longitude'][positioned]
+        if self.origin is None:
+            self.origin = (float(lats[0]), float(lons[0]))
+
+        if self.maxSpeed is not None:
+            outliers[positioned] |= spikeOutliers(lats, lons, getTimestamps(buffer[positioned]), self.maxSpeed)
+        if self.hampelWindow:
+            x, y = routeSimplification.toLocalPlane(lats, lons, *self.origin)
+            outliers[positioned] |= hampelOutliers(x, self.hampelWindow, self.hampelThreshold, self.minDeviation)
+            outliers[positioned] |= hampelOutliers(y, self.hampelWindow, self.hampelThreshold, self.minDeviation)
+
+        return outliers
+
+    #Returns a copy of points with positions smoothed by a constant velocity Kalman filter, its state goes on from one chunk to the next
+    def smooth(self, points):
+
+        points = points.copy()
+        positioned = getPositioned(points)
+        if not len(positioned):
+            return points
+        if self.origin is None:
+            self.origin = (float(points['latitude'][positioned[0]]), float(points['longitude'][positioned[0]]))
+
+        x, y = routeSimplification.toLocalPlane(points['latitude'][positioned], points['longitude'][positioned], *self.origin)
+        seconds = (getTimestamps(points[positioned]) - np.datetime64(0, 'ms')) / np.timedelta64(1, 's')
+
+        #Both axes share the same covariance, which doesn't depend on the positions, only their states are kept apart
+        r = self.measurementNoise ** 2
+        q = self.accelerationNoise ** 2
+        smoothedX, smoothedY = np.empty(len(x)), np.empty(len(y))
+        state = self.kalmanState
+        for n, (t, zx, zy) in enumerate(zip(seconds.tolist(), x.tolist(), y.tolist())):
+            if state is None or not 0 <= t - state[0] <= self.resetSeconds:
+                px, vx, py, vy, p00, p01, p11 = zx, 0.0, zy, 0.0, r, 0.0, 100.0
+            else:
+                dt = t - state[0]
+                px, vx, py, vy, p00, p01, p11 = state[1:]
+                #Prediction
+                px += vx * dt
+                py += vy * dt
+                p00 += 2 * dt * p01 + dt * dt * p11 + q * dt ** 4 / 4
+                p01 += dt * p11 + q * dt ** 3 / 2
+                p11 += q * dt * dt
+                #Update with the measured position
+                k0, k1 = p00 / (p00 + r), p01 / (p00 + r)
+                px, vx = px + k0 * (zx - px), vx + k1 * (zx - px)
+                py, vy = py + k0 * (zy - py), vy + k1 * (zy - py)
+                p00, p01, p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+            state = (t, px, vx, py, vy, p00, p01, p11)
+            smoothedX[n], smoothedY[n] = px, py
+        self.kalmanState = state
+
+        points['latitude'][positioned], points['longitude'][positioned] = routeSimplification.fromLocalPlane(smoothedX, smoothedY, *self.origin)
+
+        return points
+
+"""
+FUNCTION : getPositioned
+Returns the indexes of the points with a latitude and a longitude
+IN
+    :points - numpy structured array
+OUT
+    :positioned - numpy array of int
+"""
+def getPositioned(points):
+
+    return np.flatnonzero(np.isfinite(points['latitude']) & np.isfinite(points['longitude']))
+
+"""
+FUNCTION : getTimestamps
+Returns the t_timestamp field of points as datetime64[ms], parsing it if it is text
+IN
+    :points - numpy structured array
+OUT
+    :timestamps - numpy array of datetime64[ms]
+"""
+def getTimestamps(points):
+
+    if np.issubdtype(points['t_timestamp'].dtype, np.datetime64):
+        return points['t_timestamp'].astype('datetime64[ms]')
+
+    return gpsLoader.parseTimestamps(points['t_timestamp'])
+
+"""
+FUNCTION : filterCSV
+Filters a CSV file created by logExtraction chunkSize rows at a time, all its columns are kept
+With the Kalman filter, latitude and longitude of the written rows are the smoothed ones
+IN
+    :inputCSV - str
+    :outputCSV - str
+    :gpsFilter - GPSFilter
+    :chunkSize - int
+OUT
+    :rowsWritten - int
+"""
+def filterCSV(inputCSV, outputCSV, gpsFilter, chunkSize=gpsLoader.chunkSize):
+
+    pointDtype = np.dtype([('t_timestamp', 'U32'), ('latitude', 'f8'), ('longitude', 'f8'), ('row', object)])
+    rowsWritten = 0
+
+    with open(inputCSV, 'r', newline='') as inputFile, open(outputCSV, 'w') as outputFile:
+
+        reader = csv.reader(inputFile)
+        writer = csv.writer(outputFile, lineterminator='\n')
+        header = next(reader, [])
+        try:
+            timeCol, latCol, lonCol = [header.index(column) for column in ('t_timestamp', 'latitude', 'longitude')]
+        except ValueError:
+            raise ValueError('Wrong columns or column missing in CSV, t_timestamp, latitude and longitude are needed!')
+        writer.writerow(header)
+
+        def toFloat(value):
+            return float(value) if value else np.nan
+
+        def iterChunks():
+            while True:
+                rows = list(islice(reader, chunkSize))
+                if not rows:
+                    break
+                try:
+                    yield np.array([(row[timeCol], toFloat(row[latCol]), toFloat(row[lonCol]), row) for row in rows], dtype=pointDtype)
+                except (IndexError, ValueError) as e:
+                    raise ValueError('Invalid value in CSV : {0}'.format(e))
+
+        for points in gpsFilter.filterChunks(iterChunks()):
+            rows = points['row'].tolist()
+            if gpsFilter.kalman:
+                for row, lat, lon in zip(rows, points['latitude'].tolist(), points['longitude'].tolist()):
+                    if np.isfinite(lat) and np.isfinite(lon):
+                        row[latCol], row[lonCol] = '{0:.8f}'.format(lat), '{0:.8f}'.format(lon)
+            writer.writerows(rows)
+            rowsWritten += len(rows)
+
+    return rowsWritten
+
+"""
+FUNCTION : addFilterArguments
+Adds the filter options to an argparse parser, shared by this script and gpsPlotting.py
+IN
+    :parser - argparse.ArgumentParser
+OUT
+"""
+def addFilterArguments(parser):
+
+    parser.add_argument('--max-speed', type=float, metavar='KNOTS',
+                        help='remove single points reached and left faster than this speed (GPS jumps)')
+    parser.add_argument('--hampel', type=int, default=0, metavar='POINTS',
+                        help='remove points far from the median of this many points on each side (Hampel filter), 0 (default) turns it off')
+    parser.add_argument('--hampel-threshold', type=float, default=defaultHampelThreshold, metavar='THRESHOLD',
+                        help='standard deviations from the median above which the Hampel filter removes a point (default : {0})'.format(defaultHampelThreshold))
+    parser.add_argument('--kalman', action='store_true',
+                        help='smooth the positions with a constant velocity Kalman filter')
+
+"""
+FUNCTION : createFilter
+Creates the GPSFilter asked for by the arguments added by addFilterArguments(), None if no filter is asked for
+Exits on invalid values
+IN
+    :args - argparse.Namespace
+OUT
+    :gpsFilter - GPSFilter or None
+"""
+def createFilter(args):
+
+    if args.max_speed is not None and args.max_speed <= 0:
+        sys.exit('Invalid maximum speed')
+    if args.hampel < 0 or args.hampel_threshold <= 0:
+        sys.exit('Invalid Hampel filter window or threshold')
+    if args.max_speed is None and not args.hampel and not args.kalman:
+        return None
+
+    maxSpeed = None if args.max_speed is None else args.max_speed / trackMetrics.knotsPerMetrePerSecond
+
+    return GPSFilter(maxSpeed, args.hampel, args.hampel_threshold, kalman=args.kalman)
+
+
+#MAIN SCRIPT
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Removes GPS jumps from a CSV file created by logExtraction')
+    parser.add_argument('inputCSVFile', help='CSV file containing at least t_timestamp, latitude and longitude')
+    parser.add_argument('outputCSVFile', help='filtered CSV file')
+    addFilterArguments(parser)
+    args = parser.parse_args()
+
+    if not Path(args.inputCSVFile).is_file():
+        sys.exit("Input CSV file doesn't exist or can't be found!")
+    gpsFilter = createFilter(args)
+    if gpsFilter is None:
+        sys.exit('No filter chosen, use --max-speed, --hampel and/or --kalman')
+
+    try:
+        rowsWritten = filterCSV(args.inputCSVFile, args.outputCSVFile, gpsFilter)
+    except ValueError as e:
+        sys.exit(str(e))
+    print('{0} rows written to {1}, {2} removed'.format(rowsWritten, args.outputCSVFile, gpsFilter.removed))
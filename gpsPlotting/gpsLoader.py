@@ -0,0 +1,363 @@
+import csv
+import sqlite3
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+
+"""
+ASPire GPS log loader
+
+DESCRIPTION :
+Loads the GPS CSV file created by logExtraction straight into typed numpy arrays
+Only the five columns needed to plot the route are parsed, any other column of the file is skipped by numpy's C parser
+Points seen by fewer than minSatThreshold satellites are removed with a boolean mask, as are rows with an empty or null (-2000) position
+The file is read chunkSize lines at a time and each chunk is cut down to the typed columns of its points before the next one is read,
+so memory only grows with the number of points kept, not with the size of the file or its other columns
+Chunks can go through a filter (see gpsFilter.py) before being put together, so GPS jumps are removed without loading the raw file at once
+The same points and the current mission's waypoints can be read straight from a test sail database (asr.db), without extracting CSV files first
+Used by gpsPlotting.py
+"""
+
+gpsColumns = ('t_timestamp', 'latitude', 'longitude', 'satellites_used', 'rc_on')
+gpsDtype = np.dtype([('t_timestamp', 'U32'), ('latitude', 'f8'), ('longitude', 'f8'), ('satellites_used', 'i8'), ('rc_on', 'f8')])
+textDtype = np.dtype([(column, 'U32') for column in gpsColumns]) #Fields as read from the CSV, before empty cells are handled
+
+chunkSize = 1000000 #Number of lines parsed at once
+
+gpsTable = 'dataLogs_gps' #Table of asr.db holding gpsColumns
+missionTable = 'current_Mission'
+missionColumns = ('latitude', 'longitude', 'radius')
+nullValue = -2000 #Value written by the logger when a sensor has no data
+
+
+"""
+FUNCTION : getGPSColumnNumbers
+Retrieves the column numbers of gpsColumns in the GPS CSV header, in the same order
+IN
+    :firstLine - iterable
+OUT
+    :columnNumbers - list of int
+"""
+def getGPSColumnNumbers(firstLine):
+
+    try:
+        columnNumbers = [firstLine.index(column) for column in gpsColumns]
+    except ValueError:
+        raise ValueError('Wrong columns or column missing in GPS CSV!')
+
+    return columnNumbers
+
+"""
+FUNCTION : parseTimestamps
+Converts t_timestamps (Format : 2018-06-28_07:34:55.850) to a numpy datetime64 array in one go
+IN
+    :times - numpy array of str
+OUT
+    :timestamps - numpy array of datetime64[ms]
+"""
+def parseTimestamps(times):
+
+    if not len(times):
+        return np.zeros(0, dtype='datetime64[ms]') #np.char.replace fails on empty arrays
+    try:
+        timestamps = np.char.replace(times, '_', 'T').astype('datetime64[ms]')
+    except ValueError:
+        raise ValueError('Invalid t_timestamp in GPS CSV!')
+
+    return timestamps
+
+"""
+FUNCTION : parseGPSLines
+Parses lines of the GPS CSV into typed points, only reading the columns at columnNumbers
+Rows with an empty t_timestamp, latitude, longitude or satellites_used are skipped : logExtraction leaves them empty when no GPS row was close enough in time
+An empty rc_on is read as 0 (RC OFF), as the database query does (see iterGPSRows)
+Lines are first parsed straight to numbers, only chunks holding empty cells are read again as text to handle them
+IN
+    :lines - list of str
+    :columnNumbers - list of int
+OUT
+    :points - numpy structured array with the fields of gpsDtype
+"""
+def parseGPSLines(lines, columnNumbers):
+
+    try:
+        return np.loadtxt(lines, dtype=gpsDtype, delimiter=',', usecols=columnNumbers, ndmin=1)
+    except ValueError:
+        pass
+
+    try:
+        fields = np.loadtxt(lines, dtype=textDtype, delimiter=',', usecols=columnNumbers, ndmin=1)
+        fields = fields[(fields['t_timestamp'] != '') & (fields['latitude'] != '') & (fields['longitude'] != '') & (fields['satellites_used'] != '')]
+        points = np.zeros(len(fields), dtype=gpsDtype)
+        points['t_timestamp'] = fields['t_timestamp']
+        points['latitude'] = fields['latitude'].astype('f8')
+        points['longitude'] = fields['longitude'].astype('f8')
+        points['satellites_used'] = fields['satellites_used'].astype('i8')
+        points['rc_on'] = np.where(fields['rc_on'] == '', '0', fields['rc_on']).astype('f8')
+    except ValueError as e:
+        raise ValueError('Invalid value in GPS CSV : {0}'.format(e))
+
+    return points
+
+"""
+FUNCTION : iterGPSChunks
+Reads the GPS CSV chunkSize lines at a time and yields, for each chunk, the points seen by at least minSatThreshold satellites
+Points holding null data (-2000) are removed too, as the database query does (see iterGPSRows)
+IN
+    :gpsCSV - str
+    :minSatThreshold - int
+    :chunkSize - int
+OUT
+    :chunk - numpy structured array with the fields of gpsDtype
+"""
+def iterGPSChunks(gpsCSV, minSatThreshold, chunkSize=chunkSize):
+
+    with open(gpsCSV, 'r', newline='') as csvFile:
+
+        firstLine = next(csv.reader([csvFile.readline()]), []) #Extract the header from the rest
+        columnNumbers = getGPSColumnNumbers(firstLine)
+
+        while True:
+            lines = list(islice(csvFile, chunkSize))
+            if not lines:
+                break
+            chunk = parseGPSLines(lines, columnNumbers)
+
+            yield chunk[(chunk['satellites_used'] >= minSatThreshold) & (chunk['latitude'] != nullValue) & (chunk['longitude'] != nullValue) & (chunk['rc_on'] != nullValue)]
+
+"""
+FUNCTION : toColumns
+Puts the chunks of points together as the arrays used for plotting, each chunk being cut down to them as soon as it arrives
+Timestamps are parsed chunk by chunk and times keep the width of the longest t_timestamp, the structured chunks can then be freed one after the other
+IN
+    :chunks - iterable of numpy structured arrays with the fields of gpsDtype
+OUT
+    :times - numpy array of str
+    :timestamps - numpy array of datetime64[ms]
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :rcStatus - numpy array of float
+"""
+def toColumns(chunks):
+
+    columns = [[], [], [], [], []]
+    for chunk in chunks:
+        times = chunk['t_timestamp']
+        width = max(int(np.char.str_len(times).max()), 1) if len(times) else 1
+        for column, values in zip(columns, (times.astype('U{0}'.format(width)), parseTimestamps(times), chunk['latitude'], chunk['longitude'], chunk['rc_on'])):
+            column.append(np.array(values)) #Copied, so nothing keeps the chunk alive
+
+    if not columns[0]:
+        return np.zeros(0, dtype='U1'), np.zeros(0, dtype='datetime64[ms]'), np.zeros(0), np.zeros(0), np.zeros(0)
+
+    return tuple(np.concatenate(column) for column in columns)
+
+"""
+FUNCTION : loadGPSCSV
+Loads all points of the GPS CSV seen by at least minSatThreshold satellites, chunk by chunk (see iterGPSChunks and toColumns)
+If given, pointFilter removes outliers chunk by chunk, it is an object with a filterChunks method such as gpsFilter.GPSFilter
+IN
+    :gpsCSV - str
+    :minSatThreshold - int
+    :chunkSize - int
+    :pointFilter - gpsFilter.GPSFilter or None
+OUT
+    :times - numpy array of str
+    :timestamps - numpy array of datetime64[ms]
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :rcStatus - numpy array of float
+"""
+def loadGPSCSV(gpsCSV, minSatThreshold, chunkSize=chunkSize, pointFilter=None):
+
+    chunks = iterGPSChunks(gpsCSV, minSatThreshold, chunkSize)
+    if pointFilter is not None:
+        chunks = pointFilter.filterChunks(chunks)
+
+    return toColumns(chunks)
+
+"""
+FUNCTION : isDatabase
+Checks if a file is an SQLite database, whatever its extension, by reading its header
+IN
+    :path - str
+OUT
+    :isDatabase - bool
+"""
+def isDatabase(path):
+
+    try:
+        with open(path, 'rb') as f:
+            return f.read(16) == b'SQLite format 3\x00'
+    except OSError:
+        return False
+
+"""
+FUNCTION : connectDatabase
+Opens the database read only, so a map can be made while the logger is still writing to it
+IN
+    :dbPath - str
+OUT
+    :conn - sqlite3 connection
+"""
+def connectDatabase(dbPath):
+
+    return sqlite3.connect(Path(dbPath).resolve().as_uri() + '?mode=ro', uri=True)
+
+"""
+FUNCTION : getTableColumns
+Returns the names of the columns of a table, raises ValueError if the table doesn't exist
+IN
+    :conn - sqlite3 connection
+    :table - str
+OUT
+    :columns - list of str
+"""
+def getTableColumns(conn, table):
+
+    columns = [column[1] for column in conn.execute('PRAGMA table_info({0})'.format(table))]
+    if not columns:
+        raise ValueError('No {0} table in database!'.format(table))
+
+    return columns
+
+"""
+FUNCTION : ensureTimestampIndex
+Makes sure the GPS table has an index on t_timestamp, so the points come out in time order without SQLite sorting the whole table
+Opens the database for writing, so it is only called when asked to (--create-indexes), never while the logger may be writing to it
+IN
+    :dbPath - str
+OUT
+    :indexed - bool, False if the index doesn't exist and couldn't be created (database read only or locked)
+"""
+def ensureTimestampIndex(dbPath):
+
+    try:
+        conn = sqlite3.connect(Path(dbPath).resolve().as_uri() + '?mode=rw', uri=True)
+    except sqlite3.OperationalError:
+        return False
+
+    try:
+        for index in conn.execute('PRAGMA index_list({0})'.format(gpsTable)).fetchall():
+            indexColumns = conn.execute('PRAGMA index_info({0})'.format(index[1])).fetchall()
+            if indexColumns and indexColumns[0][2] == 't_timestamp':
+                return True
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_{0}_t_timestamp ON {0}(t_timestamp)'.format(gpsTable))
+        conn.commit()
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+    return True
+
+"""
+FUNCTION : iterGPSRows
+Runs a single query on the GPS table of the database and yields its points chunkSize rows at a time, in time order
+SQLite only returns the points seen by at least minSatThreshold satellites with a valid position and RC status (no -2000), an empty rc_on is read as 0
+IN
+    :dbPath - str
+    :minSatThreshold - int
+    :chunkSize - int
+OUT
+    :chunk - numpy structured array with the fields of gpsDtype
+"""
+def iterGPSRows(dbPath, minSatThreshold, chunkSize=chunkSize):
+
+    conn = connectDatabase(dbPath)
+    try:
+        getGPSColumnNumbers(getTableColumns(conn, gpsTable))
+
+        #FORMAT OF THE QUERY :
+        #   SELECT t_timestamp,latitude,longitude,satellites_used,IFNULL(rc_on, 0) FROM dataLogs_gps
+        #       WHERE satellites_used >= 5 AND latitude IS NOT -2000 AND longitude IS NOT -2000 AND rc_on IS NOT -2000 AND t_timestamp IS NOT NULL
+        #       ORDER BY t_timestamp ASC, rowid ASC
+        c = conn.execute('SELECT t_timestamp,latitude,longitude,satellites_used,IFNULL(rc_on, 0) FROM ' + gpsTable +
+                         ' WHERE satellites_used >= ? AND latitude IS NOT ? AND longitude IS NOT ? AND rc_on IS NOT ? AND t_timestamp IS NOT NULL'
+                         ' ORDER BY t_timestamp ASC, rowid ASC', (minSatThreshold, nullValue, nullValue, nullValue))
+        while True:
+            rows = c.fetchmany(chunkSize)
+            if not rows:
+                break
+            try:
+                yield np.array(rows, dtype=gpsDtype)
+            except (TypeError, ValueError) as e:
+                raise ValueError('Invalid value in GPS table : {0}'.format(e))
+    finally:
+        conn.close()
+
+"""
+FUNCTION : removeConsecutiveDuplicates
+Yields the chunks without the points identical to the point just before them, the last point of a chunk being compared with the first of the next
+IN
+    :chunks - iterable of numpy structured arrays
+OUT
+    :chunk - numpy structured array
+"""
+def removeConsecutiveDuplicates(chunks):
+
+    previous = None
+    for chunk in chunks:
+        if len(chunk):
+            first = np.ones(len(chunk), dtype=bool)
+            first[1:] = chunk[1:] != chunk[:-1]
+            first[0] = previous is None or chunk[0] != previous
+            previous = chunk[-1].copy()
+            chunk = chunk[first]
+        yield chunk
+
+"""
+FUNCTION : loadGPSDatabase
+Loads all points of the database's GPS table seen by at least minSatThreshold satellites, as loadGPSCSV does for a GPS CSV
+Rows the logger wrote twice in a row are kept once, as logExtraction does, before pointFilter sees them
+If given, pointFilter removes outliers chunk by chunk (see loadGPSCSV)
+IN
+    :dbPath - str
+    :minSatThreshold - int
+    :chunkSize - int
+    :pointFilter - gpsFilter.GPSFilter or None
+OUT
+    :times - numpy array of str
+    :timestamps - numpy array of datetime64[ms]
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :rcStatus - numpy array of float
+"""
+def loadGPSDatabase(dbPath, minSatThreshold, chunkSize=chunkSize, pointFilter=None):
+
+    chunks = removeConsecutiveDuplicates(iterGPSRows(dbPath, minSatThreshold, chunkSize))
+    if pointFilter is not None:
+        chunks = pointFilter.filterChunks(chunks)
+
+    return toColumns(chunks)
+
+"""
+FUNCTION : loadMissionDatabase
+Reads the waypoints of the database's current mission in one query, in the order waypointsToCSV.py writes them
+IN
+    :dbPath - str
+OUT
+    :wpLats - list of float
+    :wpLons - list of float
+    :wpRadii - list of float
+"""
+def loadMissionDatabase(dbPath):
+
+    conn = connectDatabase(dbPath)
+    try:
+        if any(column not in getTableColumns(conn, missionTable) for column in missionColumns):
+            raise ValueError('Wrong columns or column missing in {0} table!'.format(missionTable))
+        rows = conn.execute('SELECT ' + ','.join(missionColumns) + ' FROM ' + missionTable + ' ORDER BY rowid').fetchall()
+    finally:
+        conn.close()
+
+    try:
+        wpLats = [float(row[0]) for row in rows]
+        wpLons = [float(row[1]) for row in rows]
+        wpRadii = [float(row[2]) for row in rows]
+    except (TypeError, ValueError):
+        raise ValueError('Invalid waypoint in {0} table!'.format(missionTable))
+
+    return wpLats, wpLons, wpRadii
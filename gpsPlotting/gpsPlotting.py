@@ -1,13 +1,23 @@
+import os
 import sys
 import csv
+import sqlite3
+import argparse
 import numpy as np
 import math as m
 from gmplot import gmplot
 from gmplot.color_dicts import html_color_codes
 
+import gpsLoader
+import routeSegmentation
+import routeSimplification
+import trackMetrics
+import offlineRenderer
+import gpsFilter
+import waypointProximity
+import tilePyramid
+
 from pathlib import Path
-from datetime import datetime
-from datetime import timedelta
 import random
 
 
@@ -20,83 +30,145 @@ Version 1.4
 
 DESCRIPTION : 
 Plots ASPire's route on google maps with two different colours depending on the boat's RC Status and teks into accout timeskips
-Requires TWO CSV files : 
+Requires either the test sail database (asr.db) or TWO CSV files : 
     - A GPS CSV File containing t_timestamp, latitude, longitude, satellites_used and rc_on
     - A Current Mission File containing waypoint latitude, longitude and radius
 
-SETUP : Download and execute both python scripts in the logExtraction folder in order to obtain desired CSV Files
+SETUP : Nothing with a database. For CSV files, download and execute both python scripts in the logExtraction folder in order to obtain desired CSV Files
 
 HOW TO EXECUTE : 
-    python gpsPlotting_1.3.py <Path to GPS CSV file> <Path to Current Mission CSV file> <Interval between each timestamp marker>
+    python gpsPlotting_1.3.py <Path to asr.db> <Interval between each timestamp marker> [options]
+    python gpsPlotting_1.3.py <Path to GPS CSV file> <Path to Current Mission CSV file> <Interval between each timestamp marker> [options]
+    Options : [-m points|seconds|metres] [-s <Simplification tolerance in metres>] [-e] [-c] [-o <Map file>] [--colour rc|speed|course]
+              [--max-speed <knots>] [--hampel <points>] [--hampel-threshold <threshold>] [--kalman] [--create-indexes]
 
 N.B.: The lower the interval, the more precise but the more clustered the markers are. Too low may make the map crash because of the density
 Marker interval of 0 means no markers will be placed
+With a database, GPS points are read from dataLogs_gps and waypoints from current_Mission directly, no CSV file is written or parsed
+The database is opened read only, --create-indexes opens it for writing to create the t_timestamp index of dataLogs_gps if it is missing
+Each section of the route is simplified so that no plotted point moves by more than the tolerance (default 1 metre), 0 plots every GPS point
+-e writes paths as encoded polylines, decoded by the browser, instead of one LatLng per point
+-m seconds or -m metres places a marker every <interval> seconds or metres travelled instead of every <interval> GPS points
+-c groups timestamp markers depending on the zoom level, markers are only drawn one by one when zoomed in so low intervals don't crash the map
+-o sets the map file (default mapFile.html), a .svg or .png map is drawn offline as a static image, without google maps (PNG needs matplotlib)
+-o with a directory (ending with /) writes a tile pyramid of the route and a viewer page loading only the tiles in view, for very long tracks (see tilePyramid.py)
+--max-speed, --hampel and --kalman remove GPS jumps and smooth the route before it is plotted (see gpsFilter.py)
+Each waypoint's marker tells when its radius was first entered, how long the boat stayed inside and its closest approach, these are also printed
+--colour speed or --colour course colours the route by speed or course over ground (see trackMetrics.py) instead of RC status, the colour ranges are printed
 """
 
+maxTimeDelta = 30 #Threshold in seconds at which timeskip is declared
+defaultSimplifyTolerance = 1.0 #Metres
+markerModes = ('points', 'seconds', 'metres') #Units of the marker interval
+colourModes = ('rc', 'speed', 'course') #What the route's colour shows
+speedColours = ['#313695', '#4575b4', '#74add1', '#abd9e9', '#fee090', '#fdae61', '#f46d43', '#d73027'] #From slowest to fastest
+courseColours = ['#e6194b', '#f58231', '#ffe119', '#3cb44b', '#42d4f4', '#4363d8', '#911eb4', '#f032e6'] #N, NE, E, SE, S, SW, W, NW
+courseNames = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+maxSpeedPercentile = 99 #Faster speeds, usually GPS jumps, get the fastest colour
+colourWindowSeconds = 30 #Speeds and courses are measured over this long before being coloured
+colourHysteresis = 0.5 #Part of a speed range or course sector the speed or course must go past it by to change colour
+
 
 """
 FUNCTION : getArguments
 Retrieves, processes and returns all passed parameters as usable variables
+With a single input file, it must be a database and currentMissionCSVFile is None
+pointFilter is None unless a GPS filter option is given
 IN
 OUT
-    :gpsCSVFile - str
-    :currentMissionCSVFile - str
+    :gpsCSVFile - str, GPS CSV file or database
+    :currentMissionCSVFile - str or None
     :markerInterval - int
+    :simplifyTolerance - float
+    :encodedPaths - bool
+    :clusterMarkers - bool
+    :markerMode - str
+    :mapFile - str
+    :colourMode - str
+    :pointFilter - gpsFilter.GPSFilter or None
+    :createIndexes - bool
 """
 def getArguments():
 
-    gpsCSVFile = sys.argv[1]
-    currentMissionCSVFile = sys.argv[2]
-    try: #Check marker interval is an int
-        markerInterval = int(sys.argv[3])
-    except ValueError:
-        sys.exit('Invalid Marker Interval')
-
-    #Check that CSV files exist
+    parser = argparse.ArgumentParser(description="Plots ASPire's route on google maps")
+    parser.add_argument('inputFiles', nargs='+', metavar='inputFile',
+                        help='test sail database (asr.db), or GPS CSV file containing t_timestamp, latitude, longitude, satellites_used and rc_on '
+                             'followed by Current Mission CSV file containing latitude, longitude and radius')
+    parser.add_argument('markerInterval', type=float, help='interval between each timestamp marker (see --marker-mode), 0 means no markers')
+    parser.add_argument('-s', '--simplify', type=float, default=defaultSimplifyTolerance, metavar='METRES',
+                        help='simplification tolerance of the route in metres, 0 plots every GPS point (default : {0})'.format(defaultSimplifyTolerance))
+    parser.add_argument('-e', '--encoded', action='store_true',
+                        help='write paths as encoded polylines (precise to about a metre), makes the map file several times smaller')
+    parser.add_argument('-c', '--cluster', action='store_true',
+                        help='group nearby timestamp markers depending on the zoom, allows markers on every point without crashing the map')
+    parser.add_argument('-m', '--marker-mode', choices=markerModes, default='points',
+                        help='unit of the marker interval : number of GPS points (default), seconds or metres travelled')
+    parser.add_argument('-o', '--output', default='mapFile.html',
+                        help='file receiving the map (default : mapFile.html), a .svg or .png file is drawn offline without google maps, '
+                             'a directory (ending with /) receives a tile pyramid and its viewer index.html')
+    parser.add_argument('--colour', choices=colourModes, default='rc',
+                        help='colour of the route : RC status (default), speed over ground or course over ground')
+    parser.add_argument('--create-indexes', action='store_true',
+                        help='open the database for writing to create the t_timestamp index of dataLogs_gps if it is missing (not while the logger is running)')
+    gpsFilter.addFilterArguments(parser)
+    args = parser.parse_args()
+
+    if len(args.inputFiles) > 2:
+        sys.exit('Too many input files')
+    gpsCSVFile = args.inputFiles[0]
+    currentMissionCSVFile = args.inputFiles[1] if len(args.inputFiles) == 2 else None
+    markerInterval = args.markerInterval
+    if args.marker_mode == 'points':
+        if markerInterval != int(markerInterval):
+            sys.exit('Invalid Marker Interval')
+        markerInterval = int(markerInterval)
+
+    #Check that input files exist
     if not Path(gpsCSVFile).is_file():
-        sys.exit("GPS CSV file doesn't exist or can't be found!")
-    if not Path(currentMissionCSVFile).is_file():
+        sys.exit("GPS CSV file or database doesn't exist or can't be found!")
+    if currentMissionCSVFile is None:
+        if not gpsLoader.isDatabase(gpsCSVFile):
+            sys.exit('A Current Mission CSV file is needed with a GPS CSV file, or give the test sail database alone')
+    elif not Path(currentMissionCSVFile).is_file():
         sys.exit("Current Mission CSV file doesn't exist or can't be found!")
+    if args.simplify < 0:
+        sys.exit('Invalid simplification tolerance')
+    if markerInterval < 0:
+        sys.exit('Invalid Marker Interval')
 
-    if (markerInterval<35):
+    if (args.marker_mode == 'points' and markerInterval<35 and not args.cluster):
         print('\nWARNING : Low marker interval may cause overdensity and map crash\n')
 
-    return gpsCSVFile, currentMissionCSVFile, markerInterval
+    return gpsCSVFile, currentMissionCSVFile, markerInterval, args.simplify, args.encoded, args.cluster, args.marker_mode, args.output, args.colour, gpsFilter.createFilter(args), args.create_indexes
 
 """
 FUNCTION : CSVToLists
 Parses both CSV files to create globally used lists containing all necessary information
+GPS jumps are removed while the GPS CSV is parsed if a pointFilter is given (see gpsFilter.py)
 IN
     :gpsCSV - str
     :currentMissionCSV - str
     :minSatThreshold - int
+    :pointFilter - gpsFilter.GPSFilter or None
 OUT
-    :times - list of str
-    :lats - list of float
-    :lons - list of float
-    :rcStatus - list of int
+    :times - numpy array of str
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :rcStatus - numpy array of float
     :wpLats - list of float
     :wpLons - list of float
     :wpRadii - list of int
+    :timestamps - numpy array of datetime64[ms]
+    :timeskips - numpy array of bool
 """
-def CSVToLists(gpsCSV, currentMissionCSV, minSatThreshold):
-
-    #Process the current GPS CSV
-    with open(gpsCSV, 'r') as csvFile:
+def CSVToLists(gpsCSV, currentMissionCSV, minSatThreshold, pointFilter=None):
 
-        reader = csv.reader(csvFile)
-        firstLine = next(reader) #Extract the header from the rest
-        timeCol, latCol, lonCol, satCol, rcCol = getGPSColumnNumbers(firstLine)
-
-        times, lats, lons, rcStatus = [], [], [], []
-
-        for row in reader:
-            numberOfSatellites = int(row[satCol])
-            if (numberOfSatellites >= minSatThreshold):
-                times.append(row[timeCol])
-                lats.append(float(row[latCol]))
-                lons.append(float(row[lonCol]))
-                rcStatus.append(float(row[rcCol]))
+    #Load the current GPS CSV, timestamps are parsed once and all timeskips are then found at once
+    try:
+        times, timestamps, lats, lons, rcStatus = gpsLoader.loadGPSCSV(gpsCSV, minSatThreshold, pointFilter=pointFilter)
+    except ValueError as e:
+        sys.exit(str(e))
+    timeskips = routeSegmentation.getTimeskips(timestamps, maxTimeDelta)
 
     #Process the current mission CSV
     with open(currentMissionCSV, 'r') as csvFile:
@@ -112,32 +184,41 @@ def CSVToLists(gpsCSV, currentMissionCSV, minSatThreshold):
             wpLons.append(float(row[lonCol]))
             wpRadii.append(float(row[radiusCol]))
 
-    return times, lats, lons, rcStatus, wpLats, wpLons, wpRadii
+    return times, lats, lons, rcStatus, wpLats, wpLons, wpRadii, timestamps, timeskips
 
 """
-FUNCTION : getGPSColumnNumbers
-Used in CSVToLists() to retrieve column numbers in the GPS CSV
+FUNCTION : databaseToLists
+Reads the GPS points and the current mission straight from the test sail database, one streamed query each (see gpsLoader.py)
+Gives the same lists as CSVToLists() would with the CSV files extracted from that database, pointFilter being used in the same way
+The database is only written to if createIndexes is True, to add the t_timestamp index of the GPS table
 IN
-    :firstLine - iterable
+    :database - str
+    :minSatThreshold - int
+    :pointFilter - gpsFilter.GPSFilter or None
+    :createIndexes - bool
 OUT
-    :timeCol - int
-    :latCol - int
-    :lonCol - int
-    :satCol - int
-    :rcCol - int
+    :times - numpy array of str
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :rcStatus - numpy array of float
+    :wpLats - list of float
+    :wpLons - list of float
+    :wpRadii - list of float
+    :timestamps - numpy array of datetime64[ms]
+    :timeskips - numpy array of bool
 """
-def getGPSColumnNumbers(firstLine):
+def databaseToLists(database, minSatThreshold, pointFilter=None, createIndexes=False):
 
+    if createIndexes and not gpsLoader.ensureTimestampIndex(database):
+        print("WARNING : Couldn't create the t_timestamp index (database read only or locked), SQLite sorts the points itself")
     try:
-        timeCol = firstLine.index('t_timestamp')
-        latCol = firstLine.index('latitude')
-        lonCol = firstLine.index('longitude')
-        satCol = firstLine.index('satellites_used')
-        rcCol = firstLine.index('rc_on')
-    except ValueError:
-        sys.exit('Wrong columns or column missing in GPS CSV!')
+        times, timestamps, lats, lons, rcStatus = gpsLoader.loadGPSDatabase(database, minSatThreshold, pointFilter=pointFilter)
+        wpLats, wpLons, wpRadii = gpsLoader.loadMissionDatabase(database)
+    except (ValueError, sqlite3.Error) as e:
+        sys.exit(str(e))
+    timeskips = routeSegmentation.getTimeskips(timestamps, maxTimeDelta)
 
-    return timeCol, latCol, lonCol, satCol, rcCol
+    return times, lats, lons, rcStatus, wpLats, wpLons, wpRadii, timestamps, timeskips
 
 """
 FUNCTION : getCMColumnNumbers
@@ -163,22 +244,42 @@ def getCMColumnNumbers(firstLine):
 """
 FUNCTION : createGmap
 Creates the gmap object from the gmplot library on which the route and markers are plotted
+For .svg and .png map files, creates an offline plotter instead (see offlineRenderer.py), random colours are then always the same
+For a directory, creates a tile pyramid plotter (see tilePyramid.py)
 IN
 OUT
-    :gmap - gmplot object
+    :gmap - gmplot, offlineRenderer or tilePyramid object
 """
 def createGmap():
 
+    if isTileDirectory(mapFile):
+        return tilePyramid.TilePyramidPlotter()
+    if mapFile.lower().endswith(('.svg', '.png')):
+        random.seed(0)
+        return offlineRenderer.OfflineMapPlotter()
+
     #Calculate mean latitude and longitude to center map
     meanLat = np.mean(lats)
     meanLong = np.mean(lons)
 
     # Place map
     zoom = get_zoom(lats, lons)
-    gmap = gmplot.GoogleMapPlotter(meanLat, meanLong, zoom)
+    gmap = gmplot.GoogleMapPlotter(meanLat, meanLong, zoom, encoded=encodedPaths)
 
     return gmap
 """
+FUNCTION : isTileDirectory
+Checks if the map file is a directory receiving a tile pyramid : it ends with a path separator or is an existing directory
+IN
+    :mapFile - str
+OUT
+    :isTileDirectory - bool
+"""
+def isTileDirectory(mapFile):
+
+    return mapFile.endswith(('/', os.sep)) or os.path.isdir(mapFile)
+
+"""
 FUNCTION : getListOfBlues
 Gets all possible blues from accepted colours by gmplot and returns that list in a random order
 IN
@@ -198,28 +299,65 @@ def getListOfBlues():
 
     return blueColours
 
+"""
+FUNCTION : getSegmentColours
+Called by plotPath() to colour each segment of the route by speed or course over ground, prints what the colours mean
+Speeds are split in len(speedColours) equal ranges up to the maxSpeedPercentile percentile, courses in 8 sectors centred on N, NE, E...
+Both are measured over colourWindowSeconds and only change colour colourHysteresis past a range, so GPS noise doesn't make a polyline per segment
+Segments without a speed or course (same time or same place at both ends) take the colour of the segment before them
+IN
+OUT
+    :classes - numpy array of int, one per segment
+    :colours - list of str
+"""
+def getSegmentColours():
+    if colourMode == 'speed':
+        speeds = trackMetrics.windowSpeedOverGround(lats, lons, timestamps, colourWindowSeconds, timeskips)
+        speeds = trackMetrics.forwardFill(speeds) * trackMetrics.knotsPerMetrePerSecond
+        maxSpeed = np.nanpercentile(speeds, maxSpeedPercentile) if len(speeds) and not np.isnan(speeds).all() else 0
+        edges = np.linspace(0, max(maxSpeed, 0.1), len(speedColours) + 1)
+        classes = routeSegmentation.getHysteresisClasses(np.nan_to_num(speeds), edges, colourHysteresis * (edges[1] - edges[0]))
+        print('Speed colours (knots) : ' + ', '.join(['{0} {1:.1f}-{2:.1f}'.format(colour, edges[n], edges[n + 1]) for n, colour in enumerate(speedColours)]))
+        return classes, speedColours
+
+    courses = np.nan_to_num(trackMetrics.forwardFill(trackMetrics.windowCourseOverGround(lats, lons, timestamps, colourWindowSeconds, timeskips)))
+    #Sectors are shifted by half a sector so that N goes from 337.5 to 22.5
+    sectorWidth = 360.0 / len(courseColours)
+    edges = np.arange(len(courseColours) + 1) * sectorWidth
+    classes = routeSegmentation.getHysteresisClasses(courses + sectorWidth / 2, edges, colourHysteresis * sectorWidth, circular=True)
+    print('Course colours : ' + ', '.join(['{0} {1}'.format(colour, name) for colour, name in zip(courseColours, courseNames)]))
+    return classes, courseColours
+
 """
 FUNCTION : plotPath
-Goes through all latitudes and longitudes and plots them on the map with a colour corresponding to RC's status of those points
+Plots the route section by section with a colour corresponding to RC's status of those points
+A new section starts at every RC switch and after every timeskip (see routeSegmentation.py)
+With colourMode speed or course, a new section starts instead whenever the colour of the segments changes and after every timeskip
+Each section is simplified with simplifyTolerance, its first and last points are kept so links still join the sections
 IN
     :gmap - gmplot object
 OUT
 """
 def plotPath(gmap):
-    linkIndexes=[]
-    n=0
+    if colourMode != 'rc':
+        classes, colours = getSegmentColours()
+        starts, ends, runClasses, linkIndexes = routeSegmentation.getRuns(classes, timeskips)
+        for latCoords, longCoords, runClass in routeSegmentation.iterSections(lats, lons, starts, ends, runClasses):
+            latCoords, longCoords = routeSimplification.simplifySection(latCoords, longCoords, simplifyTolerance)
+            gmap.plot(latCoords, longCoords, colours[runClass], edge_width=2) #Runs are short, arrows on each would hide the colours
+        plotLinks(gmap, linkIndexes)
+        return
+
     listOfBlues=getListOfBlues() #Get randomly arranged list of blue colours
-    while n<len(rcStatus):
-        if rcStatus[n]: #RC is ON
-            latCoords, longCoords, linkIndexes, n = addSection(n, linkIndexes, True)
-            if len(latCoords)>0 and len(longCoords)>0: #Returned lists aren't empty
-                gmap.plot(latCoords, longCoords, '#e67e22', edge_width=2, arrow=True)
+    starts, ends, sectionStatus, linkIndexes = routeSegmentation.getSegments(rcStatus, timeskips)
 
+    for latCoords, longCoords, status in routeSegmentation.iterSections(lats, lons, starts, ends, sectionStatus):
+        latCoords, longCoords = routeSimplification.simplifySection(latCoords, longCoords, simplifyTolerance)
+        if status: #RC is ON
+            gmap.plot(latCoords, longCoords, '#e67e22', edge_width=2, arrow=True)
         else : #RC is OFF
-            latCoords, longCoords, linkIndexes, n = addSection(n, linkIndexes, False)
-            if len(latCoords)>0 and len(longCoords)>0:
-                colour = random.choice(listOfBlues)
-                gmap.plot(latCoords, longCoords, colour, edge_width=2, arrow=True)
+            colour = random.choice(listOfBlues)
+            gmap.plot(latCoords, longCoords, colour, edge_width=2, arrow=True)
     plotLinks(gmap, linkIndexes)
 
 """
@@ -227,92 +365,14 @@ FUNCTION : plotLinks
 Called by plotPath() to plot the missing links created by RC switches or timeskips
 IN
     :gmap - gmplot object
-    :linkIndexes - list of int
+    :linkIndexes - numpy array of int
 OUT
 """
 def plotLinks(gmap, linkIndexes):
-    linkIndexes = set(linkIndexes)
-    for index in linkIndexes :
-        latsToLink = (lats[index], lats[index+1])
-        lonsToLink = (lons[index], lons[index+1])
+    linkLats, linkLons = routeSegmentation.getLinkPairs(lats, lons, linkIndexes)
+    for latsToLink, lonsToLink in zip(linkLats, linkLons):
         gmap.plot(latsToLink, lonsToLink, 'yellow', edge_width=2, edge_alpha=0.3, arrow = True)
 
-"""
-FUNCTION : addSection
-Called by plotPath() to create a list of coordinates to plot. This list will contain only coordinates with either RC ON or OF
-IN
-    :n - int
-    :linkIndexes - list of int
-    :status - bool
-OUT
-    :latsCoords - list of float
-    :lonsCoords - list of float
-    :linkIndexes - list of int
-    :n - int
-"""
-def addSection (n, linkIndexes, status):
-    latsCoords=[]
-    lonsCoords=[]
-
-    if not status: #RC Off
-        while n<len(rcStatus) and not rcStatus[n]:
-            if rcStatus[n-1] and n>0 : #Previous iteration was RC ON, keep track of mode switch
-                linkIndexes.append(n-1)
-
-            latsCoords.append(lats[n])
-            lonsCoords.append(lons[n])
-            if not maxTimeDeltaReached(n): #No timeskip between now and next point
-                n+=1
-            else: #Timeskip detected, current point is end of current path, break to start new one
-                linkIndexes.append(n)
-                n+=1
-                break
-
-    if status: #RC On
-        while n<len(rcStatus) and rcStatus[n]:
-            if not rcStatus[n-1] and n>0: #Previous iteration was RC OFF, keep track of mode switch
-                linkIndexes.append(n-1)
-
-            latsCoords.append(lats[n])
-            lonsCoords.append(lons[n])
-            if not maxTimeDeltaReached(n): #No timeskip between now and next point
-                n+=1
-            else: #Timeskip detected, current point is end of current path, break to start new one
-                linkIndexes.append(n)
-                n+=1
-                break
-
-    return latsCoords, lonsCoords, linkIndexes, n
-
-"""
-FUNCTION : maxTimeDeltaReached
-Called by addSection() to signal timeskips
-IN
-    :n - int
-OUT
-    :maxTimeDeltaReached - bool
-"""
-def maxTimeDeltaReached(n):
-    if n==0 or n>=len(times)-1:
-        return False
-
-    #Get times
-    currentTime = times[n]
-    nextTime = times[n+1]
-
-    #Convert them to datetime format
-    currentTime = currentTime.split('.')[0] #Remove milliseconds
-    nextTime= nextTime.split('.')[0]
-
-    currentDatetime = datetime.strptime(currentTime, '%Y-%m-%d_%H:%M:%S')
-    nextDatetime = datetime.strptime(nextTime, '%Y-%m-%d_%H:%M:%S')
-
-    maxTimeDelta = timedelta(seconds=30) #Threshold at which timeskip is declared
-
-    maxTimeDeltaReached = nextDatetime - currentDatetime > maxTimeDelta
-
-    return maxTimeDeltaReached
-
 
 """
 Functions 'lat_rad' and 'get_zoom' inspired by adamvotava, see https://blog.alookanalytics.com/2017/02/05/how-to-plot-your-own-bikejogging-route-using-python-and-google-maps-api/
@@ -360,28 +420,75 @@ def get_zoom(latitudes, longitudes, map_height_pix=900, map_width_pix=1900, zoom
 
     return min(zoom_lat, zoom_lon, zoom_max)
 
+"""
+FUNCTION : getMarkerIndexes
+Called by plotMarkers() to choose the points receiving a timestamp marker : one every markerInterval points, seconds or metres travelled
+Seconds and metres are looked up in cumulative time and distance arrays, so the number of markers doesn't depend on the log rate
+IN
+OUT
+    :markerIndexes - numpy array of int
+"""
+def getMarkerIndexes():
+    if markerMode == 'seconds':
+        return trackMetrics.everyInterval(trackMetrics.elapsedSeconds(timestamps), markerInterval)
+    if markerMode == 'metres':
+        return trackMetrics.everyInterval(trackMetrics.cumulativeDistance(lats, lons), markerInterval)
+    return np.arange(0, len(times), markerInterval)
+
+"""
+FUNCTION : getVisitDescriptions
+Called by plotMarkers() to describe when each waypoint was reached, the descriptions are also printed
+First entry in the radius, time inside and closest approach are found with a spatial index of the route (see waypointProximity.py)
+IN
+OUT
+    :descriptions - list of str
+"""
+def getVisitDescriptions():
+    firstEntries, dwellSeconds, closestIndexes, closestDistances = waypointProximity.getWaypointVisits(lats, lons, timestamps, timeskips,
+                                                                                                       wpLats, wpLons, wpRadii)
+    descriptions = []
+    for row in range(len(wpLats)):
+        if firstEntries[row] >= 0:
+            description = 'Reached {0}, {1:.0f} s inside, closest {2:.1f} m at {3}'.format(times[firstEntries[row]], dwellSeconds[row],
+                                                                                         closestDistances[row], times[closestIndexes[row]])
+        elif closestIndexes[row] >= 0:
+            description = 'Not reached, closest {0:.1f} m at {1}'.format(closestDistances[row], times[closestIndexes[row]])
+        else:
+            description = 'Not reached'
+        print('WAYPOINT {0} : {1}'.format(row, description))
+        descriptions.append(description)
+
+    return descriptions
+
 """
 FUNCTION : plotMarkers
 Plots all desired markers and waypoints with path between them on map
+With clusterMarkers, timestamp markers are grouped depending on the zoom and only drawn one by one when zoomed in
 IN
     :gmap - gmplot object
 OUT
 """
 def plotMarkers(gmap):
     #Place timestamp markers
-    if markerInterval :
-        for n in range(len(times)):
-            if not (n%markerInterval) : #Only place markers every time (n/markerInterval)==0
-                gmap.marker(lats[n], lons[n], color = 'lightsalmon', title='{0} \
+    if markerInterval and clusterMarkers :
+        markerIndexes = getMarkerIndexes()
+        gmap.marker_cluster(lats[markerIndexes], lons[markerIndexes], color = 'lightsalmon',
+                            titles=['{0} {1} {2}'.format(times[n], lats[n], lons[n]) for n in markerIndexes])
+    elif markerInterval :
+        for n in getMarkerIndexes():
+            gmap.marker(lats[n], lons[n], color = 'lightsalmon', title='{0} \
                                                                              {1} \
                                                                              {2}'.format(times[n], lats[n], lons[n]))
 
     #Place waypoint markers
+    visitDescriptions = getVisitDescriptions()
     for row in range(len(wpLats)):
         gmap.marker(wpLats[row], wpLons[row], color = 'crimson', title = 'WAYPOINT {0}\
                                                                             {1}\
                                                                             {2}\
-                                                                            {3}'.format(row, wpLats[row], wpLons[row], wpRadii[row]))
+                                                                            {3}\
+                                                                            {4}'.format(row, wpLats[row], wpLons[row], wpRadii[row],
+                                                                                        visitDescriptions[row]))
         gmap.circle(wpLats[row], wpLons[row], wpRadii[row], color = 'crimson') #Draw radius
     gmap.plot(wpLats, wpLons, color = 'crimson', edge_width=2, closed=False) #Plot path between waypoints
 
@@ -389,24 +496,29 @@ def plotMarkers(gmap):
 #MAIN SCRIPT
 if __name__ == "__main__":
 
-    expectedArgs = 4
-
-    if (len(sys.argv) == expectedArgs):
-        gpsCSV, currentMissionCSV, markerInterval = getArguments()
-    else:
-        sys.exit("Expected arguments : <GPS CSV> <Current Mission CSV> <Marker interval>")
+    gpsCSV, currentMissionCSV, markerInterval, simplifyTolerance, encodedPaths, clusterMarkers, markerMode, mapFile, colourMode, pointFilter, createIndexes = getArguments()
 
     minSatThreshold = 5
-    times, lats, lons, rcStatus, wpLats, wpLons, wpRadii = CSVToLists(gpsCSV,
-                                                                      currentMissionCSV,
-                                                                      minSatThreshold)
+    if currentMissionCSV is None:
+        times, lats, lons, rcStatus, wpLats, wpLons, wpRadii, timestamps, timeskips = databaseToLists(gpsCSV, minSatThreshold, pointFilter, createIndexes)
+    else:
+        times, lats, lons, rcStatus, wpLats, wpLons, wpRadii, timestamps, timeskips = CSVToLists(gpsCSV,
+                                                                                                 currentMissionCSV,
+                                                                                                 minSatThreshold,
+                                                                                                 pointFilter)
+    if pointFilter is not None:
+        print('GPS filter : {0} points removed'.format(pointFilter.removed))
+    if isTileDirectory(mapFile):
+        clusterMarkers = True #Tiles only hold timestamp markers handed over as a cluster
     gmap = createGmap()
 
     plotPath(gmap)
     plotMarkers(gmap)
 
     #Draw map
-    mapFile = 'mapFile.html'
-    gmap.draw(mapFile)
+    try:
+        gmap.draw(mapFile)
+    except ImportError as e:
+        sys.exit(str(e))
     print("Map creation successful : " + mapFile)
 
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import io
 import json
 import math
 import os
@@ -10,11 +11,156 @@ import copy
 from collections import namedtuple
 
 from gmplot.color_dicts import mpl_color_map, html_color_codes
-from gmplot.google_maps_templates import SYMBOLS, CIRCLE
 
 
 Symbol = namedtuple('Symbol', ['symbol', 'lat', 'long', 'size'])
 
+WRITE_BUFFER_SIZE = 1 << 20
+
+SYMBOL_SHAPES = ('o', '+', 'x')
+
+# Drawing functions written once in initialize(), each layer is then a single call with its data
+# Paths are an encoded polyline string or a flat [lat, lng, lat, lng, ...] list
+LAYER_FUNCTIONS = """
+var pathIcons = {
+    arrowSymbol: {path: google.maps.SymbolPath.FORWARD_OPEN_ARROW, strokeOpacity : 1},
+    dashedSymbol: {path: 'M 0,-1 0,1', strokeOpacity: 1, scale: 4}
+};
+
+function toLatLngs(coords) {
+    if (typeof coords === 'string') {
+        return google.maps.geometry.encoding.decodePath(coords);
+    }
+    var latLngs = [];
+    for (var i = 0; i < coords.length; i += 2) {
+        latLngs.push(new google.maps.LatLng(coords[i], coords[i + 1]));
+    }
+    return latLngs;
+}
+
+function drawMarkers(icons, markers) {
+    for (var i = 0; i < markers.length; i++) {
+        var m = markers[i];
+        new google.maps.Marker({map: map, position: new google.maps.LatLng(m[0], m[1]), icon: icons[m[2]], title: m[3]});
+    }
+}
+
+function drawPaths(paths) {
+    for (var i = 0; i < paths.length; i++) {
+        var p = paths[i];
+        var icons = [];
+        for (var j = 0; j < p.icons.length; j++) {
+            icons.push({icon: pathIcons[p.icons[j]], repeat: '50px'});
+        }
+        new google.maps.Polyline({map: map, clickable: false, geodesic: true, path: toLatLngs(p.path), icons: icons,
+                                  strokeColor: p.strokeColor, strokeOpacity: p.strokeOpacity, strokeWeight: p.strokeWeight});
+    }
+}
+
+function drawCircles(circles) {
+    for (var i = 0; i < circles.length; i++) {
+        var c = circles[i];
+        new google.maps.Circle({map: map, center: new google.maps.LatLng(c.lat, c.lng), radius: c.radius,
+                                strokeColor: c.strokeColor, strokeOpacity: c.strokeOpacity, strokeWeight: c.strokeWeight,
+                                fillColor: c.fillColor, fillOpacity: c.fillOpacity});
+    }
+}
+
+function drawSymbols(symbols) {
+    for (var i = 0; i < symbols.length; i++) {
+        var s = symbols[i];
+        var center = new google.maps.LatLng(s.lat, s.lng);
+        if (s.symbol === 'o') {
+            new google.maps.Circle({map: map, center: center, radius: s.size,
+                                    strokeColor: s.strokeColor, strokeOpacity: s.strokeOpacity, strokeWeight: s.strokeWeight,
+                                    fillColor: s.fillColor, fillOpacity: s.fillOpacity});
+            continue;
+        }
+        // '+' and 'x' : two lines of s.size metres crossing at the point
+        var headings = s.symbol === '+' ? [0, 90] : [45, 135];
+        for (var j = 0; j < 2; j++) {
+            var ends = [google.maps.geometry.spherical.computeOffset(center, s.size / 2, headings[j]),
+                        google.maps.geometry.spherical.computeOffset(center, s.size / 2, headings[j] + 180)];
+            new google.maps.Polyline({map: map, clickable: false, path: ends,
+                                      strokeColor: s.strokeColor, strokeOpacity: s.strokeOpacity, strokeWeight: s.strokeWeight});
+        }
+    }
+}
+
+// Markers grouped on a grid of gridSize pixels, redrawn for the visible area every time the map stops moving
+// A cell holding several markers shows one marker labelled with their number, clicking it zooms in
+// From maxZoom on every marker is shown
+function drawMarkerClusters(icon, coords, titles, gridSize, maxZoom) {
+    var count = coords.length / 2;
+    var worldX = new Float64Array(count), worldY = new Float64Array(count);
+    for (var i = 0; i < count; i++) {
+        var sinLat = Math.sin(coords[2 * i] * Math.PI / 180);
+        worldX[i] = 256 * (coords[2 * i + 1] + 180) / 360;
+        worldY[i] = 256 * (0.5 - Math.log((1 + sinLat) / (1 - sinLat)) / (4 * Math.PI));
+    }
+    var shown = [];
+
+    function addMarker(lat, lng, title, label, zoomTo) {
+        var marker = new google.maps.Marker({map: map, position: new google.maps.LatLng(lat, lng), icon: icon, title: title, label: label});
+        if (zoomTo) {
+            marker.addListener('click', function() {
+                map.setCenter(marker.getPosition());
+                map.setZoom(zoomTo);
+            });
+        }
+        shown.push(marker);
+    }
+
+    function refresh() {
+        var bounds = map.getBounds();
+        if (!bounds) {
+            return;
+        }
+        for (var i = 0; i < shown.length; i++) {
+            shown[i].setMap(null);
+        }
+        shown = [];
+
+        var zoom = map.getZoom();
+        var cellSize = gridSize / Math.pow(2, zoom);
+        var sw = bounds.getSouthWest(), ne = bounds.getNorthEast();
+        var wraps = sw.lng() > ne.lng();
+        var cells = {};
+        for (var i = 0; i < count; i++) {
+            var lat = coords[2 * i], lng = coords[2 * i + 1];
+            if (lat < sw.lat() || lat > ne.lat() || (wraps ? (lng < sw.lng() && lng > ne.lng()) : (lng < sw.lng() || lng > ne.lng()))) {
+                continue;
+            }
+            if (zoom >= maxZoom) {
+                addMarker(lat, lng, titles[i]);
+                continue;
+            }
+            var key = Math.floor(worldX[i] / cellSize) + ',' + Math.floor(worldY[i] / cellSize);
+            var cell = cells[key];
+            if (!cell) {
+                cell = cells[key] = {size: 0, lat: 0, lng: 0, first: i, last: i};
+            }
+            cell.size++;
+            cell.lat += lat;
+            cell.lng += lng;
+            cell.last = i;
+        }
+        for (var key in cells) {
+            var cell = cells[key];
+            if (cell.size === 1) {
+                addMarker(coords[2 * cell.first], coords[2 * cell.first + 1], titles[cell.first]);
+            } else {
+                addMarker(cell.lat / cell.size, cell.lng / cell.size, titles[cell.first] + ' ... ' + titles[cell.last],
+                          String(cell.size), Math.min(zoom + 2, maxZoom));
+            }
+        }
+    }
+
+    map.addListener('idle', refresh);
+}
+
+"""
+
 
 class InvalidSymbolError(Exception):
     pass
@@ -27,18 +173,44 @@ def safe_iter(var):
         return [var]
 
 
+def to_json(data):
+    # '</' is escaped so that a title can't close the page's script tag
+    return json.dumps(data, separators=(',', ':')).replace('</', '<\\/')
+
+
+def encode_polyline(path):
+    """Encode a list of (lat, lng) with Google's encoded polyline algorithm (5 decimals).
+    See https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+    """
+    chars = []
+    prev_lat, prev_lng = 0, 0
+    for lat, lng in path:
+        lat, lng = int(round(lat * 1e5)), int(round(lng * 1e5))
+        for value in (lat - prev_lat, lng - prev_lng):
+            value = ~(value << 1) if value < 0 else value << 1
+            while value >= 0x20:
+                chars.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chars.append(chr(value + 63))
+        prev_lat, prev_lng = lat, lng
+    return ''.join(chars)
+
+
 class GoogleMapPlotter(object):
 
-    def __init__(self, center_lat, center_lng, zoom, apikey=''):
+    def __init__(self, center_lat, center_lng, zoom, apikey='', encoded=False):
         self.center = (float(center_lat), float(center_lng))
         self.zoom = int(zoom)
         self.apikey = str(apikey)
+        # Paths, polygons and heatmaps written as encoded polyline strings, decoded in the browser
+        self.encoded = encoded
         self.grids = None
         self.paths = []
         self.shapes = []
         self.points = []
         self.circles = []
         self.symbols = []
+        self.marker_clusters = []
         self.heatmap_points = []
         self.ground_overlays = []
         self.radpoints = []
@@ -70,6 +242,18 @@ class GoogleMapPlotter(object):
         color = self.html_color_codes.get(color, color)
         self.points.append((lat, lng, color[1:], title))
 
+    def marker_cluster(self, lats, lngs, color='#FF0000', c=None, titles=None, grid_size=60, max_zoom=19):
+        """Markers grouped by zoom level : nearby markers are shown as one labelled marker,
+        every marker in view is shown from max_zoom on. Suits thousands of markers.
+        """
+        if c:
+            color = c
+        color = self.color_dict.get(color, color)
+        color = self.html_color_codes.get(color, color)
+        coords = [round(value, 6) for lat, lng in zip(lats, lngs) for value in (lat, lng)]
+        titles = list(titles) if titles is not None else [''] * (len(coords) // 2)
+        self.marker_clusters.append((coords, color[1:], titles, grid_size, max_zoom))
+
     def scatter(self, lats, lngs, color=None, size=None, marker=True, c=None, s=None, symbol='o', **kwargs):
         color = color or c
         size = size or s or 40
@@ -145,7 +329,7 @@ class GoogleMapPlotter(object):
         color = color or c
         kwargs.setdefault("color", color)
         settings = self._process_kwargs(kwargs)
-        path = zip(lats, lngs)
+        path = list(zip(lats, lngs))
         self.paths.append((path, settings))
 
     def heatmap(self, lats, lngs, threshold=10, radius=10, gradient=None, opacity=0.6, maxIntensity=1, dissipating=True):
@@ -228,51 +412,65 @@ class GoogleMapPlotter(object):
         color = color or c
         kwargs.setdefault("color", color)
         settings = self._process_kwargs(kwargs)
-        shape = zip(lats, lngs)
+        shape = list(zip(lats, lngs))
         self.shapes.append((shape, settings))
 
-    def draw(self, htmlfile):
-        """Create the html file which include one google map and all points and paths. If 
-        no string is provided, return the raw html.
+    def draw(self, htmlfile=None):
+        """Create the html file which include one google map and all points and paths.
+        htmlfile is a file name or any file-like object with a write method. If
+        no file is provided, return the raw html.
         """
-        f = open(htmlfile, 'w')
-        f.write('<html>\n')
-        f.write('<head>\n')
-        f.write(
-            '<meta name="viewport" content="initial-scale=1.0, user-scalable=no" />\n')
-        f.write(
-            '<meta http-equiv="content-type" content="text/html; charset=UTF-8"/>\n')
-        f.write('<title>Google Maps - gmplot </title>\n')
+        if htmlfile is None:
+            f = io.StringIO()
+            self.write_html(f)
+            return f.getvalue()
+        if hasattr(htmlfile, 'write'):
+            self.write_html(htmlfile)
+        else:
+            with open(htmlfile, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+                self.write_html(f)
+
+    def write_html(self, f):
+        # Every layer is formatted in memory and written as one chunk
+        # Encoded paths are decoded and '+'/'x' symbols drawn by the geometry library
         if self.apikey:
-            f.write('<script type="text/javascript" src="https://maps.googleapis.com/maps/api/js?libraries=visualization&sensor=true_or_false&key=%s"></script>\n' % self.apikey )
+            script = 'https://maps.googleapis.com/maps/api/js?libraries=visualization,geometry&sensor=true_or_false&key=%s' % self.apikey
         else:
-            f.write('<script type="text/javascript" src="https://maps.googleapis.com/maps/api/js?libraries=visualization&sensor=true_or_false"></script>\n' )
-        f.write('<script type="text/javascript">\n')
-        f.write('\tfunction initialize() {\n')
+            script = 'https://maps.googleapis.com/maps/api/js?libraries=visualization,geometry&sensor=true_or_false'
+        f.write('<html>\n'
+                '<head>\n'
+                '<meta name="viewport" content="initial-scale=1.0, user-scalable=no" />\n'
+                '<meta http-equiv="content-type" content="text/html; charset=UTF-8"/>\n'
+                '<title>Google Maps - gmplot </title>\n'
+                '<script type="text/javascript" src="%s"></script>\n'
+                '<script type="text/javascript">\n'
+                '\tfunction initialize() {\n' % script)
         self.write_map(f)
+        f.write(LAYER_FUNCTIONS)
         self.write_grids(f)
         self.write_points(f)
+        self.write_marker_clusters(f)
         self.write_paths(f)
         self.write_circles(f)
         self.write_symbols(f)
         self.write_shapes(f)
         self.write_heatmap(f)
         self.write_ground_overlay(f)
-        f.write('\t}\n')
-        f.write('</script>\n')
-        f.write('</head>\n')
-        f.write(
-            '<body style="margin:0px; padding:0px;" onload="initialize()">\n')
-        f.write(
-            '\t<div id="map_canvas" style="width: 100%; height: 100%;"></div>\n')
-        f.write('</body>\n')
-        f.write('</html>\n')
-        f.close()
+        f.write('\t}\n'
+                '</script>\n'
+                '</head>\n'
+                '<body style="margin:0px; padding:0px;" onload="initialize()">\n'
+                '\t<div id="map_canvas" style="width: 100%; height: 100%;"></div>\n'
+                '</body>\n'
+                '</html>\n')
 
     #############################################
     # # # # # # Low level Map Drawing # # # # # #
     #############################################
 
+    # Markers, paths, circles and symbols are written as JSON data handed to the
+    # drawing functions of LAYER_FUNCTIONS, one call per layer
+
     def write_grids(self, f):
         if self.gridsetting is None:
             return
@@ -296,145 +494,105 @@ class GoogleMapPlotter(object):
             self.grids.append(
                 [(slat + latin / 2.0, lng + lngin / 2.0), (elat + latin / 2.0, lng + lngin / 2.0)])
 
-        for line in self.grids:
-            settings = self._process_kwargs({"color": "#000000"})
-            self.write_polyline(f, line, settings)
+        settings = self._process_kwargs({"color": "#000000"})
+        self.write_layer(f, 'drawPaths', [self.polyline_data(line, settings) for line in self.grids])
 
     def write_points(self, f):
-        for point in self.points:
-            self.write_point(f, point[0], point[1], point[2], point[3])
+        # Marker images are listed once, each marker refers to its image by index
+        icons = []
+        markers = []
+        for lat, lon, color, title in self.points:
+            icon = self.coloricon % color
+            if icon not in icons:
+                icons.append(icon)
+            markers.append([round(lat, 6), round(lon, 6), icons.index(icon), title])
+        if markers:
+            f.write('drawMarkers(%s, %s);\n\n' % (to_json(icons), to_json(markers)))
+
+    def write_marker_clusters(self, f):
+        f.write(''.join(['drawMarkerClusters(%s, %s, %s, %d, %d);\n\n' % (to_json(self.coloricon % color), to_json(coords), to_json(titles), grid_size, max_zoom)
+                         for coords, color, titles, grid_size, max_zoom in self.marker_clusters]))
 
     def write_circles(self, f):
-        for circle, settings in self.circles:
-            self.write_circle(f, circle[0], circle[1], circle[2], settings)
+        self.write_layer(f, 'drawCircles', [self.circle_data(circle[0], circle[1], circle[2], settings) for circle, settings in self.circles])
 
     def write_symbols(self, f):
-        for symbol, settings in self.symbols:
-            self.write_symbol(f, symbol, settings)
+        self.write_layer(f, 'drawSymbols', [self.symbol_data(symbol, settings) for symbol, settings in self.symbols])
 
     def write_paths(self, f):
-        for path, settings in self.paths:
-            self.write_polyline(f, path, settings)
+        self.write_layer(f, 'drawPaths', [self.polyline_data(path, settings) for path, settings in self.paths])
 
     def write_shapes(self, f):
-        for shape, settings in self.shapes:
-            self.write_polygon(f, shape, settings)
+        f.write(''.join(self.format_polygon(shape, settings) for shape, settings in self.shapes))
+
+    def write_layer(self, f, function, data):
+        if data:
+            f.write('%s(%s);\n\n' % (function, to_json(data)))
 
     # TODO: Add support for mapTypeId: google.maps.MapTypeId.SATELLITE
     def write_map(self,  f):
-        f.write('\t\tvar centerlatlng = new google.maps.LatLng(%f, %f);\n' %
-                (self.center[0], self.center[1]))
-        f.write('\t\tvar myOptions = {\n')
-        f.write('\t\t\tzoom: %d,\n' % (self.zoom))
-        f.write('\t\t\tcenter: centerlatlng,\n')
-        f.write('\t\t\tmapTypeId: google.maps.MapTypeId.ROADMAP\n')
-        f.write('\t\t};\n')
-        f.write(
-            '\t\tvar map = new google.maps.Map(document.getElementById("map_canvas"), myOptions);\n')
-        f.write('\n')
-
-    def write_point(self, f, lat, lon, color, title):
-        f.write('\t\tvar latlng = new google.maps.LatLng(%f, %f);\n' %
-                (lat, lon))
-        f.write('\t\tvar img = new google.maps.MarkerImage(\'%s\');\n' %
-                (self.coloricon % color))
-        f.write('\t\tvar marker = new google.maps.Marker({\n')
-        f.write('\t\ttitle: "%s",\n' % title)
-        f.write('\t\ticon: img,\n')
-        f.write('\t\tposition: latlng\n')
-        f.write('\t\t});\n')
-        f.write('\t\tmarker.setMap(map);\n')
-        f.write('\n')
-
-    def write_symbol(self, f, symbol, settings):
-        strokeColor = settings.get('color') or settings.get('edge_color')
-        strokeOpacity = settings.get('edge_alpha')
-        strokeWeight = settings.get('edge_width')
-        fillColor = settings.get('face_color')
-        fillOpacity = settings.get('face_alpha')
-        try:
-            template = SYMBOLS[symbol.symbol]
-        except KeyError:
+        f.write('\t\tvar centerlatlng = new google.maps.LatLng(%f, %f);\n'
+                '\t\tvar myOptions = {\n'
+                '\t\t\tzoom: %d,\n'
+                '\t\t\tcenter: centerlatlng,\n'
+                '\t\t\tmapTypeId: google.maps.MapTypeId.ROADMAP\n'
+                '\t\t};\n'
+                '\t\tvar map = new google.maps.Map(document.getElementById("map_canvas"), myOptions);\n'
+                '\n' % (self.center[0], self.center[1], self.zoom))
+
+    def format_coordinates(self, name, path):
+        if self.encoded:
+            return 'var %s = google.maps.geometry.encoding.decodePath(%s);\n\n' % (name, json.dumps(encode_polyline(path)))
+        return 'var %s = [\n%s];\n\n' % (name, ''.join(['new google.maps.LatLng(%f, %f),\n' % (coordinate[0], coordinate[1]) for coordinate in path]))
+
+    def coordinates_data(self, path):
+        # Encoded polyline string, or flat [lat, lng, lat, lng, ...] list
+        if self.encoded:
+            return encode_polyline(path)
+        return [round(value, 6) for coordinate in path for value in coordinate[:2]]
+
+    def style_data(self, settings, fill=False):
+        style = {'strokeColor': settings.get('color') or settings.get('edge_color'),
+                 'strokeOpacity': settings.get('edge_alpha'),
+                 'strokeWeight': int(settings.get('edge_width'))}
+        if fill:
+            style['fillColor'] = settings.get('face_color')
+            style['fillOpacity'] = settings.get('face_alpha')
+        return style
+
+    def symbol_data(self, symbol, settings):
+        if symbol.symbol not in SYMBOL_SHAPES:
             raise InvalidSymbolError("Symbol %s is not implemented" % symbol.symbol)
 
-        f.write(template.format(lat=symbol.lat, long=symbol.long, size=symbol.size, strokeColor=strokeColor,
-                                strokeOpacity=strokeOpacity, strokeWeight=strokeWeight,
-                                fillColor=fillColor, fillOpacity=fillOpacity))
+        data = self.style_data(settings, fill=True)
+        data.update(symbol=symbol.symbol, lat=round(symbol.lat, 6), lng=round(symbol.long, 6), size=symbol.size)
+        return data
 
-    def write_circle(self, f, lat, long, size, settings):
-        strokeColor = settings.get('color') or settings.get('edge_color')
-        strokeOpacity = settings.get('edge_alpha')
-        strokeWeight = settings.get('edge_width')
-        fillColor = settings.get('face_color')
-        fillOpacity = settings.get('face_alpha')
-        f.write(CIRCLE.format(lat=lat, long=long, size=size, strokeColor=strokeColor,
-                              strokeOpacity=strokeOpacity, strokeWeight=strokeWeight,
-                              fillColor=fillColor, fillOpacity=fillOpacity))
+    def circle_data(self, lat, long, size, settings):
+        data = self.style_data(settings, fill=True)
+        data.update(lat=round(lat, 6), lng=round(long, 6), radius=size)
+        return data
 
-    def write_polyline(self, f, path, settings):
-        clickable = False
-        geodesic = True
-        strokeColor = settings.get('color') or settings.get('edge_color')
-        strokeOpacity = settings.get('edge_alpha')
-        strokeWeight = settings.get('edge_width')
-        closedStatus = settings.get('closed')
-        arrow = settings.get('arrow')
-        dashedLine = settings.get('dashed')
-        
-        #NEW SYMBOLS IMPLEMENTED BY JOSHUA BRUYLANT 02-07-18
-        icon = False
-        if arrow or dashedLine : icon = True
-        if icon:
-           iconList = []
-           if arrow : 
-                iconList.append('arrowSymbol')
-                f.write("var arrowSymbol = {path: google.maps.SymbolPath.FORWARD_OPEN_ARROW, strokeOpacity : 1}\n")
-
-           if dashedLine : 
-                iconList.append('dashedSymbol')
-                f.write("var dashedSymbol = {path: 'M 0,-1 0,1', strokeOpacity: 1, scale: 4}\n")
+    def polyline_data(self, path, settings):
+        #ICON IMPLEMENTED BY JOSHUA BRUYLANT 03-07-18
+        icons = []
+        if settings.get('arrow'):
+            icons.append('arrowSymbol')
+        if settings.get('dashed'):
+            icons.append('dashedSymbol')
         ###
 
-        f.write('var PolylineCoordinates = [\n')
-        
         #CLOSED STATUS IMPLEMENTED BY JOSHUA BRUYLANT 02-07-2018
-        if closedStatus:
+        if settings.get('closed'):
             coords = list(copy.deepcopy(path))
-            f.write('new google.maps.LatLng(%f, %f),\n' %
-                    (coords[-1][0], coords[-1][1]))
-            f.write('new google.maps.LatLng(%f, %f),\n' %
-                    (coords[0][0], coords[0][1]))
+            path = [coords[-1], coords[0]] + coords
         ###
 
-        for coordinate in path:
-            f.write('new google.maps.LatLng(%f, %f),\n' %
-                    (coordinate[0], coordinate[1]))
-
-        f.write('];\n')
-        f.write('\n')
+        data = self.style_data(settings)
+        data.update(path=self.coordinates_data(path), icons=icons)
+        return data
 
-        f.write('var Path = new google.maps.Polyline({\n')
-        f.write('clickable: %s,\n' % (str(clickable).lower()))
-        f.write('geodesic: %s,\n' % (str(geodesic).lower()))
-        f.write('path: PolylineCoordinates,\n')
-        f.write('strokeColor: "%s",\n' % (strokeColor))
-        f.write('strokeOpacity: %f,\n' % (strokeOpacity))
-        f.write('strokeWeight: %d,\n' % (strokeWeight))
-        #ICON IMPLEMENTED BY JOSHUA BRUYLANT 03-07-18
-        f.write("icons: [ \n")
-        if icon:
-            for iconName in iconList:
-               f.write("{ icon: %s, repeat:'50px'}, \n" % (iconName))
-        f.write(" ], \n")
-        ###
-        
-
-        f.write('});\n')
-        f.write('\n')
-        f.write('Path.setMap(map);\n')
-        f.write('\n\n')
-
-    def write_polygon(self, f, path, settings):
+    def format_polygon(self, path, settings):
         clickable = False
         geodesic = True
         strokeColor = settings.get('edge_color') or settings.get('color')
@@ -442,54 +600,62 @@ class GoogleMapPlotter(object):
         strokeWeight = settings.get('edge_width')
         fillColor = settings.get('face_color') or settings.get('color')
         fillOpacity= settings.get('face_alpha')
-        f.write('var coords = [\n')
-        for coordinate in path:
-            f.write('new google.maps.LatLng(%f, %f),\n' %
-                    (coordinate[0], coordinate[1]))
-        f.write('];\n')
-        f.write('\n')
-
-        f.write('var polygon = new google.maps.Polygon({\n')
-        f.write('clickable: %s,\n' % (str(clickable).lower()))
-        f.write('geodesic: %s,\n' % (str(geodesic).lower()))
-        f.write('fillColor: "%s",\n' % (fillColor))
-        f.write('fillOpacity: %f,\n' % (fillOpacity))
-        f.write('paths: coords,\n')
-        f.write('strokeColor: "%s",\n' % (strokeColor))
-        f.write('strokeOpacity: %f,\n' % (strokeOpacity))
-        f.write('strokeWeight: %d\n' % (strokeWeight))
-        f.write('});\n')
-        f.write('\n')
-        f.write('polygon.setMap(map);\n')
-        f.write('\n\n')
+
+        return (self.format_coordinates('coords', path) +
+                'var polygon = new google.maps.Polygon({\n'
+                'clickable: %s,\n'
+                'geodesic: %s,\n'
+                'fillColor: "%s",\n'
+                'fillOpacity: %f,\n'
+                'paths: coords,\n'
+                'strokeColor: "%s",\n'
+                'strokeOpacity: %f,\n'
+                'strokeWeight: %d\n'
+                '});\n'
+                '\n'
+                'polygon.setMap(map);\n'
+                '\n\n' % (str(clickable).lower(), str(geodesic).lower(), fillColor, fillOpacity,
+                          strokeColor, strokeOpacity, strokeWeight))
+
+    # Single object writers, kept for scripts drawing objects one by one
+    def write_coordinates(self, f, name, path):
+        f.write(self.format_coordinates(name, path))
+
+    def write_point(self, f, lat, lon, color, title):
+        f.write('drawMarkers(%s, %s);\n\n' % (to_json([self.coloricon % color]), to_json([[round(lat, 6), round(lon, 6), 0, title]])))
+
+    def write_symbol(self, f, symbol, settings):
+        self.write_layer(f, 'drawSymbols', [self.symbol_data(symbol, settings)])
+
+    def write_circle(self, f, lat, long, size, settings):
+        self.write_layer(f, 'drawCircles', [self.circle_data(lat, long, size, settings)])
+
+    def write_polyline(self, f, path, settings):
+        self.write_layer(f, 'drawPaths', [self.polyline_data(path, settings)])
+
+    def write_polygon(self, f, path, settings):
+        f.write(self.format_polygon(path, settings))
 
     def write_heatmap(self, f):
-        for heatmap_points, settings_string in self.heatmap_points:
-            f.write('var heatmap_points = [\n')
-            for heatmap_lat, heatmap_lng in heatmap_points:
-                f.write('new google.maps.LatLng(%f, %f),\n' %
-                        (heatmap_lat, heatmap_lng))
-            f.write('];\n')
-            f.write('\n')
-            f.write('var pointArray = new google.maps.MVCArray(heatmap_points);' + '\n')
-            f.write('var heatmap;' + '\n')
-            f.write('heatmap = new google.maps.visualization.HeatmapLayer({' + '\n')
-            f.write('\n')
-            f.write('data: pointArray' + '\n')
-            f.write('});' + '\n')
-            f.write('heatmap.setMap(map);' + '\n')
-            f.write(settings_string)
+        f.write(''.join([self.format_coordinates('heatmap_points', heatmap_points) +
+                         'var pointArray = new google.maps.MVCArray(heatmap_points);\n'
+                         'var heatmap;\n'
+                         'heatmap = new google.maps.visualization.HeatmapLayer({\n'
+                         '\n'
+                         'data: pointArray\n'
+                         '});\n'
+                         'heatmap.setMap(map);\n' + settings_string
+                         for heatmap_points, settings_string in self.heatmap_points]))
 
     def write_ground_overlay(self, f):
-
-        for url, bounds_string in self.ground_overlays:
-            f.write(bounds_string)
-            f.write('var groundOverlay;' + '\n')
-            f.write('groundOverlay = new google.maps.GroundOverlay(' + '\n')
-            f.write('\n')
-            f.write("'" + url + "'," + '\n')
-            f.write('imageBounds);' + '\n')
-            f.write('groundOverlay.setMap(map);' + '\n')
+        f.write(''.join([bounds_string +
+                         'var groundOverlay;\n'
+                         'groundOverlay = new google.maps.GroundOverlay(\n'
+                         '\n'
+                         "'" + url + "',\n"
+                         'imageBounds);\n'
+                         'groundOverlay.setMap(map);\n'
+                         for url, bounds_string in self.ground_overlays]))
 
 if __name__ == "__main__":
 
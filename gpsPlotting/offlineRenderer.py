@@ -0,0 +1,159 @@
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+import routeSimplification
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+except ImportError:
+    plt = None
+
+
+"""
+ASPire offline route renderer
+
+DESCRIPTION :
+Draws ASPire's route, links, markers, waypoints and radius circles into a static SVG or PNG image, without a browser, network or API key
+Offers the same plot, marker, marker_cluster and circle calls as gmplot's GoogleMapPlotter, so plotPath() and plotMarkers() draw on either
+Coordinates are projected on a local plane centred on the drawing (see routeSimplification.toLocalPlane) : no map tiles, north is up and scales are true
+The same data always gives the same image, which suits generating many sail summaries in batch
+SVG output has no dependency, PNG output needs matplotlib
+"""
+
+imageSize = 1600 #Pixels, width or height of the image, whichever is larger
+margin = 40 #Pixels around the drawing
+markerRadius = 4 #Pixels
+backgroundColour = '#f4f8fb'
+
+
+"""
+CLASS : OfflineMapPlotter
+Collects what is plotted and draws it with draw()
+Colours are any SVG / CSS colour name or '#rrggbb' value, as accepted by gmplot
+"""
+class OfflineMapPlotter:
+
+    def __init__(self):
+
+        self.paths = [] #(lats, lons, colour, stroke width, alpha, arrow)
+        self.points = [] #(lat, lon, colour, title)
+        self.circles = [] #(lat, lon, radius in metres, colour)
+
+    def plot(self, lats, lngs, color=None, c=None, edge_width=1, edge_alpha=1.0, arrow=False, closed=False, **kwargs):
+
+        lats, lngs = np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float)
+        if closed and len(lats):
+            lats, lngs = np.append(lats, lats[0]), np.append(lngs, lngs[0])
+        self.paths.append((lats, lngs, color or c or 'black', edge_width, edge_alpha, arrow))
+
+    def marker(self, lat, lng, color='#FF0000', c=None, title=''):
+
+        self.points.append((float(lat), float(lng), c or color, title))
+
+    def marker_cluster(self, lats, lngs, color='#FF0000', c=None, titles=None, **kwargs):
+
+        #A static image can't zoom : every marker is drawn
+        titles = titles if titles is not None else [''] * len(lats)
+        for lat, lng, title in zip(lats, lngs, titles):
+            self.marker(lat, lng, c or color, title=title)
+
+    def circle(self, lat, lng, radius, color=None, c=None, **kwargs):
+
+        self.circles.append((float(lat), float(lng), float(radius), color or c or 'black'))
+
+    #Returns the function projecting latitudes and longitudes to image pixels, the image width and height and the number of pixels per metre
+    def getProjection(self):
+
+        lats = np.concatenate([path[0] for path in self.paths] + [np.array([point[0] for point in self.points] + [circle[0] for circle in self.circles])])
+        lons = np.concatenate([path[1] for path in self.paths] + [np.array([point[1] for point in self.points] + [circle[1] for circle in self.circles])])
+        if not len(lats):
+            return (lambda lats, lons: (np.asarray(lats), np.asarray(lons))), imageSize, imageSize, 1.0
+
+        lat0, lon0 = (lats.min() + lats.max()) / 2, (lons.min() + lons.max()) / 2
+        x, y = routeSimplification.toLocalPlane(lats, lons, lat0, lon0)
+
+        #The drawing must also hold the radius circles
+        radii = np.array([circle[2] for circle in self.circles])
+        cx, cy = routeSimplification.toLocalPlane([circle[0] for circle in self.circles], [circle[1] for circle in self.circles], lat0, lon0)
+        minX, maxX = min(x.min(), (cx - radii).min(initial=np.inf)), max(x.max(), (cx + radii).max(initial=-np.inf))
+        minY, maxY = min(y.min(), (cy - radii).min(initial=np.inf)), max(y.max(), (cy + radii).max(initial=-np.inf))
+
+        scale = (imageSize - 2 * margin) / max(maxX - minX, maxY - minY, 1.0)
+        width = int(round((maxX - minX) * scale)) + 2 * margin
+        height = int(round((maxY - minY) * scale)) + 2 * margin
+
+        def project(lats, lons):
+            x, y = routeSimplification.toLocalPlane(lats, lons, lat0, lon0)
+            return margin + (x - minX) * scale, height - margin - (y - minY) * scale
+
+        return project, width, height, scale
+
+    #Draws everything into outputFile, a .png file or else an SVG file
+    def draw(self, outputFile):
+
+        if str(outputFile).lower().endswith('.png'):
+            self.drawPNG(outputFile)
+        else:
+            with open(outputFile, 'w') as f:
+                f.write(self.getSVG())
+
+    def getSVG(self):
+
+        project, width, height, scale = self.getProjection()
+        svg = ['<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}">\n'.format(width, height),
+               '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="6" markerHeight="6" orient="auto-start-reverse">'
+               '<path d="M 0 0 L 10 5 L 0 10" fill="none" stroke="context-stroke" stroke-width="2"/></marker></defs>\n',
+               '<rect width="100%" height="100%" fill="{0}"/>\n'.format(backgroundColour)]
+
+        for lat, lon, radius, colour in self.circles:
+            x, y = project([lat], [lon])
+            svg.append('<circle cx="{0:.1f}" cy="{1:.1f}" r="{2:.1f}" fill="{3}" fill-opacity="0.3" stroke="{3}"/>\n'.format(x[0], y[0], radius * scale, colour))
+
+        for lats, lons, colour, strokeWidth, alpha, arrow in self.paths:
+            x, y = project(lats, lons)
+            points = ' '.join(['{0:.1f},{1:.1f}'.format(px, py) for px, py in zip(x.tolist(), y.tolist())])
+            svg.append('<polyline points="{0}" fill="none" stroke="{1}" stroke-width="{2}" stroke-opacity="{3}" stroke-linejoin="round"{4}/>\n'.format(
+                points, colour, strokeWidth, alpha, ' marker-end="url(#arrow)"' if arrow else ''))
+
+        for lat, lon, colour, title in self.points:
+            x, y = project([lat], [lon])
+            svg.append('<circle cx="{0:.1f}" cy="{1:.1f}" r="{2}" fill="{3}" stroke="black" stroke-width="0.5"><title>{4}</title></circle>\n'.format(
+                x[0], y[0], markerRadius, colour, escape(' '.join(str(title).split()))))
+
+        svg.append('</svg>\n')
+
+        return ''.join(svg)
+
+    def drawPNG(self, outputFile):
+
+        if plt is None:
+            raise ImportError('PNG output needs matplotlib (pip install matplotlib), SVG output has no dependency')
+
+        project, width, height, scale = self.getProjection()
+        dpi = 100
+        figure = plt.figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        axes = figure.add_axes((0, 0, 1, 1))
+        axes.set_xlim(0, width)
+        axes.set_ylim(height, 0)
+        axes.set_axis_off()
+        figure.patch.set_facecolor(backgroundColour)
+
+        for lat, lon, radius, colour in self.circles:
+            x, y = project([lat], [lon])
+            axes.add_patch(plt.Circle((x[0], y[0]), radius * scale, facecolor=colour, edgecolor=colour, alpha=0.3))
+
+        for lats, lons, colour, strokeWidth, alpha, arrow in self.paths:
+            x, y = project(lats, lons)
+            axes.plot(x, y, color=colour, linewidth=strokeWidth, alpha=alpha, solid_joinstyle='round')
+            if arrow and len(x) > 1:
+                axes.annotate('', xy=(x[-1], y[-1]), xytext=(x[-2], y[-2]), arrowprops={'arrowstyle': '->', 'color': colour, 'alpha': alpha})
+
+        if self.points:
+            x, y = project([point[0] for point in self.points], [point[1] for point in self.points])
+            axes.scatter(x, y, s=(2 * markerRadius) ** 2, c=[point[2] for point in self.points], edgecolors='black', linewidths=0.5, zorder=3)
+
+        figure.savefig(outputFile, dpi=dpi, facecolor=backgroundColour)
+        plt.close(figure)
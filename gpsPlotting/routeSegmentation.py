@@ -0,0 +1,158 @@
+import numpy as np
+
+
+"""
+ASPire route segmentation
+
+DESCRIPTION :
+Splits ASPire's route into sections to be plotted separately, a new section starting at every RC switch and after every timeskip
+All boundaries are found in a single vectorized pass over the whole route, sections are then handed out as slices (views) of the coordinate arrays
+Used by gpsPlotting.py
+"""
+
+
+"""
+FUNCTION : getTimeskips
+Finds every timeskip with a single difference between consecutive timestamps
+timeskips[n] is True when more than maxTimeDelta seconds separate point n from point n+1, the last point is never followed by a timeskip
+IN
+    :timestamps - numpy array of datetime64[ms]
+    :maxTimeDelta - float
+OUT
+    :timeskips - numpy array of bool
+"""
+def getTimeskips(timestamps, maxTimeDelta):
+
+    timeskips = np.zeros(len(timestamps), dtype=bool)
+    timeskips[:-1] = np.diff(timestamps) > np.timedelta64(int(maxTimeDelta * 1000), 'ms')
+
+    return timeskips
+
+"""
+FUNCTION : getSegments
+Returns the boundaries of all sections of the route : the first and one past the last point of each, and whether RC is ON during it
+A section ends at point n when the RC status changes between n and n+1 or when n is followed by a timeskip, n is then a link index
+IN
+    :rcStatus - numpy array
+    :timeskips - numpy array of bool
+OUT
+    :starts - numpy array of int
+    :ends - numpy array of int
+    :sectionStatus - numpy array of bool
+    :linkIndexes - numpy array of int
+"""
+def getSegments(rcStatus, timeskips):
+
+    rcStatus = np.asarray(rcStatus, dtype=bool)
+    if not len(rcStatus):
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, np.zeros(0, dtype=bool), empty
+
+    linkIndexes = np.flatnonzero((rcStatus[1:] != rcStatus[:-1]) | timeskips[:-1])
+    starts = np.concatenate(([0], linkIndexes + 1))
+    ends = np.concatenate((linkIndexes + 1, [len(rcStatus)]))
+
+    return starts, ends, rcStatus[starts], linkIndexes
+
+"""
+FUNCTION : getRuns
+Splits the route in runs of consecutive segments of the same class (speed or course range...), segment n joining point n and point n+1
+A run ends when the class changes or before a timeskip, timeskips then being the only link indexes : runs that follow each other share their boundary point
+IN
+    :classes - numpy array of int, one per segment
+    :timeskips - numpy array of bool, one per point
+OUT
+    :starts - numpy array of int, first point of each run
+    :ends - numpy array of int, one past the last point of each run
+    :runClasses - numpy array of int
+    :linkIndexes - numpy array of int
+"""
+def getRuns(classes, timeskips):
+
+    inRun = ~timeskips[:len(classes)] #Segments crossing a timeskip belong to no run
+    newRun = inRun.copy()
+    newRun[1:] &= ~inRun[:-1] | (classes[1:] != classes[:-1])
+    firstSegments = np.flatnonzero(newRun)
+
+    #A run goes on until the segment before the next run or the next timeskip
+    nextBreak = np.flatnonzero(newRun | ~inRun)
+    lastSegments = np.append(nextBreak, len(classes))[np.searchsorted(nextBreak, firstSegments, side='right')] - 1
+
+    return firstSegments, lastSegments + 2, classes[firstSegments], np.flatnonzero(timeskips[:-1])
+
+"""
+FUNCTION : getHysteresisClasses
+Returns the class of each value, the range of edges it falls in, changing class only once a value is more than margin past the range of the class before
+Values hovering around an edge then keep one class instead of switching at every segment
+With circular values (angles), values are taken modulo edges[-1] - edges[0] and the last class is next to the first
+IN
+    :values - numpy array of float
+    :edges - numpy array of float, increasing, values outside them take the first or last class
+    :margin - float, in the unit of values, at most half the narrowest range
+    :circular - bool
+OUT
+    :classes - numpy array of int
+"""
+def getHysteresisClasses(values, edges, margin, circular=False):
+
+    numberOfClasses = len(edges) - 1
+
+    def classify(values):
+        if circular:
+            values = edges[0] + (values - edges[0]) % (edges[-1] - edges[0])
+        return np.clip(np.searchsorted(edges, values, side='right') - 1, 0, numberOfClasses - 1)
+
+    rawClasses, lowestClasses, highestClasses = classify(values), classify(values - margin), classify(values + margin)
+    if not len(values):
+        return rawClasses
+
+    #Only stretches of values with the same classes need to be looked at one by one, values rarely cross an edge
+    changes = np.ones(len(values), dtype=bool)
+    changes[1:] = (rawClasses[1:] != rawClasses[:-1]) | (lowestClasses[1:] != lowestClasses[:-1]) | (highestClasses[1:] != highestClasses[:-1])
+    stretchStarts = np.flatnonzero(changes)
+
+    stretchClasses = []
+    currentClass = int(rawClasses[0])
+    for raw, lowest, highest in zip(rawClasses[stretchStarts].tolist(), lowestClasses[stretchStarts].tolist(), highestClasses[stretchStarts].tolist()):
+        #Classes from lowest to highest are those within margin, counted round the circle when circular
+        if (currentClass - lowest) % numberOfClasses > (highest - lowest) % numberOfClasses:
+            currentClass = raw
+        stretchClasses.append(currentClass)
+
+    return np.repeat(stretchClasses, np.diff(np.append(stretchStarts, len(values))))
+
+"""
+FUNCTION : getLinkPairs
+Returns the coordinates of the links to draw between the end of a section and the start of the next one
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :linkIndexes - numpy array of int
+OUT
+    :linkLats - numpy array of shape (number of links, 2)
+    :linkLons - numpy array of shape (number of links, 2)
+"""
+def getLinkPairs(lats, lons, linkIndexes):
+
+    pairs = np.column_stack((linkIndexes, linkIndexes + 1))
+
+    return lats[pairs], lons[pairs]
+
+"""
+FUNCTION : iterSections
+Yields the latitudes and longitudes of each section as views on lats and lons, along with its RC status
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :starts - numpy array of int
+    :ends - numpy array of int
+    :sectionStatus - numpy array of bool
+OUT
+    :sectionLats - numpy array of float
+    :sectionLons - numpy array of float
+    :status - bool
+"""
+def iterSections(lats, lons, starts, ends, sectionStatus):
+
+    for start, end, status in zip(starts.tolist(), ends.tolist(), sectionStatus.tolist()):
+        yield lats[start:end], lons[start:end], status
@@ -0,0 +1,133 @@
+import numpy as np
+
+from trackMetrics import earthRadius
+
+
+"""
+ASPire route simplification
+
+DESCRIPTION :
+Removes the GPS points that don't visibly change the route before it is written to the map
+Uses the Douglas-Peucker algorithm : a point is kept only if it is further than the tolerance (in metres) from the simplified line
+The first and last points of a section are always kept, so RC switches and timeskips stay where they were
+Used by gpsPlotting.py
+"""
+
+
+"""
+FUNCTION : toLocalPlane
+Projects latitudes and longitudes on a plane tangent to the earth at (lat0, lon0), good to a few centimetres over a few kilometres
+If lat0 and lon0 aren't given, the mean position is used
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :lat0 - float
+    :lon0 - float
+OUT
+    :x - numpy array of float, metres towards the east
+    :y - numpy array of float, metres towards the north
+"""
+def toLocalPlane(lats, lons, lat0=None, lon0=None):
+
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if lat0 is None:
+        lat0 = lats.mean()
+    if lon0 is None:
+        lon0 = lons.mean()
+
+    x = np.radians(lons - lon0) * earthRadius * np.cos(np.radians(lat0))
+    y = np.radians(lats - lat0) * earthRadius
+
+    return x, y
+
+"""
+FUNCTION : fromLocalPlane
+Converts positions on the plane tangent to the earth at (lat0, lon0) back to latitudes and longitudes, inverse of toLocalPlane
+IN
+    :x - numpy array of float, metres towards the east
+    :y - numpy array of float, metres towards the north
+    :lat0 - float
+    :lon0 - float
+OUT
+    :lats - numpy array of float
+    :lons - numpy array of float
+"""
+def fromLocalPlane(x, y, lat0, lon0):
+
+    lats = lat0 + np.degrees(np.asarray(y, dtype=float) / earthRadius)
+    lons = lon0 + np.degrees(np.asarray(x, dtype=float) / (earthRadius * np.cos(np.radians(lat0))))
+
+    return lats, lons
+
+"""
+FUNCTION : douglasPeucker
+Returns the indexes of the points to keep so that no removed point is further than tolerance from the simplified line
+All spans between kept points are split at the same time : each pass computes the distance of every undecided point to the chord of its span at once
+Takes about log2(number of points) passes on a GPS track instead of one numpy call per span
+IN
+    :x - numpy array of float
+    :y - numpy array of float
+    :tolerance - float
+OUT
+    :keptIndexes - numpy array of int
+"""
+def douglasPeucker(x, y, tolerance):
+
+    numberOfPoints = len(x)
+    if numberOfPoints < 3:
+        return np.arange(numberOfPoints)
+
+    keep = np.zeros(numberOfPoints, dtype=bool)
+    keep[0] = keep[-1] = True
+    candidates = np.arange(1, numberOfPoints - 1) #Points not yet kept or dropped, in increasing order
+
+    while len(candidates):
+        keptIndexes = np.flatnonzero(keep)
+        span = np.searchsorted(keptIndexes, candidates) #Span of each candidate, between keptIndexes[span-1] and keptIndexes[span]
+        start, end = keptIndexes[span - 1], keptIndexes[span]
+
+        chordX, chordY = x[end] - x[start], y[end] - y[start]
+        pointsX, pointsY = x[candidates] - x[start], y[candidates] - y[start]
+        chordLength2 = chordX * chordX + chordY * chordY
+
+        #Distance to the chord as a segment, not a line, so that a boat coming back on its track isn't flattened
+        t = np.clip((pointsX * chordX + pointsY * chordY) / np.where(chordLength2 > 0, chordLength2, 1), 0, 1)
+        distances = np.hypot(pointsX - t * chordX, pointsY - t * chordY)
+
+        #Furthest point of each span, the first one if several are as far
+        groupStarts = np.flatnonzero(np.r_[True, span[1:] != span[:-1]])
+        group = np.cumsum(np.r_[True, span[1:] != span[:-1]]) - 1
+        maxDistances = np.maximum.reduceat(distances, groupStarts)
+        furthest = np.flatnonzero(distances == maxDistances[group])
+        furthest = furthest[np.r_[True, group[furthest][1:] != group[furthest][:-1]]]
+
+        #Spans with a point out of tolerance are split there, the others are done
+        split = maxDistances > tolerance
+        keep[candidates[furthest[split]]] = True
+        undecided = split[group]
+        undecided[furthest] = False
+        candidates = candidates[undecided]
+
+    return np.flatnonzero(keep)
+
+"""
+FUNCTION : simplifySection
+Simplifies one section of the route, its first and last points are always kept
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :tolerance - float, metres
+OUT
+    :simplifiedLats - numpy array of float
+    :simplifiedLons - numpy array of float
+"""
+def simplifySection(lats, lons, tolerance):
+
+    if tolerance <= 0 or len(lats) < 3:
+        return lats, lons
+
+    x, y = toLocalPlane(lats, lons)
+    keptIndexes = douglasPeucker(x, y, tolerance)
+
+    return lats[keptIndexes], lons[keptIndexes]
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+import gpsFilter
+import routeSimplification
+
+
+"""
+Tests of gpsFilter.py, run with : python3 -m pytest
+Outliers are checked against plain loops over each point's window, and chunked filtering against a single chunk
+"""
+
+pointDtype = np.dtype([('t_timestamp', 'datetime64[ms]'), ('latitude', float), ('longitude', float), ('rc_on', float)])
+
+
+#Random walk with jumps, and rows without a position
+def createRoute(numberOfPoints=1200, seed=0):
+
+    rng = np.random.default_rng(seed)
+    points = np.zeros(numberOfPoints, dtype=pointDtype)
+    points['t_timestamp'] = np.datetime64('2018-06-28T07:00:00') + np.cumsum(rng.integers(500, 1500, numberOfPoints)).astype('timedelta64[ms]')
+    points['latitude'] = 60.1 + np.cumsum(rng.normal(0, 2e-5, numberOfPoints))
+    points['longitude'] = 19.9 + np.cumsum(rng.normal(0, 4e-5, numberOfPoints))
+    points['rc_on'] = rng.integers(0, 2, numberOfPoints)
+
+    jumps = rng.random(numberOfPoints) < 0.03
+    points['latitude'][jumps] += rng.normal(0, 5e-4, jumps.sum())
+    points['longitude'][rng.random(numberOfPoints) < 0.05] = np.nan
+
+    return points
+
+
+def filterRoute(points, chunkSize, **options):
+
+    pointFilter = gpsFilter.GPSFilter(**options)
+    chunks = list(pointFilter.filterChunks(points[start:start + chunkSize] for start in range(0, len(points), chunkSize)))
+
+    return (np.concatenate(chunks) if chunks else points[:0]), pointFilter.removed
+
+
+def referenceMedians(values, halfWindow):
+
+    return np.array([np.median(values[max(0, n - halfWindow):n + halfWindow + 1]) for n in range(len(values))])
+
+
+def referenceHampel(values, halfWindow, threshold, minDeviation):
+
+    deviations = np.abs(values - referenceMedians(values, halfWindow))
+    spread = gpsFilter.madToStandardDeviation * referenceMedians(deviations, halfWindow)
+
+    return deviations > np.maximum(threshold * spread, minDeviation)
+
+
+@pytest.mark.parametrize('halfWindow', [1, 3, 5])
+def test_rollingMedianMatchesLoop(halfWindow):
+
+    values = np.random.default_rng(halfWindow).normal(0, 10, 200)
+
+    assert np.allclose(gpsFilter.rollingMedian(values, halfWindow), referenceMedians(values, halfWindow))
+
+
+@pytest.mark.parametrize('halfWindow, threshold, minDeviation', [(2, 3.0, 10.0), (5, 2.0, 0.0), (4, 3.0, 1.0)])
+def test_hampelOutliersMatchLoop(halfWindow, threshold, minDeviation):
+
+    values = np.cumsum(np.random.default_rng(halfWindow).normal(0, 5, 500))
+    values[::37] += 80
+
+    assert np.array_equal(gpsFilter.hampelOutliers(values, halfWindow, threshold, minDeviation), referenceHampel(values, halfWindow, threshold, minDeviation))
+
+
+def test_spikeOutliersOnlyRemoveSingleJumps():
+
+    lats = np.full(6, 60.1) + np.arange(6) * 1e-5
+    lons = np.full(6, 19.9)
+    lats[3] += 0.01 #About 1 km away and back within a second each way
+    timestamps = np.datetime64('2018-06-28T07:00:00') + np.arange(6).astype('timedelta64[s]')
+
+    assert gpsFilter.spikeOutliers(lats, lons, timestamps, 10.0).tolist() == [False, False, False, True, False, False]
+
+
+@pytest.mark.parametrize('options', [
+    {'hampelWindow': 5, 'hampelThreshold': 2.0, 'minDeviation': 0.0},
+    {'hampelWindow': 3},
+    {'maxSpeed': 3.0},
+    {'maxSpeed': 5.0, 'hampelWindow': 4, 'kalman': True},
+])
+def test_chunkedFilteringMatchesWholeRoute(options):
+
+    points = createRoute()
+    whole, removed = filterRoute(points, len(points), **options)
+    assert removed > 0
+
+    for chunkSize in (1, 2, 7, 13, 100, 999):
+        chunked, chunkedRemoved = filterRoute(points, chunkSize, **options)
+        assert chunkedRemoved == removed
+        assert np.array_equal(chunked['t_timestamp'], whole['t_timestamp'])
+        assert np.array_equal(chunked['rc_on'], whole['rc_on'])
+        assert np.allclose(chunked['latitude'], whole['latitude'], rtol=0, atol=1e-12, equal_nan=True)
+        assert np.allclose(chunked['longitude'], whole['longitude'], rtol=0, atol=1e-12, equal_nan=True)
+
+
+def test_filterKeepsRowsWithoutPosition():
+
+    points = createRoute()
+    kept, removed = filterRoute(points, 50, maxSpeed=3.0, hampelWindow=3)
+
+    assert len(kept) + removed == len(points)
+    assert np.isnan(kept['longitude']).sum() == np.isnan(points['longitude']).sum()
+
+
+def test_hampelFilterRemovesTheSameAsLoop():
+
+    points = createRoute(seed=1)
+    kept, removed = filterRoute(points, 64, hampelWindow=4, hampelThreshold=3.0, minDeviation=5.0)
+
+    positioned = points[np.isfinite(points['latitude']) & np.isfinite(points['longitude'])]
+    x, y = routeSimplification.toLocalPlane(positioned['latitude'], positioned['longitude'], positioned['latitude'][0], positioned['longitude'][0])
+    outliers = referenceHampel(x, 4, 3.0, 5.0) | referenceHampel(y, 4, 3.0, 5.0)
+
+    assert removed == outliers.sum()
+    assert np.array_equal(kept['t_timestamp'][np.isfinite(kept['longitude'])], positioned['t_timestamp'][~outliers])
@@ -0,0 +1,202 @@
+import os
+import csv
+import sys
+import sqlite3
+
+import numpy as np
+import pytest
+
+import gpsLoader
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logExtraction'))
+import extractionEngine
+
+
+"""
+Tests of gpsLoader.py, run with : python3 -m pytest
+Loaded points are checked against the GPS CSV read row by row with the csv module, as CSVToLists() used to
+"""
+
+sampleCSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'CSV Files', 'logsTestSail_2806.csv')
+
+
+#Points of the GPS CSV read one row at a time, rows missing a position or holding null data being skipped
+def referencePoints(gpsCSV, minSatThreshold):
+
+    times, lats, lons, rcStatus = [], [], [], []
+    with open(gpsCSV, 'r', newline='') as csvFile:
+        reader = csv.reader(csvFile)
+        header = next(reader)
+        timeCol, latCol, lonCol, satCol, rcCol = [header.index(column) for column in gpsLoader.gpsColumns]
+        for row in reader:
+            if '' in (row[timeCol], row[latCol], row[lonCol], row[satCol]) or int(row[satCol]) < minSatThreshold:
+                continue
+            rc = float(row[rcCol]) if row[rcCol] != '' else 0.0
+            if gpsLoader.nullValue in (float(row[latCol]), float(row[lonCol]), rc):
+                continue
+            times.append(row[timeCol])
+            lats.append(float(row[latCol]))
+            lons.append(float(row[lonCol]))
+            rcStatus.append(rc)
+
+    return times, lats, lons, rcStatus
+
+
+def assertSamePoints(loaded, expected):
+
+    times, timestamps, lats, lons, rcStatus = loaded
+    assert times.tolist() == expected[0]
+    assert timestamps.tolist() == np.char.replace(np.array(expected[0], dtype=str), '_', 'T').astype('datetime64[ms]').tolist()
+    assert lats.tolist() == expected[1] and lons.tolist() == expected[2] and rcStatus.tolist() == expected[3]
+
+
+#Writes a GPS CSV with the columns in a shuffled order between other columns, some rows seen by few satellites, empty cells and null data
+def createCSV(path, seed, numberOfRows=500):
+
+    rng = np.random.default_rng(seed)
+    header = ['rc_on', 'wind.speed', 't_timestamp', 'latitude', '', 'satellites_used', 'longitude']
+    order = rng.permutation(len(header))
+    with open(path, 'w') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow([header[n] for n in order])
+        for n in range(numberOfRows):
+            row = [str(int(rng.integers(0, 2))), '{0:.2f}'.format(rng.uniform(0, 10)), '2018-06-28_07:{0:02d}:{1:02d}.{2:03d}'.format(n // 60 % 60, n % 60, int(rng.integers(0, 1000))),
+                   '{0:.8f}'.format(60.1 + rng.normal(0, 1e-3)), '', str(int(rng.integers(3, 10))), '{0:.8f}'.format(19.9 + rng.normal(0, 1e-3))]
+            draw = rng.random()
+            if draw < 0.05:
+                row[3] = row[6] = row[5] = '' #No GPS row close enough, see logExtraction
+            elif draw < 0.08:
+                row[0] = ''
+            elif draw < 0.1:
+                row[3] = '-2000'
+            writer.writerow([row[n] for n in order])
+
+
+@pytest.mark.parametrize('minSatThreshold', [0, 5, 8])
+def test_sampleCSVMatchesRowByRow(minSatThreshold):
+
+    assertSamePoints(gpsLoader.loadGPSCSV(sampleCSV, minSatThreshold), referencePoints(sampleCSV, minSatThreshold))
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('chunkSize', [1, 7, 100, 10000])
+def test_shuffledColumnsAndEmptyCells(tmp_path, seed, chunkSize):
+
+    gpsCSV = str(tmp_path / 'gps.csv')
+    createCSV(gpsCSV, seed)
+
+    assertSamePoints(gpsLoader.loadGPSCSV(gpsCSV, 5, chunkSize), referencePoints(gpsCSV, 5))
+
+
+def test_chunksOnlyHoldTheirOwnLines(tmp_path):
+
+    gpsCSV = str(tmp_path / 'gps.csv')
+    createCSV(gpsCSV, 0, numberOfRows=95)
+    chunks = list(gpsLoader.iterGPSChunks(gpsCSV, 0, chunkSize=10))
+
+    assert len(chunks) == 10
+    assert np.concatenate(chunks)['t_timestamp'].tolist() == referencePoints(gpsCSV, 0)[0]
+
+
+def test_emptyFileAndInvalidValues(tmp_path):
+
+    gpsCSV = str(tmp_path / 'gps.csv')
+    with open(gpsCSV, 'w') as f:
+        f.write('t_timestamp,latitude,longitude,satellites_used,rc_on\n')
+    times, timestamps, lats, lons, rcStatus = gpsLoader.loadGPSCSV(gpsCSV, 5)
+    assert len(times) == len(timestamps) == len(lats) == len(lons) == len(rcStatus) == 0
+
+    with open(gpsCSV, 'a') as f:
+        f.write('2018-06-28_07:34:55.850,60.1,,7,0\n2018-06-28_07:34:56.850,north,19.9,7,0\n')
+    with pytest.raises(ValueError):
+        gpsLoader.loadGPSCSV(gpsCSV, 5)
+
+    with open(gpsCSV, 'w') as f:
+        f.write('t_timestamp,latitude,longitude,rc_on\n')
+    with pytest.raises(ValueError):
+        gpsLoader.loadGPSCSV(gpsCSV, 5)
+
+
+#Layout of logsTestSail : rc_on from the primary table, the GPS columns matched to it from dataLogs_gps, which has gaps longer than the tolerance
+def test_mergedCSVWithGapsLoads(tmp_path):
+
+    dbPath = str(tmp_path / 'asr.db')
+    conn = sqlite3.connect(dbPath)
+    conn.execute('CREATE TABLE dataLogs_arduino (id INTEGER PRIMARY KEY, t_timestamp TEXT, rc_on INTEGER)')
+    conn.execute('CREATE TABLE dataLogs_gps (id INTEGER PRIMARY KEY, t_timestamp TEXT, latitude DOUBLE, longitude DOUBLE, satellites_used INTEGER)')
+    conn.executemany('INSERT INTO dataLogs_arduino (t_timestamp, rc_on) VALUES (?, ?)',
+                     [('2018-06-28_07:00:{0:02d}.000'.format(n), n // 20 % 2) for n in range(60)])
+    gpsSeconds = [n for n in range(60) if not 10 <= n < 25 and not 40 <= n < 43] #GPS lost twice
+    conn.executemany('INSERT INTO dataLogs_gps (t_timestamp, latitude, longitude, satellites_used) VALUES (?, ?, ?, ?)',
+                     [('2018-06-28_07:00:{0:02d}.100'.format(n), 60.1 + n * 1e-5, 19.9, 7) for n in gpsSeconds])
+    conn.commit()
+
+    gpsCSV = str(tmp_path / 'logsTestSail.csv')
+    outputList = ['dataLogs_arduino.rc_on', 'dataLogs_arduino.t_timestamp', 'dataLogs_gps.latitude', 'dataLogs_gps.longitude', 'dataLogs_gps.satellites_used']
+    try:
+        extractionEngine.extractToFile(conn, outputList, gpsCSV)
+    finally:
+        conn.close()
+
+    with open(gpsCSV) as f:
+        assert ',,,' in f.read()
+    times, timestamps, lats, lons, rcStatus = gpsLoader.loadGPSCSV(gpsCSV, 5)
+    assert times.tolist() == ['2018-06-28_07:00:{0:02d}.000'.format(n) for n in gpsSeconds]
+    assert np.allclose(lats, 60.1 + np.array(gpsSeconds) * 1e-5)
+    assert rcStatus.tolist() == [n // 20 % 2 for n in gpsSeconds]
+
+
+#Test sail database whose GPS table has logger duplicates, null data, empty rc_on and points seen by few satellites
+def createDatabase(dbPath, seed, numberOfRows=400):
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n in range(numberOfRows):
+        if rows and rng.random() < 0.1:
+            rows.append(rows[-1])
+            continue
+        draw = rng.random()
+        rows.append(('2018-06-28_07:{0:02d}:{1:02d}.{2:03d}'.format(n // 60 % 60, n % 60, int(rng.integers(0, 1000))),
+                     -2000.0 if draw < 0.03 else round(60.1 + n * 2e-5 + rng.normal(0, 1e-5), 8), round(19.9 + rng.normal(0, 2e-5), 8),
+                     int(rng.integers(3, 10)), -2000 if 0.03 <= draw < 0.06 else None if 0.06 <= draw < 0.09 else n // 50 % 2))
+
+    conn = sqlite3.connect(dbPath)
+    conn.execute('CREATE TABLE dataLogs_gps (id INTEGER PRIMARY KEY, t_timestamp TEXT, latitude DOUBLE, longitude DOUBLE, satellites_used INTEGER, rc_on INTEGER)')
+    conn.executemany('INSERT INTO dataLogs_gps (t_timestamp, latitude, longitude, satellites_used, rc_on) VALUES (?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+
+class CountingFilter:
+
+    def __init__(self):
+
+        self.points = []
+
+    def filterChunks(self, chunks):
+
+        for chunk in chunks:
+            self.points.extend(chunk.tolist())
+            yield chunk
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('chunkSize', [1, 9, 10000])
+def test_databaseGivesTheSamePointsAsExtractedCSV(tmp_path, seed, chunkSize):
+
+    dbPath, gpsCSV = str(tmp_path / 'asr.db'), str(tmp_path / 'gps.csv')
+    createDatabase(dbPath, seed)
+    conn = extractionEngine.connectDatabase(dbPath, readOnly=True)
+    try:
+        extractionEngine.extractToFile(conn, ['dataLogs_gps.' + column for column in gpsLoader.gpsColumns], gpsCSV)
+    finally:
+        conn.close()
+
+    csvFilter, databaseFilter = CountingFilter(), CountingFilter()
+    fromCSV = gpsLoader.loadGPSCSV(gpsCSV, 5, chunkSize, csvFilter)
+    fromDatabase = gpsLoader.loadGPSDatabase(dbPath, 5, chunkSize, databaseFilter)
+
+    for csvColumn, databaseColumn in zip(fromCSV, fromDatabase):
+        assert csvColumn.tolist() == databaseColumn.tolist()
+    assert databaseFilter.points == csvFilter.points #The filter doesn't see logger duplicates either
+    assert gpsLoader.nullValue not in fromDatabase[4]
@@ -0,0 +1,356 @@
+import os
+import json
+import shutil
+import subprocess
+import importlib.util
+
+import numpy as np
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('gmplot')
+
+
+"""
+Tests of moddedGMPlot/gmplot.py, run with : python3 -m pytest
+The modded gmplot is loaded from its file, it replaces gmplot.py inside the installed gmplot package
+Encoded polylines are checked against Google's example and decoded back one character at a time
+"""
+
+spec = importlib.util.spec_from_file_location('moddedGMPlot', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'moddedGMPlot', 'gmplot.py'))
+moddedGMPlot = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(moddedGMPlot)
+
+
+#Decodes an encoded polyline back to (lat, lng) rounded to 5 decimals
+def decodePolyline(encoded):
+
+    values, value, shift = [], 0, 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+
+    return [(lat / 1e5, lng / 1e5) for lat, lng in zip(np.cumsum(values[0::2]).tolist(), np.cumsum(values[1::2]).tolist())]
+
+
+def test_googleExample():
+
+    assert moddedGMPlot.encode_polyline([(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_encodedPolylineDecodesBack(seed):
+
+    rng = np.random.default_rng(seed)
+    lats = np.r_[60.1 + np.cumsum(rng.normal(0, 1e-4, 500)), -33.9, 89.99999, -89.99999]
+    lons = np.r_[19.9 + np.cumsum(rng.normal(0, 2e-4, 500)), 151.2, -179.99999, 179.99999]
+    path = list(zip(lats.tolist(), lons.tolist()))
+    decoded = decodePolyline(moddedGMPlot.encode_polyline(path))
+
+    assert len(decoded) == len(path)
+    assert np.allclose(decoded, np.round(path, 5), rtol=0, atol=1e-9)
+    assert all(63 <= ord(char) < 127 for char in moddedGMPlot.encode_polyline(path))
+
+
+def test_emptyPath():
+
+    assert moddedGMPlot.encode_polyline([]) == ''
+
+
+def test_encodedPlotterWritesDecodablePaths():
+
+    path = [(60.1, 19.9), (60.10012, 19.90034), (60.1003, 19.9)]
+
+    assert decodePolyline(moddedGMPlot.GoogleMapPlotter(60.1, 19.9, 13, encoded=True).coordinates_data(path)) == path
+    assert moddedGMPlot.GoogleMapPlotter(60.1, 19.9, 13).coordinates_data(path) == [value for coordinate in path for value in coordinate]
+
+
+#Plotter holding numberOfPaths arrow and dashed paths, as many markers and a circle
+def createPlotter(numberOfPaths, encoded=False):
+
+    rng = np.random.default_rng(numberOfPaths)
+    gmap = moddedGMPlot.GoogleMapPlotter(60.1, 19.9, 15, encoded=encoded)
+    for n in range(numberOfPaths):
+        lats, lons = 60.1 + np.cumsum(rng.normal(0, 1e-4, 20)), 19.9 + np.cumsum(rng.normal(0, 2e-4, 20))
+        gmap.plot(lats.tolist(), lons.tolist(), '#e67e22' if n % 2 else 'blue', edge_width=2, arrow=True, dashed=n % 3 == 0)
+        gmap.marker(float(lats[0]), float(lons[0]), color='lightsalmon', title='2018-06-28_07:34:{0:02d}.850'.format(n % 60))
+    gmap.circle(60.1, 19.9, 30, color='red')
+
+    return gmap
+
+
+#File-like object counting the calls to write
+class CountingWriter:
+
+    def __init__(self):
+
+        self.writes = 0
+        self.chunks = []
+
+    def write(self, text):
+
+        self.writes += 1
+        self.chunks.append(text)
+
+
+def test_drawGivesTheSamePageToFilesAndStreams(tmp_path):
+
+    gmap = createPlotter(20)
+    html = gmap.draw()
+    gmap.draw(str(tmp_path / 'map.html'))
+    stream = CountingWriter()
+    gmap.draw(stream)
+
+    assert (tmp_path / 'map.html').read_text() == ''.join(stream.chunks) == html
+    assert html.startswith('<html>') and html.endswith('</html>\n')
+
+
+def test_writesDontGrowWithData():
+
+    writes = []
+    for numberOfPaths in (1, 10, 1000):
+        stream = CountingWriter()
+        createPlotter(numberOfPaths).draw(stream)
+        writes.append(stream.writes)
+
+    assert writes[0] == writes[1] == writes[2]
+
+
+@pytest.mark.parametrize('encoded', [False, True])
+def test_symbolsAreDefinedOnce(encoded):
+
+    html = createPlotter(300, encoded).draw()
+
+    assert html.count('FORWARD_OPEN_ARROW') == 1
+    assert html.count('dashedSymbol:') == 1
+    assert html.count('function drawPaths(') == 1
+
+
+#Arguments of every call to a drawing function in the page, read as JSON
+def layerCalls(html, function):
+
+    decoder = json.JSONDecoder()
+    calls = []
+    for line in html.splitlines():
+        if not line.startswith(function + '('):
+            continue
+        arguments, position = [], len(function) + 1
+        while True:
+            value, position = decoder.raw_decode(line, position)
+            arguments.append(value)
+            if line[position] == ')':
+                break
+            position += len(', ')
+        calls.append(arguments)
+
+    return calls
+
+
+#Script of the page, without the Maps API script tag
+def pageScript(html):
+
+    return html.split('<script type="text/javascript">\n')[1].split('</script>')[0]
+
+
+def test_markersAreOneDataLayer():
+
+    gmap = moddedGMPlot.GoogleMapPlotter(60.1, 19.9, 15)
+    gmap.marker(60.1, 19.9, color='lightsalmon', title='first "quoted" </script>')
+    gmap.marker(60.1000004, 19.9, c='red', title='second')
+    gmap.marker(60.2, 19.8, color='#FFA07A', title='third')
+
+    html = gmap.draw()
+    calls = layerCalls(html, 'drawMarkers')
+
+    assert '</' not in pageScript(html)
+    assert len(calls) == 1
+    icons, markers = calls[0]
+    assert icons == [gmap.coloricon % 'FFA07A', gmap.coloricon % 'FF0000']
+    assert markers == [[60.1, 19.9, 0, 'first "quoted" </script>'], [60.1, 19.9, 1, 'second'], [60.2, 19.8, 0, 'third']]
+
+
+@pytest.mark.parametrize('encoded', [False, True])
+def test_pathsAreOneDataLayer(encoded):
+
+    gmap = moddedGMPlot.GoogleMapPlotter(60.1, 19.9, 15, encoded=encoded)
+    path = [(60.1, 19.9), (60.10012, 19.90034), (60.1003, 19.9)]
+    gmap.plot([lat for lat, lng in path], [lng for lat, lng in path], 'blue', edge_width=2, arrow=True)
+    gmap.plot([lat for lat, lng in path], [lng for lat, lng in path], 'yellow', edge_width=3, edge_alpha=0.3, dashed=True, closed=True)
+
+    calls = layerCalls(gmap.draw(), 'drawPaths')
+
+    assert len(calls) == 1
+    first, second = calls[0][0]
+    assert (first['strokeColor'], first['strokeOpacity'], first['strokeWeight'], first['icons']) == ('#0000FF', 1.0, 2, ['arrowSymbol'])
+    assert (second['strokeColor'], second['strokeOpacity'], second['strokeWeight'], second['icons']) == ('#FFFF00', 0.3, 3, ['dashedSymbol'])
+    closedPath = [path[-1], path[0]] + path
+    if encoded:
+        assert (decodePolyline(first['path']), decodePolyline(second['path'])) == (path, closedPath)
+    else:
+        assert (first['path'], second['path']) == ([value for point in path for value in point], [value for point in closedPath for value in point])
+
+
+def test_circlesAndSymbolsAreDataLayers():
+
+    gmap = moddedGMPlot.GoogleMapPlotter(60.1, 19.9, 15)
+    gmap.circle(60.1, 19.9, 30, color='red', face_alpha=0.2)
+    gmap.scatter([60.1, 60.2], [19.9, 19.8], color='blue', size=5, marker=False, symbol='x')
+
+    html = gmap.draw()
+    circles = layerCalls(html, 'drawCircles')
+    symbols = layerCalls(html, 'drawSymbols')
+
+    assert len(circles) == len(symbols) == 1
+    assert circles[0][0] == [{'strokeColor': '#FF0000', 'strokeOpacity': 1.0, 'strokeWeight': 1, 'fillColor': '#FF0000', 'fillOpacity': 0.2,
+                              'lat': 60.1, 'lng': 19.9, 'radius': 30}]
+    assert [(symbol['symbol'], symbol['lat'], symbol['lng'], symbol['size']) for symbol in symbols[0][0]] == [('x', 60.1, 19.9, 5), ('x', 60.2, 19.8, 5)]
+
+    gmap.scatter([60.1], [19.9], marker=False, symbol='*')
+    with pytest.raises(moddedGMPlot.InvalidSymbolError):
+        gmap.draw()
+
+
+def test_pageGrowsWithDataOnly():
+
+    pages = [createPlotter(numberOfPaths).draw() for numberOfPaths in (1, 501)]
+
+    #Drawing code is written once, whatever the number of objects
+    for html in pages:
+        assert html.count('new google.maps.Marker(') == pages[0].count('new google.maps.Marker(')
+        assert html.count('new google.maps.Polyline(') == pages[0].count('new google.maps.Polyline(')
+    #Each path is 20 points of about 20 characters, its style and a marker
+    assert (len(pages[1]) - len(pages[0])) / 500 < 20 * 20 + 200
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node to check the page script')
+def test_pageScriptIsValidJavaScript(tmp_path):
+
+    (tmp_path / 'page.js').write_text(pageScript(createPlotter(5).draw()))
+
+    process = subprocess.run(['node', '--check', str(tmp_path / 'page.js')], capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
+
+
+#Stand-in for the parts of the Maps API the page uses, the map's zoom and bounds are set by the test through theMap
+mapsStub = """
+var theMap, markers = [];
+function LatLng(lat, lng) { this.lat = function() { return lat; }; this.lng = function() { return lng; }; }
+var google = {maps: {
+    LatLng: LatLng,
+    MapTypeId: {ROADMAP: 'roadmap'},
+    SymbolPath: {FORWARD_OPEN_ARROW: 1},
+    Map: function(element, options) {
+        theMap = this;
+        this.listeners = [];
+        this.zoom = options.zoom;
+        this.addListener = function(name, listener) { this.listeners.push(listener); };
+        this.getZoom = function() { return this.zoom; };
+        this.getBounds = function() { return this.bounds; };
+        this.setZoom = function(zoom) { this.zoom = zoom; };
+        this.setCenter = function() {};
+    },
+    Marker: function(options) {
+        this.options = options;
+        this.map = options.map;
+        this.setMap = function(map) { this.map = map; };
+        this.getPosition = function() { return options.position; };
+        this.addListener = function() {};
+        markers.push(this);
+    },
+    Polyline: function() {},
+    Circle: function() {}
+}};
+var document = {getElementById: function() { return {}; }};
+"""
+
+#Shows the map at each view (zoom, south, west, north, east) and prints the markers left on it after each idle event
+viewDriver = """
+initialize();
+var results = [];
+views.forEach(function(view) {
+    theMap.zoom = view[0];
+    theMap.bounds = {getSouthWest: function() { return new LatLng(view[1], view[2]); }, getNorthEast: function() { return new LatLng(view[3], view[4]); }};
+    theMap.listeners.forEach(function(listener) { listener(); });
+    results.push(markers.filter(function(marker) { return marker.map !== null; }).map(function(marker) {
+        return [marker.options.position.lat(), marker.options.position.lng(), marker.options.title, marker.options.label || null];
+    }));
+});
+console.log(JSON.stringify(results));
+"""
+
+
+#Runs the page in node and returns the markers shown at each view
+def shownMarkers(tmp_path, html, views):
+
+    (tmp_path / 'page.js').write_text(mapsStub + pageScript(html) + 'var views = ' + json.dumps(views) + ';\n' + viewDriver)
+    process = subprocess.run(['node', str(tmp_path / 'page.js')], capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
+
+    return json.loads(process.stdout)
+
+
+#Track of about 2 km with a point every 5 m, titled with its index
+def createClusteredPlotter(maxZoom=19):
+
+    rng = np.random.default_rng(0)
+    lats = 60.1 + np.cumsum(np.abs(rng.normal(4e-5, 1e-5, 400)))
+    lons = 19.9 + np.cumsum(rng.normal(0, 4e-5, 400))
+    gmap = moddedGMPlot.GoogleMapPlotter(60.1, 19.9, 15)
+    gmap.marker_cluster(lats, lons, color='lightsalmon', titles=[str(n) for n in range(400)], max_zoom=maxZoom)
+
+    return gmap, np.round(lats, 6), np.round(lons, 6)
+
+
+def test_clusterLayerHoldsEveryPointOnce():
+
+    gmap, lats, lons = createClusteredPlotter()
+    calls = layerCalls(gmap.draw(), 'drawMarkerClusters')
+
+    assert len(calls) == 1
+    icon, coords, titles, gridSize, maxZoom = calls[0]
+    assert icon == gmap.coloricon % 'FFA07A'
+    assert coords == [value for point in zip(lats.tolist(), lons.tolist()) for value in point]
+    assert titles == [str(n) for n in range(400)]
+    assert (gridSize, maxZoom) == (60, 19)
+    #Markers are only created by the clustering code, in the browser
+    assert layerCalls(gmap.draw(), 'drawMarkers') == []
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node to run the clustering code')
+def test_clustersCoverEveryPointInView(tmp_path):
+
+    gmap, lats, lons = createClusteredPlotter()
+    wholeTrack = [lats.min() - 1e-3, lons.min() - 1e-3, lats.max() + 1e-3, lons.max() + 1e-3]
+    southHalf = [lats.min() - 1e-3, lons.min() - 1e-3, float(np.median(lats)), lons.max() + 1e-3]
+    views = [[zoom] + wholeTrack for zoom in (10, 13, 15, 17, 19, 21)] + [[15] + southHalf, [19] + southHalf]
+
+    results = shownMarkers(tmp_path, gmap.draw(), views)
+
+    counts = []
+    for view, shown in zip(views, results):
+        south, west, north, east = view[1:]
+        inView = [n for n in range(len(lats)) if south <= lats[n] <= north and west <= lons[n] <= east]
+        #Each cluster is labelled with its number of points, a single point has no label
+        assert sum(int(label) if label else 1 for lat, lng, title, label in shown) == len(inView)
+        assert all(south <= lat <= north and west <= lng <= east for lat, lng, title, label in shown)
+        if view[0] >= 19:
+            assert sorted(int(title) for lat, lng, title, label in shown) == inView
+            assert all(label is None for lat, lng, title, label in shown)
+        counts.append(len(shown))
+
+    #Zooming in splits clusters, the whole track fits in a few markers when zoomed out
+    assert counts[:6] == sorted(counts[:6])
+    assert counts[0] <= 2 and counts[4] == len(lats)
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node to run the clustering code')
+def test_clustersAreTitledWithTheirFirstAndLastPoint(tmp_path):
+
+    gmap, lats, lons = createClusteredPlotter(maxZoom=21)
+    shown = shownMarkers(tmp_path, gmap.draw(), [[3, 59, 19, 61, 21]])[0]
+
+    assert shown == [[pytest.approx(lats.mean()), pytest.approx(lons.mean()), '0 ... 399', '400']]
@@ -0,0 +1,157 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+import offlineRenderer
+
+
+"""
+Tests of offlineRenderer.py, run with : python3 -m pytest
+A tiny track is drawn and the SVG elements are read back, positions are checked against distances in metres
+"""
+
+svgNamespace = '{http://www.w3.org/2000/svg}'
+
+#About 111 m north then 56 m east, at ASPire's test area
+trackLats = [60.100, 60.101, 60.101]
+trackLons = [19.900, 19.900, 19.901]
+
+
+#Draws the tiny track, two markers and a radius circle
+def createPlotter():
+
+    plotter = offlineRenderer.OfflineMapPlotter()
+    plotter.plot(trackLats, trackLons, color='#0000FF', edge_width=3, edge_alpha=0.5, arrow=True)
+    plotter.marker(60.100, 19.900, color='green', title='Start <RC ON> & go')
+    plotter.marker(60.101, 19.901, c='#FF0000', title='End')
+    plotter.circle(60.1005, 19.9005, 20, color='orange')
+
+    return plotter
+
+
+#Returns the parsed SVG's polylines, marker circles (with a title) and radius circles
+def parseSVG(svg):
+
+    root = ET.fromstring(svg)
+    polylines = root.findall(svgNamespace + 'polyline')
+    circles = root.findall(svgNamespace + 'circle')
+    markers = [circle for circle in circles if circle.find(svgNamespace + 'title') is not None]
+    radiusCircles = [circle for circle in circles if circle.find(svgNamespace + 'title') is None]
+
+    return root, polylines, markers, radiusCircles
+
+
+#Returns the (x, y) pixels of a polyline's points
+def polylinePoints(polyline):
+
+    return np.array([[float(value) for value in point.split(',')] for point in polyline.get('points').split()])
+
+
+def test_svgHoldsTrackMarkersAndCircles():
+
+    root, polylines, markers, radiusCircles = parseSVG(createPlotter().getSVG())
+
+    assert len(polylines) == 1
+    assert polylines[0].get('stroke') == '#0000FF'
+    assert polylines[0].get('stroke-width') == '3'
+    assert polylines[0].get('stroke-opacity') == '0.5'
+    assert polylines[0].get('marker-end') == 'url(#arrow)'
+    assert len(polylinePoints(polylines[0])) == 3
+
+    assert [marker.get('fill') for marker in markers] == ['green', '#FF0000']
+    assert [marker.find(svgNamespace + 'title').text for marker in markers] == ['Start <RC ON> & go', 'End']
+    assert [marker.get('r') for marker in markers] == [str(offlineRenderer.markerRadius)] * 2
+
+    assert len(radiusCircles) == 1
+    assert radiusCircles[0].get('fill') == 'orange'
+
+
+def test_northIsUpAndScalesAreTrue():
+
+    plotter = createPlotter()
+    project, width, height, scale = plotter.getProjection()
+    root, polylines, markers, radiusCircles = parseSVG(plotter.getSVG())
+    points = polylinePoints(polylines[0])
+
+    assert (int(root.get('width')), int(root.get('height'))) == (width, height)
+    assert max(width, height) == offlineRenderer.imageSize
+
+    #North is up, east is right
+    assert points[1][1] < points[0][1] and points[1][0] == pytest.approx(points[0][0], abs=0.1)
+    assert points[2][0] > points[1][0] and points[2][1] == pytest.approx(points[1][1], abs=0.1)
+
+    #0.001 degree of latitude is about 111.2 m, of longitude about 111.2 * cos(60.1) = 55.5 m
+    assert (points[0][1] - points[1][1]) / scale == pytest.approx(111.2, rel=0.01)
+    assert (points[2][0] - points[1][0]) / scale == pytest.approx(55.5, rel=0.01)
+    assert float(radiusCircles[0].get('r')) == pytest.approx(20 * scale, abs=0.1)
+
+    #Markers are drawn where the track passes
+    assert [float(markers[0].get('cx')), float(markers[0].get('cy'))] == pytest.approx(points[0].tolist(), abs=0.1)
+    assert [float(markers[1].get('cx')), float(markers[1].get('cy'))] == pytest.approx(points[2].tolist(), abs=0.1)
+
+
+def test_drawingStaysInsideTheMargins():
+
+    plotter = createPlotter()
+    plotter.circle(60.1, 19.9, 500, color='red') #Reaches further than the track
+    project, width, height, scale = plotter.getProjection()
+    root, polylines, markers, radiusCircles = parseSVG(plotter.getSVG())
+
+    for circle in radiusCircles:
+        x, y, r = float(circle.get('cx')), float(circle.get('cy')), float(circle.get('r'))
+        assert offlineRenderer.margin - 0.5 <= x - r and x + r <= width - offlineRenderer.margin + 0.5
+        assert offlineRenderer.margin - 0.5 <= y - r and y + r <= height - offlineRenderer.margin + 0.5
+
+
+def test_closedPathsAndClustersDrawEveryPoint():
+
+    plotter = offlineRenderer.OfflineMapPlotter()
+    plotter.plot(trackLats, trackLons, c='red', closed=True)
+    plotter.marker_cluster(trackLats, trackLons, color='blue', titles=['a', 'b', 'c'])
+    root, polylines, markers, radiusCircles = parseSVG(plotter.getSVG())
+
+    points = polylinePoints(polylines[0])
+    assert len(points) == 4 and points[0].tolist() == points[-1].tolist()
+    assert polylines[0].get('marker-end') is None
+    assert [marker.find(svgNamespace + 'title').text for marker in markers] == ['a', 'b', 'c']
+
+
+def test_sameTrackGivesTheSameFile(tmp_path):
+
+    createPlotter().draw(str(tmp_path / 'first.svg'))
+    createPlotter().draw(str(tmp_path / 'second.svg'))
+
+    assert (tmp_path / 'first.svg').read_text() == (tmp_path / 'second.svg').read_text() == createPlotter().getSVG()
+
+
+def test_emptyPlotterGivesAnEmptyImage():
+
+    root, polylines, markers, radiusCircles = parseSVG(offlineRenderer.OfflineMapPlotter().getSVG())
+
+    assert (root.get('width'), root.get('height')) == (str(offlineRenderer.imageSize), str(offlineRenderer.imageSize))
+    assert polylines == markers == radiusCircles == []
+
+
+def test_pngHasTheSVGSize(tmp_path):
+
+    pytest.importorskip('matplotlib')
+    import matplotlib.image
+
+    plotter = createPlotter()
+    project, width, height, scale = plotter.getProjection()
+    plotter.draw(str(tmp_path / 'map.png'))
+
+    image = matplotlib.image.imread(str(tmp_path / 'map.png'))
+    assert image.shape[:2] == (height, width)
+    #Something else than the background was drawn
+    assert len(np.unique(image.reshape(-1, image.shape[2]), axis=0)) > 1
+
+
+def test_pngWithoutMatplotlibRaises(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(offlineRenderer, 'plt', None)
+
+    with pytest.raises(ImportError):
+        createPlotter().draw(str(tmp_path / 'map.png'))
+    assert not (tmp_path / 'map.png').exists()
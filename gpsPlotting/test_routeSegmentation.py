@@ -0,0 +1,203 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import gpsLoader
+import routeSegmentation
+
+
+"""
+Tests of routeSegmentation.py, run with : python3 -m pytest
+Boundaries are checked against a loop over the points, like the one plotting used to run
+"""
+
+
+def createRoute(numberOfPoints, seed):
+
+    rng = np.random.default_rng(seed)
+    seconds = np.cumsum(rng.choice([1, 1, 1, 2, 30], numberOfPoints))
+    timestamps = np.datetime64('2018-06-28T07:00:00', 'ms') + seconds.astype('timedelta64[s]')
+    rcStatus = (np.cumsum(rng.random(numberOfPoints) < 0.05) % 2).astype(float)
+
+    return timestamps, rcStatus
+
+
+def referenceTimeskips(timestamps, maxTimeDelta):
+
+    return np.array([n + 1 < len(timestamps) and (timestamps[n + 1] - timestamps[n]) / np.timedelta64(1, 's') > maxTimeDelta for n in range(len(timestamps))])
+
+
+def referenceSegments(rcStatus, timeskips):
+
+    starts, ends, sectionStatus, linkIndexes = [0], [], [bool(rcStatus[0])], []
+    for n in range(1, len(rcStatus)):
+        if rcStatus[n] != rcStatus[n - 1] or timeskips[n - 1]:
+            ends.append(n)
+            starts.append(n)
+            sectionStatus.append(bool(rcStatus[n]))
+            linkIndexes.append(n - 1)
+    ends.append(len(rcStatus))
+
+    return starts, ends, sectionStatus, linkIndexes
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_timeskipsMatchLoop(seed):
+
+    timestamps, rcStatus = createRoute(500, seed)
+
+    for maxTimeDelta in (1.5, 10, 0.5):
+        assert np.array_equal(routeSegmentation.getTimeskips(timestamps, maxTimeDelta), referenceTimeskips(timestamps, maxTimeDelta))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_segmentsMatchLoop(seed):
+
+    timestamps, rcStatus = createRoute(500, seed)
+    timeskips = routeSegmentation.getTimeskips(timestamps, 10)
+    starts, ends, sectionStatus, linkIndexes = routeSegmentation.getSegments(rcStatus, timeskips)
+
+    assert (starts.tolist(), ends.tolist(), sectionStatus.tolist(), linkIndexes.tolist()) == referenceSegments(rcStatus, timeskips)
+
+
+def test_segmentsOfShortRoutes():
+
+    starts, ends, sectionStatus, linkIndexes = routeSegmentation.getSegments(np.zeros(0), np.zeros(0, dtype=bool))
+    assert len(starts) == len(ends) == len(sectionStatus) == len(linkIndexes) == 0
+
+    starts, ends, sectionStatus, linkIndexes = routeSegmentation.getSegments(np.ones(1), np.zeros(1, dtype=bool))
+    assert (starts.tolist(), ends.tolist(), sectionStatus.tolist(), linkIndexes.tolist()) == ([0], [1], [True], [])
+
+
+def test_sectionsAreViews():
+
+    lats, lons = np.arange(10.0), np.arange(10.0) + 100
+    rcStatus = np.array([0, 0, 0, 1, 1, 1, 1, 0, 0, 0])
+    starts, ends, sectionStatus, linkIndexes = routeSegmentation.getSegments(rcStatus, np.zeros(10, dtype=bool))
+    sections = list(routeSegmentation.iterSections(lats, lons, starts, ends, sectionStatus))
+
+    assert [(sectionLats.tolist(), status) for sectionLats, sectionLons, status in sections] == [([0, 1, 2], False), ([3, 4, 5, 6], True), ([7, 8, 9], False)]
+    assert all(np.shares_memory(sectionLats, lats) for sectionLats, sectionLons, status in sections)
+    assert routeSegmentation.getLinkPairs(lats, lons, linkIndexes)[0].tolist() == [[2, 3], [6, 7]]
+
+
+#The section loop plotting ran before timeskips were vectorized : each gap parsed with strptime on whole seconds, the first point never starts a timeskip
+def referencePlotSections(times, rcStatus, maxTimeDelta=30):
+
+    def maxTimeDeltaReached(n):
+        if n == 0 or n >= len(times) - 1:
+            return False
+        currentDatetime = datetime.strptime(times[n].split('.')[0], '%Y-%m-%d_%H:%M:%S')
+        nextDatetime = datetime.strptime(times[n + 1].split('.')[0], '%Y-%m-%d_%H:%M:%S')
+        return nextDatetime - currentDatetime > timedelta(seconds=maxTimeDelta)
+
+    sections, linkIndexes, n = [], [], 0
+    while n < len(rcStatus):
+        status, section = rcStatus[n], []
+        while n < len(rcStatus) and rcStatus[n] == status:
+            if n > 0 and rcStatus[n - 1] != status:
+                linkIndexes.append(n - 1)
+            section.append(n)
+            n += 1
+            if maxTimeDeltaReached(n - 1):
+                linkIndexes.append(n - 1)
+                break
+        sections.append((section[0], section[-1] + 1, bool(status)))
+
+    return sections, sorted(set(linkIndexes))
+
+
+def test_sampleSailMatchesOldLoop():
+
+    sampleCSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'CSV Files', 'logsTestSail_2806.csv')
+    times, timestamps, lats, lons, rcStatus = gpsLoader.loadGPSCSV(sampleCSV, 5)
+
+    timeskips = routeSegmentation.getTimeskips(timestamps, 30)
+    starts, ends, sectionStatus, linkIndexes = routeSegmentation.getSegments(rcStatus, timeskips)
+    sections, referenceLinks = referencePlotSections(times.tolist(), rcStatus.tolist())
+
+    assert timeskips.sum() == 5
+    assert list(zip(starts.tolist(), ends.tolist(), sectionStatus.astype(bool).tolist())) == sections
+    assert sorted(set(linkIndexes.tolist())) == referenceLinks
+
+
+#Runs of segments of the same class, walking the segments one by one
+def referenceRuns(classes, timeskips):
+
+    starts, ends, runClasses = [], [], []
+    for n in range(len(classes)):
+        if timeskips[n]:
+            continue
+        if starts and ends[-1] == n + 1 and runClasses[-1] == classes[n]:
+            ends[-1] = n + 2
+        else:
+            starts.append(n)
+            ends.append(n + 2)
+            runClasses.append(classes[n])
+
+    return starts, ends, runClasses, [n for n in range(len(timeskips) - 1) if timeskips[n]]
+
+
+#Class of each value, kept while the value is within margin of its range
+def referenceHysteresis(values, edges, margin, circular=False):
+
+    period = edges[-1] - edges[0]
+    lastClass = len(edges) - 2
+
+    def rawClass(value):
+        if circular:
+            value = edges[0] + (value - edges[0]) % period
+        return min(max(int(np.searchsorted(edges, value, side='right')) - 1, 0), lastClass)
+
+    def nearRange(value, c):
+        low = -np.inf if c == 0 and not circular else edges[c] - margin
+        high = np.inf if c == lastClass and not circular else edges[c + 1] + margin
+        if circular:
+            return (value - low) % period < high - low
+        return low <= value < high
+
+    classes = []
+    currentClass = rawClass(values[0]) if len(values) else 0
+    for value in values:
+        if not nearRange(value, currentClass):
+            currentClass = rawClass(value)
+        classes.append(currentClass)
+
+    return classes
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_runsMatchLoop(seed):
+
+    rng = np.random.default_rng(seed)
+    timestamps, rcStatus = createRoute(500, seed)
+    timeskips = routeSegmentation.getTimeskips(timestamps, 10)
+    classes = np.cumsum(rng.random(499) < 0.1) % 3
+    starts, ends, runClasses, linkIndexes = routeSegmentation.getRuns(classes, timeskips)
+
+    assert (starts.tolist(), ends.tolist(), runClasses.tolist(), linkIndexes.tolist()) == referenceRuns(classes, timeskips)
+    assert all(ends[k] - 1 == starts[k + 1] for k in range(len(starts) - 1) if not timeskips[ends[k] - 1])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_hysteresisMatchesLoop(seed):
+
+    rng = np.random.default_rng(seed)
+    speeds = np.abs(np.cumsum(rng.normal(0, 0.4, 2000)))
+    speedEdges = np.array([0.0, 1.0, 2.0, 4.0, 6.0, 8.0])
+    courses = np.cumsum(rng.normal(0, 8, 2000)) #Turns round the circle, the class of 350 and 10 are next to each other
+    courseEdges = np.linspace(0, 360, 9)
+
+    for margin in (0.0, 0.2, 0.5):
+        assert routeSegmentation.getHysteresisClasses(speeds, speedEdges, margin).tolist() == referenceHysteresis(speeds, speedEdges, margin)
+    for margin in (0.0, 5.0, 20.0):
+        assert routeSegmentation.getHysteresisClasses(courses, courseEdges, margin, circular=True).tolist() == referenceHysteresis(courses, courseEdges, margin, circular=True)
+
+
+def test_hysteresisKeepsClassNearEdge():
+
+    speeds = np.array([0.5, 1.1, 0.9, 1.1, 0.9, 1.6, 0.9, 0.4])
+
+    assert routeSegmentation.getHysteresisClasses(speeds, np.array([0.0, 1.0, 2.0]), 0.3).tolist() == [0, 0, 0, 0, 0, 1, 1, 0]
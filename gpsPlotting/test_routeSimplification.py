@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import routeSimplification
+
+
+"""
+Tests of routeSimplification.py, run with : python3 -m pytest
+douglasPeucker is checked against the recursive algorithm, splitting one span at a time
+"""
+
+
+#Recursive Douglas-Peucker, distances to the chord as a segment, the first point is taken when several are the furthest
+def referenceDouglasPeucker(x, y, tolerance):
+
+    keep = np.zeros(len(x), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    def split(start, end):
+        if end - start < 2:
+            return
+        chordX, chordY = x[end] - x[start], y[end] - y[start]
+        chordLength2 = chordX * chordX + chordY * chordY
+        bestIndex, bestDistance = -1, -1.0
+        for n in range(start + 1, end):
+            pointX, pointY = x[n] - x[start], y[n] - y[start]
+            t = min(max((pointX * chordX + pointY * chordY) / chordLength2, 0), 1) if chordLength2 > 0 else 0
+            distance = np.hypot(pointX - t * chordX, pointY - t * chordY)
+            if distance > bestDistance:
+                bestIndex, bestDistance = n, distance
+        if bestDistance > tolerance:
+            keep[bestIndex] = True
+            split(start, bestIndex)
+            split(bestIndex, end)
+
+    if len(x) >= 3:
+        split(0, len(x) - 1)
+
+    return np.flatnonzero(keep)
+
+
+#Distance of every point to the polyline of the kept points, measured on the segment of its span
+def spanDistances(x, y, keptIndexes):
+
+    distances = np.zeros(len(x))
+    for start, end in zip(keptIndexes[:-1], keptIndexes[1:]):
+        chord = np.array([x[end] - x[start], y[end] - y[start]])
+        for n in range(start + 1, end):
+            point = np.array([x[n] - x[start], y[n] - y[start]])
+            t = np.clip(point.dot(chord) / chord.dot(chord), 0, 1) if chord.dot(chord) > 0 else 0
+            distances[n] = np.hypot(*(point - t * chord))
+
+    return distances
+
+
+def createTrack(numberOfPoints, seed):
+
+    rng = np.random.default_rng(seed)
+    headings = np.cumsum(rng.normal(0, 0.3, numberOfPoints))
+    steps = rng.uniform(0, 5, numberOfPoints)
+
+    return np.cumsum(steps * np.cos(headings)), np.cumsum(steps * np.sin(headings))
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('tolerance', [0.0, 0.5, 3.0, 20.0])
+def test_douglasPeuckerMatchesRecursion(seed, tolerance):
+
+    x, y = createTrack(400, seed)
+    keptIndexes = routeSimplification.douglasPeucker(x, y, tolerance)
+
+    assert np.array_equal(keptIndexes, referenceDouglasPeucker(x, y, tolerance))
+    assert spanDistances(x, y, keptIndexes).max() <= tolerance
+
+
+def test_douglasPeuckerKeepsBackAndForth():
+
+    #Boat going 100 m east and coming back : both ends of the line are on the chord's line but far from the chord
+    x = np.array([0.0, 50.0, 100.0, 50.0, 0.0, 10.0])
+    y = np.zeros(6)
+
+    assert routeSimplification.douglasPeucker(x, y, 1.0).tolist() == [0, 2, 4, 5]
+
+
+def test_douglasPeuckerShortAndRepeatedPoints():
+
+    assert routeSimplification.douglasPeucker(np.zeros(2), np.zeros(2), 1.0).tolist() == [0, 1]
+    assert routeSimplification.douglasPeucker(np.zeros(5), np.zeros(5), 1.0).tolist() == [0, 4]
+
+
+def test_localPlaneRoundTrip():
+
+    lats = 60.1 + np.linspace(0, 0.02, 50)
+    lons = 19.9 + np.linspace(0, 0.05, 50)
+    x, y = routeSimplification.toLocalPlane(lats, lons, 60.1, 19.9)
+
+    assert np.allclose(routeSimplification.fromLocalPlane(x, y, 60.1, 19.9), (lats, lons), rtol=0, atol=1e-12)
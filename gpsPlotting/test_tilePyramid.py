@@ -0,0 +1,101 @@
+import os
+import json
+import math as m
+
+import numpy as np
+import pytest
+
+import tilePyramid
+
+
+"""
+Tests of tilePyramid.py, run with : python3 -m pytest
+Tile lines are checked against clipping every segment to every tile of its bounding box
+"""
+
+
+#Tiles a segment goes through for more than a point, by clipping it to each tile of its bounding box (Liang-Barsky)
+def referenceSegmentTiles(x1, y1, x2, y2):
+
+    tiles = set()
+    for x in range(m.floor(min(x1, x2)), m.floor(max(x1, x2)) + 1):
+        for y in range(m.floor(min(y1, y2)), m.floor(max(y1, y2)) + 1):
+            enter, leave = 0.0, 1.0
+            for start, delta, low in ((x1, x2 - x1, x), (y1, y2 - y1, y)):
+                if delta == 0:
+                    if not low <= start < low + 1:
+                        enter, leave = 1.0, 0.0
+                    continue
+                t1, t2 = (low - start) / delta, (low + 1 - start) / delta
+                enter, leave = max(enter, min(t1, t2)), min(leave, max(t1, t2))
+            if leave > enter:
+                tiles.add((x, y))
+
+    return tiles
+
+
+#Lines of each tile : runs of consecutive segments of a path in that tile
+def referenceTileLines(tileX, tileY, pathIds):
+
+    tileSegments = {}
+    for n in range(len(pathIds) - 1):
+        if pathIds[n] == pathIds[n + 1]:
+            for tile in referenceSegmentTiles(tileX[n], tileY[n], tileX[n + 1], tileY[n + 1]):
+                tileSegments.setdefault(tile, []).append(n)
+
+    lines = []
+    for (x, y), segments in tileSegments.items():
+        first = segments[0]
+        for previous, segment in zip(segments, segments[1:] + [None]):
+            if segment != previous + 1:
+                lines.append((x, y, first, previous + 1))
+                first = segment
+
+    return sorted(lines)
+
+
+def createPaths(seed, numberOfPaths=4, pointsPerPath=200):
+
+    rng = np.random.default_rng(seed)
+    lats = 60.1 + np.cumsum(rng.normal(0, 5e-4, numberOfPaths * pointsPerPath))
+    lons = 19.9 + np.cumsum(rng.normal(0, 1e-3, numberOfPaths * pointsPerPath))
+    lats[10] = lats[9] #Segment along a tile row
+    lons[20] = lons[19]
+
+    return lats, lons, np.repeat(np.arange(numberOfPaths), pointsPerPath)
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('zoom', [10, 14, 17])
+def test_tileLinesMatchClipping(seed, zoom):
+
+    lats, lons, pathIds = createPaths(seed)
+    tileX, tileY = tilePyramid.toTileCoordinates(lats, lons, zoom)
+    lines = list(zip(*[array.tolist() for array in tilePyramid.getTileLines(tileX, tileY, pathIds)]))
+
+    assert sorted(lines) == referenceTileLines(tileX.tolist(), tileY.tolist(), pathIds.tolist())
+
+
+def test_tileCoordinates():
+
+    tileX, tileY = tilePyramid.toTileCoordinates(np.array([0.0, 85.05112878, -85.05112878]), np.array([0.0, -180.0, 180.0]), 3)
+
+    assert np.allclose(tileX, [4, 0, 8]) and np.allclose(tileY, [4, 0, 8], atol=1e-6)
+
+
+def test_drawWritesEveryListedTile(tmp_path):
+
+    lats, lons, pathIds = createPaths(0, numberOfPaths=2)
+    plotter = tilePyramid.TilePyramidPlotter(maxZoom=15)
+    for pathId in range(2):
+        plotter.plot(lats[pathIds == pathId], lons[pathIds == pathId], color='red')
+    plotter.marker_cluster(lats[::50], lons[::50], titles=[str(n) for n in range(len(lats[::50]))])
+    plotter.draw(str(tmp_path))
+
+    with open(os.path.join(str(tmp_path), 'pyramid.js')) as f:
+        pyramid = json.loads(f.read()[len('var pyramid = '):-2])
+    assert pyramid['maxZoom'] == 15 and pyramid['minZoom'] <= 15
+    for zoom, tileList in pyramid['tiles'].items():
+        assert tileList
+        for x, y in tileList:
+            assert os.path.isfile(os.path.join(str(tmp_path), 'tiles', zoom, str(x), '{0}.js'.format(y)))
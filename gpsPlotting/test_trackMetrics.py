@@ -0,0 +1,186 @@
+import math
+
+import numpy as np
+import pytest
+
+import trackMetrics
+import routeSegmentation
+import routeSimplification
+
+
+"""
+Tests of trackMetrics.py, run with : python3 -m pytest
+Speeds and courses are checked against the same measures taken one point at a time with the math module
+"""
+
+
+def createRoute(numberOfPoints, seed):
+
+    rng = np.random.default_rng(seed)
+    seconds = np.cumsum(rng.choice([0.5, 1, 1, 1, 2, 40], numberOfPoints))
+    timestamps = np.datetime64('2018-06-28T07:00:00', 'ms') + (seconds * 1000).astype('timedelta64[ms]')
+    lats = 60.1 + np.cumsum(rng.normal(0, 2e-5, numberOfPoints))
+    lons = 19.9 + np.cumsum(rng.normal(0, 4e-5, numberOfPoints))
+    lats[5] = lats[4] #Boat not moving
+    lons[5] = lons[4]
+
+    return lats, lons, timestamps
+
+
+def referenceDistance(lat1, lon1, lat2, lon2):
+
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+
+    return 2 * trackMetrics.earthRadius * math.asin(math.sqrt(a))
+
+
+def referenceBearing(lat1, lon1, lat2, lon2):
+
+    if (lat1, lon1) == (lat2, lon2):
+        return math.nan
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    x = math.cos(lat2) * math.sin(lon2 - lon1)
+    y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(lon2 - lon1)
+
+    return math.degrees(math.atan2(x, y)) % 360
+
+
+#First and last point of the window of each segment, walking away from it point by point
+def referenceWindows(timestamps, windowSeconds, timeskips):
+
+    seconds = (timestamps - timestamps[0]) / np.timedelta64(1, 's')
+    windowStarts, windowEnds = [], []
+    for n in range(len(timestamps) - 1):
+        start = n
+        while start > 0 and not timeskips[start - 1] and seconds[start - 1] >= seconds[n] - windowSeconds / 2:
+            start -= 1
+        end = n + 1
+        while end + 1 < len(timestamps) and not timeskips[end] and seconds[end + 1] <= seconds[n + 1] + windowSeconds / 2:
+            end += 1
+        windowStarts.append(start)
+        windowEnds.append(end)
+
+    return windowStarts, windowEnds
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_distancesAndSpeedsMatchLoop(seed):
+
+    lats, lons, timestamps = createRoute(300, seed)
+    distances = [referenceDistance(lats[n], lons[n], lats[n + 1], lons[n + 1]) for n in range(len(lats) - 1)]
+    seconds = [(timestamps[n + 1] - timestamps[n]) / np.timedelta64(1, 's') for n in range(len(lats) - 1)]
+
+    assert np.allclose(trackMetrics.haversineDistances(lats, lons), distances, rtol=1e-9, atol=1e-9)
+    assert np.allclose(trackMetrics.cumulativeDistance(lats, lons), np.r_[0, np.cumsum(distances)], rtol=1e-9, atol=1e-9)
+    assert np.allclose(trackMetrics.speedOverGround(lats, lons, timestamps), np.array(distances) / seconds, rtol=1e-9, atol=1e-9)
+
+    #A few metres between points : the local plane gives the same distances
+    x, y = routeSimplification.toLocalPlane(lats, lons)
+    assert np.allclose(trackMetrics.haversineDistances(lats, lons), np.hypot(np.diff(x), np.diff(y)), rtol=1e-3, atol=1e-3)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_coursesMatchLoop(seed):
+
+    lats, lons, timestamps = createRoute(300, seed)
+    courses = [referenceBearing(lats[n], lons[n], lats[n + 1], lons[n + 1]) for n in range(len(lats) - 1)]
+
+    assert np.allclose(trackMetrics.courseOverGround(lats, lons), courses, rtol=0, atol=1e-9, equal_nan=True)
+    assert np.isnan(trackMetrics.courseOverGround(lats, lons)[4])
+
+
+def test_cardinalCourses():
+
+    lats = np.array([60.0, 60.001, 60.001, 60.0, 60.0])
+    lons = np.array([20.0, 20.0, 20.002, 20.002, 20.0])
+
+    assert np.allclose(trackMetrics.courseOverGround(lats, lons), [0, 90, 180, 270], atol=1e-3)
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('windowSeconds', [0, 3, 10, 60])
+def test_windowsMatchLoop(seed, windowSeconds):
+
+    lats, lons, timestamps = createRoute(300, seed)
+    timeskips = routeSegmentation.getTimeskips(timestamps, 10)
+    windowStarts, windowEnds = referenceWindows(timestamps, windowSeconds, timeskips)
+
+    assert [part.tolist() for part in trackMetrics.getWindows(timestamps, windowSeconds, timeskips)] == [windowStarts, windowEnds]
+
+    seconds = (timestamps - timestamps[0]) / np.timedelta64(1, 's')
+    speeds, courses = [], []
+    for start, end in zip(windowStarts, windowEnds):
+        distance = sum(referenceDistance(lats[n], lons[n], lats[n + 1], lons[n + 1]) for n in range(start, end))
+        speeds.append(distance / (seconds[end] - seconds[start]) if seconds[end] > seconds[start] else math.nan)
+        courses.append(referenceBearing(lats[start], lons[start], lats[end], lons[end]))
+
+    assert np.allclose(trackMetrics.windowSpeedOverGround(lats, lons, timestamps, windowSeconds, timeskips), speeds, rtol=1e-9, atol=1e-9, equal_nan=True)
+    assert np.allclose(trackMetrics.windowCourseOverGround(lats, lons, timestamps, windowSeconds, timeskips), courses, rtol=0, atol=1e-9, equal_nan=True)
+
+
+def test_forwardFill():
+
+    assert np.array_equal(trackMetrics.forwardFill(np.array([np.nan, 1, np.nan, np.nan, 4, np.nan])), [1, 1, 1, 1, 4, 4])
+    assert np.isnan(trackMetrics.forwardFill(np.array([np.nan, np.nan]))).all()
+
+
+#First point reaching each multiple of interval, walking the points one by one
+def referenceEveryInterval(cumulative, interval):
+
+    indexes, k = [], 0
+    for n, value in enumerate(cumulative):
+        if value >= cumulative[0] + k * interval:
+            indexes.append(n)
+            while value >= cumulative[0] + k * interval:
+                k += 1
+
+    return indexes
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('interval', [0.5, 1, 7.3, 60, 10 ** 6])
+def test_everyIntervalMatchesLoop(seed, interval):
+
+    lats, lons, timestamps = createRoute(300, seed)
+
+    for cumulative in (trackMetrics.elapsedSeconds(timestamps), trackMetrics.cumulativeDistance(lats, lons)):
+        assert trackMetrics.everyInterval(cumulative, interval).tolist() == referenceEveryInterval(cumulative, interval)
+
+
+def test_everyIntervalOfNothing():
+
+    assert len(trackMetrics.everyInterval(np.zeros(0), 10)) == 0
+    assert len(trackMetrics.everyInterval(np.arange(10.0), 0)) == 0
+    assert trackMetrics.everyInterval(np.zeros(3), 10).tolist() == [0]
+
+
+#Straight line at 2 m/s for an hour, logged at rate Hz, a few points lost to the satellite filter
+def createSteadyRoute(rate, seed):
+
+    rng = np.random.default_rng(seed)
+    seconds = np.arange(0, 3600, 1 / rate)
+    seconds = seconds[rng.random(len(seconds)) > 0.05]
+    timestamps = np.datetime64('2018-06-28T07:00:00', 'ms') + np.round(seconds * 1000).astype('timedelta64[ms]')
+    lats = 60.1 + seconds * 2 / 111195.0
+    lons = np.full(len(seconds), 19.9)
+
+    return lats, lons, timestamps
+
+
+@pytest.mark.parametrize('interval', [10, 30.5, 600])
+def test_markerCountDoesntDependOnLogRate(interval):
+
+    markerSeconds = []
+    for rate, seed in ((1, 0), (10, 1), (10, 2)):
+        lats, lons, timestamps = createSteadyRoute(rate, seed)
+        seconds = trackMetrics.elapsedSeconds(timestamps)
+        byTime = trackMetrics.everyInterval(seconds, interval)
+        byDistance = trackMetrics.everyInterval(trackMetrics.cumulativeDistance(lats, lons), interval * 2)
+        assert abs(len(byTime) - len(byDistance)) <= 1
+        markerSeconds.append(seconds[byTime])
+
+    #About one marker per interval, within the few points lost around each target
+    for seconds in markerSeconds:
+        assert len(seconds) == len(markerSeconds[0]) == int(3599 // interval) + 1
+        assert np.all(np.abs(seconds - seconds[0] - interval * np.arange(len(seconds))) <= 3)
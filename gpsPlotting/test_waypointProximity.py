@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import waypointProximity
+import routeSegmentation
+import routeSimplification
+
+
+"""
+Tests of waypointProximity.py, run with : python3 -m pytest
+Visits are checked against the distance of every waypoint to every point of the route
+"""
+
+
+def createRoute(numberOfPoints, seed):
+
+    rng = np.random.default_rng(seed)
+    timestamps = np.datetime64('2018-06-28T07:00:00', 'ms') + np.cumsum(rng.choice([1, 1, 2, 60], numberOfPoints)).astype('timedelta64[s]')
+    lats = 60.1 + np.cumsum(rng.normal(0, 3e-5, numberOfPoints))
+    lons = 19.9 + np.cumsum(rng.normal(0, 6e-5, numberOfPoints))
+
+    #Waypoints on the route, near it and a few kilometres away from it
+    onRoute = rng.integers(0, numberOfPoints, 6)
+    wpLats = np.r_[lats[onRoute] + rng.normal(0, 5e-5, 6), lats.mean() + rng.normal(0, 2e-3, 6), 60.2, 60.0]
+    wpLons = np.r_[lons[onRoute] + rng.normal(0, 1e-4, 6), lons.mean() + rng.normal(0, 4e-3, 6), 19.9, 20.2]
+    wpRadii = rng.uniform(5, 40, len(wpLats)).tolist()
+
+    return lats, lons, timestamps, wpLats.tolist(), wpLons.tolist(), wpRadii
+
+
+def referenceVisits(lats, lons, timestamps, timeskips, wpLats, wpLons, wpRadii):
+
+    x, y = routeSimplification.toLocalPlane(lats, lons)
+    wpX, wpY = routeSimplification.toLocalPlane(wpLats, wpLons, lats.mean(), lons.mean())
+    seconds = np.diff(timestamps) / np.timedelta64(1, 's')
+
+    firstEntries, dwellSeconds, closestIndexes, closestDistances = [], [], [], []
+    for waypointX, waypointY, radius in zip(wpX, wpY, wpRadii):
+        distances = [np.hypot(x[n] - waypointX, y[n] - waypointY) for n in range(len(x))]
+        inside = [distance <= radius for distance in distances]
+        firstEntries.append(inside.index(True) if True in inside else -1)
+        dwellSeconds.append(sum(seconds[n] for n in range(len(x) - 1) if inside[n] and inside[n + 1] and not timeskips[n]))
+        closestIndexes.append(int(np.argmin(distances)))
+        closestDistances.append(min(distances))
+
+    return firstEntries, dwellSeconds, closestIndexes, closestDistances
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('cellSize', [None, 3.0, 250.0])
+def test_visitsMatchBruteForce(seed, cellSize):
+
+    lats, lons, timestamps, wpLats, wpLons, wpRadii = createRoute(1500, seed)
+    timeskips = routeSegmentation.getTimeskips(timestamps, 10)
+    firstEntries, dwellSeconds, closestIndexes, closestDistances = waypointProximity.getWaypointVisits(lats, lons, timestamps, timeskips, wpLats, wpLons, wpRadii, cellSize)
+    expected = referenceVisits(lats, lons, timestamps, timeskips, wpLats, wpLons, wpRadii)
+
+    assert firstEntries.tolist() == expected[0]
+    assert np.allclose(dwellSeconds, expected[1])
+    assert closestIndexes.tolist() == expected[2]
+    assert np.allclose(closestDistances, expected[3])
+    assert (firstEntries >= 0).any() and (firstEntries < 0).any()
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_nearestMatchesBruteForce(seed):
+
+    rng = np.random.default_rng(seed)
+    lats, lons = 60.1 + rng.normal(0, 1e-3, 300), 19.9 + rng.normal(0, 2e-3, 300)
+    index = waypointProximity.GridIndex(lats, lons, 20.0)
+
+    for x, y in rng.normal(0, 300, (50, 2)).tolist() + [[5000.0, -8000.0], [0.0, 0.0]]:
+        distances = np.hypot(index.x - x, index.y - y)
+        closest, distance = index.nearest(x, y)
+        assert closest == np.argmin(distances)
+        assert distance == pytest.approx(distances.min())
+
+        inside, insideDistances = index.within(x, y, 60.0)
+        assert inside.tolist() == np.flatnonzero(distances <= 60.0).tolist()
+        assert np.allclose(insideDistances, distances[inside])
+
+
+def test_emptyRouteAndNoWaypoints():
+
+    empty = np.zeros(0)
+    firstEntries, dwellSeconds, closestIndexes, closestDistances = waypointProximity.getWaypointVisits(empty, empty, empty.astype('datetime64[ms]'), empty.astype(bool), [60.1], [19.9], [10.0])
+
+    assert firstEntries.tolist() == [-1] and closestIndexes.tolist() == [-1] and np.isinf(closestDistances).all()
+    assert len(waypointProximity.getWaypointVisits(np.ones(3), np.ones(3), np.zeros(3, dtype='datetime64[ms]'), np.zeros(3, dtype=bool), [], [], [])[0]) == 0
@@ -0,0 +1,359 @@
+import os
+import json
+import math as m
+
+import numpy as np
+
+import routeSimplification
+
+
+"""
+ASPire tile pyramid export
+
+DESCRIPTION :
+Writes ASPire's route as a pyramid of map tiles for very long tracks (weeks of logs), with a light viewer page loading only the tiles in view
+For each zoom level, the route is simplified to about a pixel at that zoom (see routeSimplification.py) and cut along the Web Mercator tile grid
+Each tile is a GeoJSON FeatureCollection, wrapped in a loadTile() call so the viewer also works straight from the disk (file://) without a web server
+Offers the same plot, marker, marker_cluster and circle calls as gmplot's GoogleMapPlotter, so plotPath() and plotMarkers() draw on it :
+    - paths are cut into tiles
+    - markers from marker_cluster (timestamp markers) are put in the tiles of the zoom levels where no tile holds more than maxMarkersPerTile of them
+    - markers from marker (waypoints) and circles are few, they are always shown
+Used by gpsPlotting.py
+
+OUTPUT DIRECTORY :
+    - index.html : the viewer
+    - pyramid.js : bounds, zoom levels, list of the tiles of each zoom level, waypoint markers and circles
+    - tiles/<zoom>/<x>/<y>.js : one GeoJSON tile
+"""
+
+defaultMaxZoom = 17 #Deepest zoom level written, tiles are about 150 metres wide at ASPire's latitude
+pixelTolerance = 1.0 #Simplification tolerance in pixels of each zoom level
+maxMarkersPerTile = 200
+tileSize = 256 #Pixels
+earthCircumference = 40075016.686 #Metres at the equator
+
+
+"""
+FUNCTION : toTileCoordinates
+Projects latitudes and longitudes to Web Mercator tile coordinates at a zoom level, the integer part being the tile
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :zoom - int
+OUT
+    :tileX - numpy array of float
+    :tileY - numpy array of float
+"""
+def toTileCoordinates(lats, lons, zoom):
+
+    scale = 2.0 ** zoom
+    latRadians = np.radians(np.clip(np.asarray(lats, dtype=float), -85.05112878, 85.05112878))
+    tileX = (np.asarray(lons, dtype=float) + 180.0) / 360.0 * scale
+    tileY = (1.0 - np.log(np.tan(latRadians) + 1.0 / np.cos(latRadians)) / m.pi) / 2.0 * scale
+
+    return tileX, tileY
+
+"""
+FUNCTION : getTileLines
+Cuts paths along the tile grid : returns each piece of path lying in one tile, a piece crossing into the next tile keeps its last segment so tiles join
+All paths are handled at once, their points being concatenated
+A segment belongs to every tile it crosses, found from where it crosses the tile borders
+IN
+    :tileX - numpy array of float
+    :tileY - numpy array of float
+    :pathIds - numpy array of int, path of each point
+OUT
+    :lineTileX - numpy array of int
+    :lineTileY - numpy array of int
+    :firstPoints - numpy array of int
+    :lastPoints - numpy array of int, included
+"""
+def getTileLines(tileX, tileY, pathIds):
+
+    segments = np.flatnonzero(pathIds[1:] == pathIds[:-1]) #Segment n joins point n and point n+1
+    if not len(segments):
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, empty, empty
+
+    startX, startY = tileX[segments], tileY[segments]
+    deltaX, deltaY = tileX[segments + 1] - startX, tileY[segments + 1] - startY
+
+    #Each segment is cut where it crosses a tile border, the middle of each piece then gives a tile
+    pieceSegments, pieceStarts = [np.arange(len(segments))], [np.zeros(len(segments))]
+    for start, delta in ((startX, deltaX), (startY, deltaY)):
+        crossings = np.abs(np.floor(start + delta) - np.floor(start)).astype(np.int64)
+        crossingSegments = np.repeat(np.arange(len(segments)), crossings)
+        steps = np.arange(crossings.sum()) - np.repeat(np.cumsum(crossings) - crossings, crossings)
+        direction = np.sign(delta[crossingSegments])
+        borders = np.floor(start[crossingSegments]) + steps * direction + (direction > 0)
+        pieceSegments.append(crossingSegments)
+        pieceStarts.append((borders - start[crossingSegments]) / delta[crossingSegments])
+    pieceSegments, pieceStarts = np.concatenate(pieceSegments), np.concatenate(pieceStarts)
+    order = np.lexsort((pieceStarts, pieceSegments))
+    pieceSegments, pieceStarts = pieceSegments[order], pieceStarts[order]
+    pieceEnds = np.r_[pieceStarts[1:], 1.0]
+    pieceEnds[np.r_[pieceSegments[1:] != pieceSegments[:-1], True]] = 1.0
+    middles = (pieceStarts + pieceEnds) / 2
+    sampleX = np.floor(startX[pieceSegments] + middles * deltaX[pieceSegments]).astype(np.int64)
+    sampleY = np.floor(startY[pieceSegments] + middles * deltaY[pieceSegments]).astype(np.int64)
+    sampleSegments = segments[pieceSegments]
+
+    #Sorted by tile then segment, a line being a run of consecutive segments in the same tile
+    order = np.lexsort((sampleSegments, sampleY, sampleX))
+    sampleX, sampleY, sampleSegments = sampleX[order], sampleY[order], sampleSegments[order]
+    sameTile = (sampleX[1:] == sampleX[:-1]) & (sampleY[1:] == sampleY[:-1])
+    unique = np.r_[True, ~sameTile | (sampleSegments[1:] != sampleSegments[:-1])]
+    sampleX, sampleY, sampleSegments = sampleX[unique], sampleY[unique], sampleSegments[unique]
+
+    newLine = np.r_[True, (sampleX[1:] != sampleX[:-1]) | (sampleY[1:] != sampleY[:-1]) | (sampleSegments[1:] != sampleSegments[:-1] + 1)]
+    lineStarts = np.flatnonzero(newLine)
+    lineEnds = np.r_[lineStarts[1:], len(sampleSegments)] - 1
+
+    return sampleX[lineStarts], sampleY[lineStarts], sampleSegments[lineStarts], sampleSegments[lineEnds] + 1
+
+"""
+FUNCTION : getZoomTolerance
+Returns the size in metres of pixelTolerance pixels at a zoom level and latitude
+IN
+    :zoom - int
+    :lat - float
+OUT
+    :tolerance - float
+"""
+def getZoomTolerance(zoom, lat):
+
+    return pixelTolerance * earthCircumference * m.cos(m.radians(lat)) / (tileSize * 2 ** zoom)
+
+"""
+FUNCTION : simplifyPaths
+Simplifies each path with the Douglas-Peucker algorithm, the first and last points of each are kept
+IN
+    :paths - list of (numpy array of float, numpy array of float), latitudes and longitudes of each path
+    :tolerance - float, metres
+OUT
+    :simplifiedPaths - list of (numpy array of float, numpy array of float)
+"""
+def simplifyPaths(paths, tolerance):
+
+    return [routeSimplification.simplifySection(pathLats, pathLons, tolerance) for pathLats, pathLons in paths]
+
+"""
+CLASS : TilePyramidPlotter
+Collects what is plotted and writes the tile pyramid and its viewer into a directory with draw()
+Zoom levels go from the one showing the whole route on a few tiles to maxZoom
+"""
+class TilePyramidPlotter:
+
+    def __init__(self, maxZoom=defaultMaxZoom):
+
+        self.maxZoom = maxZoom
+        self.paths = [] #(lats, lons, style)
+        self.markers = [] #(lat, lon, colour, title), always shown
+        self.tiledMarkers = [] #(lats, lons, colour, titles)
+        self.circles = [] #(lat, lon, radius in metres, colour)
+
+    def plot(self, lats, lngs, color=None, c=None, edge_width=1, edge_alpha=1.0, closed=False, **kwargs):
+
+        lats, lngs = np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float)
+        if closed and len(lats):
+            lats, lngs = np.append(lats, lats[0]), np.append(lngs, lngs[0])
+        self.paths.append((lats, lngs, {'colour': color or c or 'black', 'width': edge_width, 'opacity': edge_alpha}))
+
+    def marker(self, lat, lng, color='#FF0000', c=None, title=''):
+
+        self.markers.append((round(float(lat), 6), round(float(lng), 6), c or color, ' '.join(str(title).split())))
+
+    def marker_cluster(self, lats, lngs, color='#FF0000', c=None, titles=None, **kwargs):
+
+        titles = titles if titles is not None else [''] * len(lats)
+        self.tiledMarkers.append((np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float), c or color, [' '.join(str(title).split()) for title in titles]))
+
+    def circle(self, lat, lng, radius, color=None, c=None, **kwargs):
+
+        self.circles.append((round(float(lat), 6), round(float(lng), 6), float(radius), color or c or 'black'))
+
+    #Returns the south, west, north and east limits of everything plotted
+    def getBounds(self):
+
+        lats = np.concatenate([path[0] for path in self.paths] + [markers[0] for markers in self.tiledMarkers] + [np.array([marker[0] for marker in self.markers])])
+        lons = np.concatenate([path[1] for path in self.paths] + [markers[1] for markers in self.tiledMarkers] + [np.array([marker[1] for marker in self.markers])])
+        if not len(lats):
+            return [-85.0, -180.0, 85.0, 180.0]
+
+        return [float(lats.min()), float(lons.min()), float(lats.max()), float(lons.max())]
+
+    #Returns the zoom level at which the whole route fits in about 4 tiles in each direction
+    def getMinZoom(self, bounds):
+
+        (west, north), (east, south) = [toTileCoordinates([lat], [lon], 0) for lat, lon in ((bounds[2], bounds[1]), (bounds[0], bounds[3]))]
+        span = max(float(east[0] - west[0]), float(south[0] - north[0]), 1e-9)
+
+        return int(min(max(m.floor(m.log2(4 / span)), 0), self.maxZoom))
+
+    #Returns the features of each tile of a zoom level, keyed by (x, y), paths being the latitudes and longitudes of each path simplified for that zoom
+    def getZoomTiles(self, zoom, paths):
+
+        tiles = {}
+
+        #Paths are concatenated to be cut all at once
+        lats = [pathLats for pathLats, pathLons in paths]
+        lons = [pathLons for pathLats, pathLons in paths]
+        pathIds = [np.full(len(pathLats), n) for n, (pathLats, pathLons) in enumerate(paths)]
+
+        if lats:
+            lats, lons, pathIds = np.concatenate(lats), np.concatenate(lons), np.concatenate(pathIds)
+            tileX, tileY = toTileCoordinates(lats, lons, zoom)
+            coordinates = np.column_stack((lons, lats)).round(6).tolist()
+            for x, y, first, last in zip(*[array.tolist() for array in getTileLines(tileX, tileY, pathIds)]):
+                properties = self.paths[pathIds[first]][2]
+                tiles.setdefault((x, y), []).append({'type': 'Feature', 'properties': properties,
+                                                     'geometry': {'type': 'LineString', 'coordinates': coordinates[first:last + 1]}})
+
+        #Markers only once zoomed in enough
+        for markerLats, markerLons, colour, titles in self.tiledMarkers:
+            tileX, tileY = toTileCoordinates(markerLats, markerLons, zoom)
+            tileX, tileY = np.floor(tileX).astype(np.int64), np.floor(tileY).astype(np.int64)
+            if not len(tileX) or np.unique(np.column_stack((tileX, tileY)), axis=0, return_counts=True)[1].max() > maxMarkersPerTile:
+                continue
+            for x, y, markerLat, markerLon, title in zip(tileX.tolist(), tileY.tolist(), markerLats.round(6).tolist(), markerLons.round(6).tolist(), titles):
+                tiles.setdefault((x, y), []).append({'type': 'Feature', 'properties': {'colour': colour, 'title': title},
+                                                     'geometry': {'type': 'Point', 'coordinates': [markerLon, markerLat]}})
+
+        return tiles
+
+    #Writes the tiles, pyramid.js and the viewer index.html into directory
+    def draw(self, directory):
+
+        bounds = self.getBounds()
+        minZoom = self.getMinZoom(bounds)
+        centreLat = (bounds[0] + bounds[2]) / 2
+        tileLists = {}
+
+        #From the deepest zoom up, each zoom's paths are simplified from those of the zoom below, a few times lighter
+        paths = [(pathLats, pathLons) for pathLats, pathLons, style in self.paths]
+        for zoom in range(self.maxZoom, minZoom - 1, -1):
+            paths = simplifyPaths(paths, getZoomTolerance(zoom, centreLat))
+            tiles = self.getZoomTiles(zoom, paths)
+            tileLists[zoom] = sorted(tiles)
+            for (x, y), features in tiles.items():
+                tileDirectory = os.path.join(directory, 'tiles', str(zoom), str(x))
+                os.makedirs(tileDirectory, exist_ok=True)
+                with open(os.path.join(tileDirectory, '{0}.js'.format(y)), 'w') as f:
+                    f.write('loadTile({0}, {1}, {2}, {3});\n'.format(zoom, x, y, json.dumps({'type': 'FeatureCollection', 'features': features}, separators=(',', ':'))))
+
+        pyramid = {'bounds': bounds, 'minZoom': minZoom, 'maxZoom': self.maxZoom,
+                   'tiles': {str(zoom): [[x, y] for x, y in tileList] for zoom, tileList in tileLists.items()},
+                   'markers': self.markers, 'circles': self.circles}
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'pyramid.js'), 'w') as f:
+            f.write('var pyramid = {0};\n'.format(json.dumps(pyramid, separators=(',', ':'))))
+        with open(os.path.join(directory, 'index.html'), 'w') as f:
+            f.write(viewerPage)
+
+
+viewerPage = """<html>
+<head>
+<meta name="viewport" content="initial-scale=1.0, user-scalable=no" />
+<meta http-equiv="content-type" content="text/html; charset=UTF-8"/>
+<title>ASPire route</title>
+<script type="text/javascript" src="https://maps.googleapis.com/maps/api/js"></script>
+<script type="text/javascript" src="pyramid.js"></script>
+<script type="text/javascript">
+var map;
+var tiles = {}; // 'zoom/x/y' -> features once loaded, null while loading
+var shownZoom = null;
+var existingTiles = {};
+
+function markerIcon(colour) {
+    return {path: google.maps.SymbolPath.CIRCLE, scale: 5, fillColor: colour, fillOpacity: 1, strokeColor: 'black', strokeWeight: 1};
+}
+
+function tileZoom() {
+    return Math.max(pyramid.minZoom, Math.min(pyramid.maxZoom, map.getZoom()));
+}
+
+function toTile(latLng, zoom) {
+    var scale = Math.pow(2, zoom);
+    var lat = Math.max(-85.05112878, Math.min(85.05112878, latLng.lat())) * Math.PI / 180;
+    return {x: Math.floor((latLng.lng() + 180) / 360 * scale),
+            y: Math.floor((1 - Math.log(Math.tan(lat) + 1 / Math.cos(lat)) / Math.PI) / 2 * scale)};
+}
+
+// Called by every tile file
+function loadTile(zoom, x, y, collection) {
+    var key = zoom + '/' + x + '/' + y;
+    tiles[key] = {zoom: zoom, collection: collection, features: null};
+    if (zoom === shownZoom) {
+        tiles[key].features = map.data.addGeoJson(collection);
+    }
+}
+
+function showZoom(zoom) {
+    for (var key in tiles) {
+        var tile = tiles[key];
+        if (tile === null) {
+            continue;
+        }
+        if (tile.zoom !== zoom && tile.features !== null) {
+            tile.features.forEach(function (feature) { map.data.remove(feature); });
+            tile.features = null;
+        } else if (tile.zoom === zoom && tile.features === null) {
+            tile.features = map.data.addGeoJson(tile.collection);
+        }
+    }
+    shownZoom = zoom;
+}
+
+// Loads the tiles in view that exist and weren't loaded yet
+function loadVisibleTiles() {
+    var zoom = tileZoom();
+    if (zoom !== shownZoom) {
+        showZoom(zoom);
+    }
+    var bounds = map.getBounds();
+    var northWest = toTile(new google.maps.LatLng(bounds.getNorthEast().lat(), bounds.getSouthWest().lng()), zoom);
+    var southEast = toTile(new google.maps.LatLng(bounds.getSouthWest().lat(), bounds.getNorthEast().lng()), zoom);
+    var columns = Math.pow(2, zoom);
+    var width = (southEast.x - northWest.x + columns) % columns;
+    for (var i = 0; i <= width; i++) {
+        var x = (northWest.x + i) % columns;
+        for (var y = northWest.y; y <= southEast.y; y++) {
+            var key = zoom + '/' + x + '/' + y;
+            if (existingTiles[key] && !(key in tiles)) {
+                tiles[key] = null;
+                var script = document.createElement('script');
+                script.src = 'tiles/' + key + '.js';
+                document.head.appendChild(script);
+            }
+        }
+    }
+}
+
+function initialize() {
+    for (var zoom in pyramid.tiles) {
+        pyramid.tiles[zoom].forEach(function (tile) { existingTiles[zoom + '/' + tile[0] + '/' + tile[1]] = true; });
+    }
+    map = new google.maps.Map(document.getElementById('map_canvas'), {mapTypeId: google.maps.MapTypeId.ROADMAP});
+    map.fitBounds(new google.maps.LatLngBounds(new google.maps.LatLng(pyramid.bounds[0], pyramid.bounds[1]),
+                                               new google.maps.LatLng(pyramid.bounds[2], pyramid.bounds[3])));
+    map.data.setStyle(function (feature) {
+        return {strokeColor: feature.getProperty('colour'), strokeWeight: feature.getProperty('width'), strokeOpacity: feature.getProperty('opacity'),
+                icon: markerIcon(feature.getProperty('colour')), title: feature.getProperty('title'),
+                clickable: feature.getGeometry().getType() === 'Point'};
+    });
+    pyramid.circles.forEach(function (c) {
+        new google.maps.Circle({map: map, center: new google.maps.LatLng(c[0], c[1]), radius: c[2], clickable: false,
+                                strokeColor: c[3], strokeWeight: 1, fillColor: c[3], fillOpacity: 0.3});
+    });
+    pyramid.markers.forEach(function (m) {
+        new google.maps.Marker({map: map, position: new google.maps.LatLng(m[0], m[1]), icon: markerIcon(m[2]), title: m[3]});
+    });
+    map.addListener('idle', loadVisibleTiles);
+}
+</script>
+</head>
+<body style="margin:0px; padding:0px;" onload="initialize()">
+    <div id="map_canvas" style="width: 100%; height: 100%;"></div>
+</body>
+</html>
+"""
@@ -0,0 +1,240 @@
+import numpy as np
+
+
+"""
+ASPire track metrics
+
+DESCRIPTION :
+Vectorized measures along ASPire's route : distances between consecutive GPS points, distance travelled and elapsed time since the start
+Speed over ground (SOG) and course over ground (COG) of every segment joining two consecutive points
+Also picks points at regular intervals of time or distance with a binary search on these cumulative arrays
+Every function takes whole arrays (as returned by gpsPlotting.CSVToLists) and has no Python loop, so a full day of logs takes milliseconds
+Used by gpsPlotting.py
+"""
+
+earthRadius = 6371000.0 #Mean earth radius in metres
+knotsPerMetrePerSecond = 3600 / 1852.0
+
+
+"""
+FUNCTION : haversineDistances
+Returns the great circle distance between each pair of consecutive points
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+OUT
+    :distances - numpy array of float, metres, one less than the number of points
+"""
+def haversineDistances(lats, lons):
+
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+
+    a = np.sin(np.diff(lats) / 2) ** 2 + np.cos(lats[:-1]) * np.cos(lats[1:]) * np.sin(np.diff(lons) / 2) ** 2
+
+    return 2 * earthRadius * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+"""
+FUNCTION : cumulativeDistance
+Returns the distance travelled from the first point to each point
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+OUT
+    :distance - numpy array of float, metres
+"""
+def cumulativeDistance(lats, lons):
+
+    distance = np.zeros(len(lats))
+    if len(lats) > 1:
+        np.cumsum(haversineDistances(lats, lons), out=distance[1:])
+
+    return distance
+
+"""
+FUNCTION : elapsedSeconds
+Returns the time elapsed from the first point to each point
+IN
+    :timestamps - numpy array of datetime64
+OUT
+    :seconds - numpy array of float
+"""
+def elapsedSeconds(timestamps):
+
+    if not len(timestamps):
+        return np.zeros(0)
+
+    return (timestamps - timestamps[0]) / np.timedelta64(1, 's')
+
+"""
+FUNCTION : segmentSeconds
+Returns the time between each pair of consecutive points
+IN
+    :timestamps - numpy array of datetime64
+OUT
+    :seconds - numpy array of float, one less than the number of points
+"""
+def segmentSeconds(timestamps):
+
+    return np.diff(timestamps) / np.timedelta64(1, 's')
+
+"""
+FUNCTION : speedOverGround
+Returns the speed over ground of each segment joining two consecutive points, NaN where both points have the same time
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :timestamps - numpy array of datetime64
+OUT
+    :speeds - numpy array of float, metres per second, one less than the number of points
+"""
+def speedOverGround(lats, lons, timestamps):
+
+    seconds = segmentSeconds(timestamps)
+
+    return haversineDistances(lats, lons) / np.where(seconds > 0, seconds, np.nan)
+
+"""
+FUNCTION : getWindows
+Returns, for each segment, the first and last point of the window of windowSeconds centred on it, the window stopping at timeskips
+IN
+    :timestamps - numpy array of datetime64
+    :windowSeconds - float
+    :timeskips - numpy array of bool, one per point (see routeSegmentation.getTimeskips)
+OUT
+    :windowStarts - numpy array of int, one less than the number of points
+    :windowEnds - numpy array of int
+"""
+def getWindows(timestamps, windowSeconds, timeskips):
+
+    seconds = elapsedSeconds(timestamps)
+
+    #First and last point of the part of the route between timeskips each point is in
+    sections = np.r_[0, np.cumsum(timeskips[:-1])]
+    firstPoints = np.searchsorted(sections, sections, side='left')
+    lastPoints = np.searchsorted(sections, sections, side='right') - 1
+
+    #Segment n goes from point n to point n+1, its window from half a window before n to half a window after n+1
+    windowStarts = np.maximum(np.searchsorted(seconds, seconds - windowSeconds / 2, side='left'), firstPoints)[:-1]
+    windowEnds = np.minimum(np.searchsorted(seconds, seconds + windowSeconds / 2, side='right') - 1, lastPoints)[1:]
+
+    return windowStarts, windowEnds
+
+"""
+FUNCTION : windowSpeedOverGround
+Returns the speed over ground of each segment averaged over windowSeconds centred on it : distance travelled divided by time taken
+The window stops at timeskips, NaN where its points all have the same time
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :timestamps - numpy array of datetime64
+    :windowSeconds - float
+    :timeskips - numpy array of bool, one per point (see routeSegmentation.getTimeskips)
+OUT
+    :speeds - numpy array of float, metres per second, one less than the number of points
+"""
+def windowSpeedOverGround(lats, lons, timestamps, windowSeconds, timeskips):
+
+    seconds = elapsedSeconds(timestamps)
+    distances = cumulativeDistance(lats, lons)
+    windowStarts, windowEnds = getWindows(timestamps, windowSeconds, timeskips)
+    windowDurations = seconds[windowEnds] - seconds[windowStarts]
+
+    return (distances[windowEnds] - distances[windowStarts]) / np.where(windowDurations > 0, windowDurations, np.nan)
+
+"""
+FUNCTION : bearings
+Returns the initial bearing from each point (lats1, lons1) to the point (lats2, lons2) at the same index, NaN where both are at the same place
+IN
+    :lats1 - numpy array of float
+    :lons1 - numpy array of float
+    :lats2 - numpy array of float
+    :lons2 - numpy array of float
+OUT
+    :courses - numpy array of float, degrees clockwise from north in [0, 360)
+"""
+def bearings(lats1, lons1, lats2, lons2):
+
+    lats1, lons1 = np.radians(np.asarray(lats1, dtype=float)), np.radians(np.asarray(lons1, dtype=float))
+    lats2, lons2 = np.radians(np.asarray(lats2, dtype=float)), np.radians(np.asarray(lons2, dtype=float))
+    deltaLons = lons2 - lons1
+
+    x = np.cos(lats2) * np.sin(deltaLons)
+    y = np.cos(lats1) * np.sin(lats2) - np.sin(lats1) * np.cos(lats2) * np.cos(deltaLons)
+    courses = np.degrees(np.arctan2(x, y)) % 360
+
+    return np.where((x == 0) & (y == 0), np.nan, courses)
+
+"""
+FUNCTION : courseOverGround
+Returns the initial bearing of each segment joining two consecutive points, NaN where both points are at the same place
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+OUT
+    :courses - numpy array of float, degrees clockwise from north in [0, 360), one less than the number of points
+"""
+def courseOverGround(lats, lons):
+
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+
+    return bearings(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+"""
+FUNCTION : windowCourseOverGround
+Returns the course over ground of each segment over windowSeconds centred on it : bearing from the first to the last point of the window
+The window stops at timeskips, NaN where its first and last points are at the same place
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :timestamps - numpy array of datetime64
+    :windowSeconds - float
+    :timeskips - numpy array of bool, one per point
+OUT
+    :courses - numpy array of float, degrees clockwise from north in [0, 360), one less than the number of points
+"""
+def windowCourseOverGround(lats, lons, timestamps, windowSeconds, timeskips):
+
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    windowStarts, windowEnds = getWindows(timestamps, windowSeconds, timeskips)
+
+    return bearings(lats[windowStarts], lons[windowStarts], lats[windowEnds], lons[windowEnds])
+
+"""
+FUNCTION : forwardFill
+Replaces each NaN by the last value before it that isn't NaN, leading NaNs by the first value that isn't
+IN
+    :values - numpy array of float
+OUT
+    :filled - numpy array of float
+"""
+def forwardFill(values):
+
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return values.copy()
+
+    lastValid = np.maximum.accumulate(np.where(valid, np.arange(len(values)), -1))
+    lastValid[lastValid < 0] = np.argmax(valid)
+
+    return values[lastValid]
+
+"""
+FUNCTION : everyInterval
+Returns the indexes of the first points reaching 0, interval, 2*interval... of an increasing cumulative array (time or distance)
+All targets are looked up at once with a binary search, a target falling in a timeskip gives the first point after it
+IN
+    :cumulative - numpy array of float, non decreasing
+    :interval - float
+OUT
+    :indexes - numpy array of int
+"""
+def everyInterval(cumulative, interval):
+
+    if not len(cumulative) or interval <= 0:
+        return np.zeros(0, dtype=int)
+
+    targets = np.arange(cumulative[0], cumulative[-1] + interval / 2, interval)
+    indexes = np.searchsorted(cumulative, targets, side='left')
+
+    return np.unique(indexes[indexes < len(cumulative)])
@@ -0,0 +1,177 @@
+import numpy as np
+
+import routeSimplification
+
+
+"""
+ASPire waypoint proximity
+
+DESCRIPTION :
+Tells when ASPire reached each waypoint of the current mission : first entry in its radius, time spent inside it and closest approach
+The route's points are sorted once into a grid of square cells on a local plane (see routeSimplification.toLocalPlane)
+Each waypoint then only looks at the points of the cells around it, instead of measuring its distance to every point of the route
+Used by gpsPlotting.py
+"""
+
+minCellSize = 10.0 #Metres
+
+
+"""
+CLASS : GridIndex
+Spatial index of the points of a route, sorted by the grid cell they fall in
+Cells are cellSize metres wide, a cell is found from its key with a binary search on the keys of the non empty cells
+"""
+class GridIndex:
+
+    def __init__(self, lats, lons, cellSize, lat0=None, lon0=None):
+
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        self.lat0 = lats.mean() if lat0 is None else lat0
+        self.lon0 = lons.mean() if lon0 is None else lon0
+        self.cellSize = float(cellSize)
+
+        self.x, self.y = routeSimplification.toLocalPlane(lats, lons, self.lat0, self.lon0)
+        column, row = self.getCells(self.x, self.y)
+        self.minColumn, self.minRow = (column.min(), row.min()) if len(column) else (0, 0)
+        self.columns = (column.max() - self.minColumn + 1) if len(column) else 0
+        self.rows = (row.max() - self.minRow + 1) if len(row) else 0
+
+        #Points sorted by cell, in route order inside each cell
+        keys = (column - self.minColumn) * self.rows + (row - self.minRow)
+        self.order = np.argsort(keys, kind='stable')
+        self.cellKeys, self.cellStarts, self.cellCounts = np.unique(keys[self.order], return_index=True, return_counts=True)
+
+    def getCells(self, x, y):
+
+        return np.floor(np.asarray(x) / self.cellSize).astype(np.int64), np.floor(np.asarray(y) / self.cellSize).astype(np.int64)
+
+    #Returns the indexes, in route order, of the points in the cells from (firstColumn, firstRow) to (lastColumn, lastRow) included
+    def pointsInCells(self, firstColumn, lastColumn, firstRow, lastRow):
+
+        firstColumn, lastColumn = max(firstColumn, self.minColumn), min(lastColumn, self.minColumn + self.columns - 1)
+        firstRow, lastRow = max(firstRow, self.minRow), min(lastRow, self.minRow + self.rows - 1)
+        if firstColumn > lastColumn or firstRow > lastRow:
+            return np.zeros(0, dtype=int)
+
+        columns, rows = np.meshgrid(np.arange(firstColumn, lastColumn + 1), np.arange(firstRow, lastRow + 1), indexing='ij')
+        keys = ((columns - self.minColumn) * self.rows + (rows - self.minRow)).ravel()
+
+        return self.pointsInKeys(keys)
+
+    def pointsInKeys(self, keys):
+
+        #Keys of empty cells aren't in cellKeys
+        found = np.searchsorted(self.cellKeys, keys)
+        inKeys = found < len(self.cellKeys)
+        found, keys = found[inKeys], keys[inKeys]
+        found = found[self.cellKeys[found] == keys]
+        if not len(found):
+            return np.zeros(0, dtype=int)
+
+        #Indexes of all points of the found cells, without a Python loop over the cells
+        starts, counts = self.cellStarts[found], self.cellCounts[found]
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        return np.sort(self.order[np.repeat(starts, counts) + offsets])
+
+    #Returns the indexes, in route order, of the points at most radius metres from (x, y) and their distances
+    def within(self, x, y, radius):
+
+        (firstColumn, lastColumn), (firstRow, lastRow) = self.getCells([x - radius, x + radius], [y - radius, y + radius])
+        candidates = self.pointsInCells(firstColumn, lastColumn, firstRow, lastRow)
+        distances = np.hypot(self.x[candidates] - x, self.y[candidates] - y)
+        inside = distances <= radius
+
+        return candidates[inside], distances[inside]
+
+    #Returns the index of the point closest to (x, y) and its distance, looking at rings of cells further and further away
+    #Outside the grid, rings would mostly hold empty cells off the grid : all points are measured at once instead
+    def nearest(self, x, y):
+
+        if not len(self.x):
+            return -1, np.inf
+
+        column, row = self.getCells(x, y)
+        if not (self.minColumn <= column < self.minColumn + self.columns and self.minRow <= row < self.minRow + self.rows):
+            distances = np.hypot(self.x - x, self.y - y)
+            closest = int(np.argmin(distances))
+            return closest, float(distances[closest])
+
+        #Further than this ring, all the grid has been seen
+        maxRing = max(abs(column - self.minColumn), abs(column - self.minColumn - self.columns + 1),
+                      abs(row - self.minRow), abs(row - self.minRow - self.rows + 1))
+        bestIndex, bestDistance = -1, np.inf
+        for ring in range(int(maxRing) + 1):
+            #Points of ring n+1 are at least n cells away
+            if bestDistance <= (ring - 1) * self.cellSize:
+                break
+            candidates = self.pointsInRing(column, row, ring)
+            if len(candidates):
+                distances = np.hypot(self.x[candidates] - x, self.y[candidates] - y)
+                closest = np.argmin(distances)
+                if distances[closest] < bestDistance or (distances[closest] == bestDistance and candidates[closest] < bestIndex):
+                    bestIndex, bestDistance = candidates[closest], distances[closest]
+
+        return int(bestIndex), float(bestDistance)
+
+    def pointsInRing(self, column, row, ring):
+
+        if ring == 0:
+            return self.pointsInCells(column, column, row, row)
+
+        side = np.arange(-ring, ring + 1)
+        columns = np.concatenate((side, side, np.full(2 * ring - 1, -ring), np.full(2 * ring - 1, ring))) + column
+        rows = np.concatenate((np.full(2 * ring + 1, -ring), np.full(2 * ring + 1, ring), side[1:-1], side[1:-1])) + row
+        inGrid = (columns >= self.minColumn) & (columns < self.minColumn + self.columns) & (rows >= self.minRow) & (rows < self.minRow + self.rows)
+
+        return self.pointsInKeys((columns[inGrid] - self.minColumn) * self.rows + (rows[inGrid] - self.minRow))
+
+"""
+FUNCTION : getWaypointVisits
+Returns, for every waypoint, the first point of the route inside its radius, the time spent inside it and the closest point of the route
+Time inside is the sum of the time between consecutive points both inside the radius, timeskips excluded
+IN
+    :lats - numpy array of float
+    :lons - numpy array of float
+    :timestamps - numpy array of datetime64
+    :timeskips - numpy array of bool
+    :wpLats - list of float
+    :wpLons - list of float
+    :wpRadii - list of float, metres
+    :cellSize - float, metres, defaults to the median radius
+OUT
+    :firstEntries - numpy array of int, -1 for waypoints never reached
+    :dwellSeconds - numpy array of float
+    :closestIndexes - numpy array of int, -1 if the route is empty
+    :closestDistances - numpy array of float, metres
+"""
+def getWaypointVisits(lats, lons, timestamps, timeskips, wpLats, wpLons, wpRadii, cellSize=None):
+
+    numberOfWaypoints = len(wpLats)
+    firstEntries = np.full(numberOfWaypoints, -1)
+    dwellSeconds = np.zeros(numberOfWaypoints)
+    closestIndexes = np.full(numberOfWaypoints, -1)
+    closestDistances = np.full(numberOfWaypoints, np.inf)
+    if not numberOfWaypoints or not len(lats):
+        return firstEntries, dwellSeconds, closestIndexes, closestDistances
+
+    if cellSize is None:
+        cellSize = max(float(np.median(wpRadii)), minCellSize)
+    index = GridIndex(lats, lons, cellSize)
+    wpX, wpY = routeSimplification.toLocalPlane(wpLats, wpLons, index.lat0, index.lon0)
+    seconds = np.diff(timestamps) / np.timedelta64(1, 's')
+
+    for n, (x, y, radius) in enumerate(zip(wpX.tolist(), wpY.tolist(), wpRadii)):
+        inside, distances = index.within(x, y, radius)
+        if len(inside):
+            firstEntries[n] = inside[0]
+            #Consecutive points both inside the radius, not separated by a timeskip
+            stays = inside[:-1][(np.diff(inside) == 1) & ~timeskips[inside[:-1]]]
+            dwellSeconds[n] = seconds[stays].sum()
+            closest = np.argmin(distances)
+            closestIndexes[n], closestDistances[n] = inside[closest], distances[closest]
+        else:
+            closestIndexes[n], closestDistances[n] = index.nearest(x, y)
+
+    return firstEntries, dwellSeconds, closestIndexes, closestDistances
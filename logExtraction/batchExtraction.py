@@ -0,0 +1,227 @@
+import sys
+import csv
+import glob
+import heapq
+import sqlite3
+import argparse
+import os
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import extractionEngine
+import outputFormats
+from logExtractionCLI import readSpecFile, getDownsample
+
+"""
+ASPire Log extraction - batch mode
+
+Description :
+Extracts the same columns from many databases (one per test sail) at once, each database being handled by its own process
+Every worker opens its database read only and writes one output per database
+Optionally, all csv outputs are then merged into a single file sorted by t_timestamp
+
+HOW TO EXECUTE :
+	python3 batchExtraction.py <directory or glob> [<directory or glob> ...] -c <table.column> [<table.column> ...] [-s <spec file>] [-o <output directory>] [-f <format>] [-j <processes>] [-m <merged csv file>]
+"""
+
+
+"""
+findDatabases receives a list of directories, files and glob patterns and returns the sorted list of databases they contain
+Directories are searched recursively for *.db files, a database reached through several sources (run1/asr.db and ./run1/asr.db) is only listed once
+"""
+def findDatabases(sources):
+
+	databases = set()
+	for source in sources:
+		if Path(source).is_dir():
+			databases.update(glob.glob(os.path.join(source, '**', '*.db'), recursive=True))
+		else:
+			databases.update(glob.glob(source, recursive=True))
+
+	return sorted(set(os.path.realpath(path) for path in databases if Path(path).is_file()))
+
+
+"""
+createOutputNames returns one output file name per database
+
+Names are the paths relative to the databases' common directory, so that sail1/asr.db and sail2/asr.db give sail1.<format> and sail2.<format>
+Databases that would still share a name (sail1.db and sail1/asr.db) keep their whole relative path, extension included
+Raises ValueError if two outputs still get the same name
+"""
+def createOutputNames(databases, outputDirectory, outputFormat):
+
+	paths = [os.path.abspath(database) for database in databases]
+	commonDirectory = os.path.dirname(paths[0]) if len(paths) == 1 else os.path.commonpath(paths)
+
+	relativePaths = [os.path.relpath(path, commonDirectory) for path in paths]
+	shortNames = []
+	for relativePath in relativePaths:
+		if os.path.basename(relativePath) == 'asr.db' and os.path.dirname(relativePath):
+			shortNames.append(os.path.dirname(relativePath))
+		else:
+			shortNames.append(os.path.splitext(relativePath)[0])
+
+	names = []
+	for relativePath, shortName in zip(relativePaths, shortNames):
+		name = shortName if shortNames.count(shortName) == 1 else relativePath
+		names.append(os.path.join(outputDirectory, name.replace(os.sep, '__') + '.' + outputFormat))
+
+	for name in names:
+		if names.count(name) > 1:
+			raise ValueError('Several databases would be extracted to {0}, please rename them or extract them separately'.format(name))
+
+	return names
+
+
+"""
+extractDatabase runs in a worker process and extracts outputList from one database
+The output is written to <dataFile>.part and only renamed to dataFile once complete, a failed extraction leaves no file behind
+Errors are returned rather than raised so one broken database doesn't stop the whole batch
+OUT
+	:database - str
+	:dataFile - str
+	:rowsWritten - int
+	:error - str or None
+"""
+def extractDatabase(database, dataFile, outputList, batchSize, tolerance, dedupe, outputFormat, fromTimestamp, toTimestamp, downsample):
+
+	partFile = dataFile + '.part'
+	try:
+		conn = extractionEngine.connectDatabase(database, readOnly=True)
+		try:
+			partFile, rowsWritten = extractionEngine.extractToFile(conn, outputList, partFile, batchSize, tolerance, dedupe, outputFormat,
+			                                                            fromTimestamp=fromTimestamp, toTimestamp=toTimestamp, downsample=downsample)
+		finally:
+			conn.close()
+		os.replace(partFile, dataFile)
+	except (sqlite3.Error, ImportError, ValueError, OSError) as e:
+		if os.path.isfile(partFile):
+			os.remove(partFile)
+		return database, dataFile, 0, str(e)
+
+	return database, dataFile, rowsWritten, None
+
+
+"""
+getMergeColumn returns the position in outputList of the primary table's t_timestamp, the one every output is sorted by, or None if it isn't exported
+The primary table is the table of the first column (see extractionEngine.groupColumnsByTable)
+"""
+def getMergeColumn(outputList):
+
+	primaryTimestamp = outputList[0].split('.')[0] + '.t_timestamp'
+
+	return outputList.index(primaryTimestamp) if primaryTimestamp in outputList else None
+
+
+"""
+mergeCSVFiles merges csv files already sorted by the t_timestamp in column timeCol (see getMergeColumn) into mergedFile, keeping the order
+Only one row per file is held in memory at a time
+Returns the number of rows written
+"""
+def mergeCSVFiles(dataFiles, mergedFile, timeCol):
+
+	files = [open(dataFile, 'r', newline='') for dataFile in dataFiles]
+	try:
+		readers = [csv.reader(f) for f in files]
+		headers = [next(reader, None) for reader in readers]
+		header = next(header for header in headers if header is not None)
+
+		rowsWritten = 0
+		with open(mergedFile, 'w') as f:
+			writer = csv.writer(f, lineterminator='\n')
+			writer.writerow(header)
+			for row in heapq.merge(*readers, key=lambda row: row[timeCol]):
+				writer.writerow(row)
+				rowsWritten += 1
+	finally:
+		for f in files:
+			f.close()
+
+	return rowsWritten
+
+
+"""
+getArguments retrieves and checks all passed parameters
+Returns the parsed arguments, the list of databases and the list of columns to export (Format : table.column)
+"""
+def getArguments():
+
+	parser = argparse.ArgumentParser(description='Extracts the same columns from many ASPire log databases in parallel')
+	parser.add_argument('databases', nargs='+', help='databases, directories containing databases or glob patterns')
+	parser.add_argument('-c', '--columns', nargs='+', default=[], metavar='TABLE.COLUMN', help='columns to export')
+	parser.add_argument('-s', '--spec', help='file containing one TABLE.COLUMN per line')
+	parser.add_argument('-o', '--output-dir', default='.', help='directory receiving one output per database')
+	parser.add_argument('-f', '--format', choices=outputFormats.outputFormats, default='csv', help='output format, npz needs numpy, feather and parquet need pyarrow')
+	parser.add_argument('-j', '--processes', type=int, default=os.cpu_count(), help='number of databases extracted at the same time (default : number of CPUs)')
+	parser.add_argument('-m', '--merge', help='csv file receiving all outputs merged and sorted by t_timestamp (csv format only)')
+	parser.add_argument('-b', '--batch-size', type=int, default=extractionEngine.batchSize, help='number of rows fetched from the database at once')
+	parser.add_argument('-t', '--tolerance', type=float, default=extractionEngine.timeTolerance, help='maximum time difference in seconds for rows of two tables to be joined')
+	parser.add_argument('-d', '--dedupe', choices=extractionEngine.dedupeModes, default='timestamp', help='see logExtractionCLI.py')
+	parser.add_argument('--start', type=extractionEngine.normalizeTimestamp, help='only export rows from this time on (e.g. "2018-06-28 07:30")')
+	parser.add_argument('--end', type=extractionEngine.normalizeTimestamp, help='only export rows up to this time')
+	downsampleGroup = parser.add_mutually_exclusive_group()
+	downsampleGroup.add_argument('--every', type=int, metavar='N', help='only keep one row of the primary table out of N')
+	downsampleGroup.add_argument('--bucket', type=float, metavar='SECONDS', help='aggregate every table into one row per SECONDS')
+	parser.add_argument('--aggregate', choices=('mean', 'last'), default='mean', help='with --bucket : mean averages decimal columns, last keeps the last row of each bucket')
+	args = parser.parse_args()
+
+	databases = findDatabases(args.databases)
+	if not databases:
+		sys.exit('No databases found!')
+
+	outputList = []
+	if args.spec:
+		if not Path(args.spec).is_file():
+			sys.exit("Spec file doesn't exist or can't be found!")
+		outputList += readSpecFile(args.spec)
+	outputList += args.columns
+	outputList = list(dict.fromkeys(outputList))
+
+	if not outputList:
+		sys.exit('No columns to export, use --columns and/or --spec')
+	for column in outputList:
+		if len(column.split('.')) != 2:
+			sys.exit('Invalid column {0}, expected format is table.column'.format(column))
+	if args.merge and args.format != 'csv':
+		sys.exit('Outputs can only be merged in the csv format')
+	if args.merge and getMergeColumn(outputList) is None:
+		sys.exit('{0}.t_timestamp is needed to merge outputs, rows are sorted by the time of the first table'.format(outputList[0].split('.')[0]))
+	if (args.every is not None and args.every < 1) or (args.bucket is not None and args.bucket <= 0):
+		sys.exit('Invalid downsampling')
+	args.downsample = getDownsample(args)
+	if args.processes < 1 or args.batch_size < 1 or args.tolerance < 0:
+		sys.exit('Invalid number of processes, batch size or tolerance')
+
+	return args, databases, outputList
+
+
+#MAIN SCRIPT
+if __name__ == "__main__":
+
+	args, databases, outputList = getArguments()
+
+	os.makedirs(args.output_dir, exist_ok=True)
+	try:
+		dataFiles = createOutputNames(databases, args.output_dir, args.format)
+	except ValueError as e:
+		sys.exit(str(e))
+
+	extractedFiles = []
+	with ProcessPoolExecutor(max_workers=args.processes) as executor:
+		futures = [executor.submit(extractDatabase, database, dataFile, outputList, args.batch_size, args.tolerance, args.dedupe, args.format,
+		                           args.start, args.end, args.downsample)
+		           for database, dataFile in zip(databases, dataFiles)]
+		for future in futures:
+			database, dataFile, rowsWritten, error = future.result()
+			if error:
+				print('{0} : extraction failed : {1}'.format(database, error))
+			else:
+				print('{0} : exported {1} rows to {2}'.format(database, rowsWritten, dataFile))
+				extractedFiles.append(dataFile)
+
+	if args.merge and extractedFiles:
+		rowsWritten = mergeCSVFiles(extractedFiles, args.merge, getMergeColumn(outputList))
+		print('Merged {0} rows from {1} files into {2}'.format(rowsWritten, len(extractedFiles), args.merge))
+
+	if len(extractedFiles) < len(databases):
+		sys.exit('{0} of {1} databases could not be extracted'.format(len(databases) - len(extractedFiles), len(databases)))
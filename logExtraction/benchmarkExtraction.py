@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import resource
+import argparse
+import tempfile
+import multiprocessing
+
+import extractionEngine
+import syntheticDatabase
+
+"""
+ASPire Log extraction benchmark
+
+Description :
+Measures how the extraction scales on synthetic databases (see syntheticDatabase.py) of increasing size
+Every scenario runs in a fresh process and reports its wall time, peak memory (RSS) and rows written per second
+Results can be saved to a JSON file to compare two versions of the extraction
+
+HOW TO EXECUTE :
+	python3 benchmarkExtraction.py [-r <rows> [<rows> ...]] [-d <database directory>] [--json <results file>]
+
+N.B.: Databases are kept in the database directory and reused by later runs, 10M rows take a few minutes to generate
+"""
+
+gpsColumns = ['dataLogs_gps.t_timestamp', 'dataLogs_gps.latitude', 'dataLogs_gps.longitude', 'dataLogs_gps.satellites_used', 'dataLogs_gps.rc_on']
+joinColumns = gpsColumns + ['dataLogs_compass.heading', 'dataLogs_windsensor.direction', 'dataLogs_windsensor.speed']
+compassFirstColumns = ['dataLogs_compass.t_timestamp', 'dataLogs_compass.heading', 'dataLogs_gps.latitude', 'dataLogs_gps.longitude', 'dataLogs_windsensor.direction']
+
+#Scenarios : name, columns to extract and extra arguments of extractionEngine.extractToFile
+scenarios = [
+	('gps', gpsColumns, {}),
+	('gps+compass+wind', joinColumns, {}),
+	('compass (10 Hz) first', compassFirstColumns, {}),
+	('join, consecutive dedupe', joinColumns, {'dedupe': 'consecutive'}),
+	('join, no dedupe', joinColumns, {'dedupe': 'none'}),
+	('join, every 10th row', compassFirstColumns, {'downsample': ('every', 10)}),
+	('join, 1s buckets', joinColumns, {'downsample': ('bucket', 1, 'mean')}),
+	('gps to npz', gpsColumns, {'outputFormat': 'npz'}),
+	('gps to feather', gpsColumns, {'outputFormat': 'feather'}),
+	('gps to parquet', gpsColumns, {'outputFormat': 'parquet'}),
+]
+
+
+"""
+peakMemory returns the highest resident memory used so far by the current process, in MB
+"""
+def peakMemory():
+
+	maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+	#ru_maxrss is in bytes on macOS and in kilobytes on Linux
+	return maxRSS / (1024 * 1024) if sys.platform == 'darwin' else maxRSS / 1024
+
+
+"""
+runScenario runs in its own process, extracts outputList from the database and puts its measures on resultQueue
+"""
+def runScenario(dbPath, outputList, options, outputDirectory, resultQueue):
+
+	outputFormat = options.get('outputFormat', 'csv')
+	dataFile = os.path.join(outputDirectory, 'benchmark.' + outputFormat)
+	memoryBefore = peakMemory()
+
+	try:
+		conn = extractionEngine.connectDatabase(dbPath, readOnly=True)
+		startTime = time.perf_counter()
+		dataFile, rowsWritten = extractionEngine.extractToFile(conn, outputList, dataFile, **options)
+		wallTime = time.perf_counter() - startTime
+		conn.close()
+	except ImportError as e:
+		resultQueue.put({'skipped': str(e)})
+		return
+	except Exception as e:
+		if os.path.isfile(dataFile):
+			os.remove(dataFile)
+		resultQueue.put({'error': '{0} : {1}'.format(type(e).__name__, e)})
+		return
+
+	resultQueue.put({'rows': rowsWritten, 'wallTime': wallTime, 'rowsPerSecond': rowsWritten / wallTime if wallTime > 0 else 0,
+	                 'peakMemory': peakMemory(), 'baseMemory': memoryBefore, 'outputSize': os.path.getsize(dataFile)})
+	os.remove(dataFile)
+
+
+"""
+getResult waits for the measures of a scenario's process, or for its end if it dies without giving them (killed when out of memory...)
+"""
+def getResult(process, resultQueue):
+
+	while True:
+		try:
+			return resultQueue.get(timeout=1)
+		except queue.Empty:
+			if not process.is_alive():
+				#The result may have been put just before the process exited
+				try:
+					return resultQueue.get(timeout=1)
+				except queue.Empty:
+					return {'error': 'process exited with code {0}'.format(process.exitcode)}
+
+
+"""
+prepareDatabase returns the path of a synthetic database with the given number of rows, creating it if needed
+Timestamp indexes are created once here so that every scenario runs on an indexed database
+"""
+def prepareDatabase(directory, rows):
+
+	dbPath = os.path.join(directory, 'synthetic_{0}.db'.format(rows))
+	if os.path.isfile(dbPath):
+		return dbPath
+
+	print('Generating {0} with {1} rows...'.format(dbPath, rows))
+	startTime = time.perf_counter()
+	syntheticDatabase.createDatabase(dbPath + '.tmp', rows)
+	conn = extractionEngine.connectDatabase(dbPath + '.tmp')
+	for table in syntheticDatabase.tableRates:
+		extractionEngine.ensureTimestampIndex(conn, table)
+	conn.close()
+	os.replace(dbPath + '.tmp', dbPath)
+	print('Generated in {0:.1f}s'.format(time.perf_counter() - startTime))
+
+	return dbPath
+
+
+#MAIN SCRIPT
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description='Benchmarks the ASPire log extraction on synthetic databases')
+	parser.add_argument('-r', '--rows', type=int, nargs='+', default=[10000, 1000000], help='sizes of the synthetic databases, in total rows (default : 10000 1000000)')
+	parser.add_argument('-d', '--db-dir', default=os.path.join(tempfile.gettempdir(), 'aspireBenchmark'), help='directory where synthetic databases are kept')
+	parser.add_argument('-s', '--scenario', nargs='+', help='only run the scenarios whose name contains one of these words')
+	parser.add_argument('--json', help='file receiving all results')
+	args = parser.parse_args()
+
+	os.makedirs(args.db_dir, exist_ok=True)
+	outputDirectory = tempfile.mkdtemp()
+	context = multiprocessing.get_context('spawn')
+
+	selectedScenarios = [scenario for scenario in scenarios if not args.scenario or any(word in scenario[0] for word in args.scenario)]
+
+	results = []
+	try:
+		for rows in args.rows:
+			dbPath = prepareDatabase(args.db_dir, rows)
+			print('\n{0} ({1:.1f} MB)'.format(dbPath, os.path.getsize(dbPath) / (1024 * 1024)))
+			print('{0:<28}{1:>10}{2:>10}{3:>12}{4:>12}{5:>12}'.format('scenario', 'rows', 'time (s)', 'rows/s', 'peak (MB)', 'output (MB)'))
+
+			for name, outputList, options in selectedScenarios:
+				resultQueue = context.Queue()
+				process = context.Process(target=runScenario, args=(dbPath, outputList, options, outputDirectory, resultQueue))
+				process.start()
+				result = getResult(process, resultQueue)
+				process.join()
+
+				if 'skipped' in result:
+					print('{0:<28}skipped : {1}'.format(name, result['skipped']))
+					continue
+				if 'error' in result:
+					print('{0:<28}failed : {1}'.format(name, result['error']))
+					continue
+
+				print('{0:<28}{1:>10}{2:>10.2f}{3:>12.0f}{4:>12.1f}{5:>12.1f}'.format(name, result['rows'], result['wallTime'], result['rowsPerSecond'],
+				                                                                    result['peakMemory'], result['outputSize'] / (1024 * 1024)))
+				result.update({'database': dbPath, 'databaseRows': rows, 'scenario': name})
+				results.append(result)
+	finally:
+		shutil.rmtree(outputDirectory)
+
+	if args.json:
+		with open(args.json, 'w') as f:
+			json.dump(results, f, indent=1)
+		print('\nResults saved to ' + args.json)
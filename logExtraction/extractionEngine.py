@@ -0,0 +1,407 @@
+import datetime
+import sqlite3
+from itertools import islice
+from pathlib import Path
+
+import outputFormats
+
+"""
+ASPire Log extraction engine
+
+Description :
+Timestamp merge join and streamed export shared by the extraction GUI (logExtraction_1.0.py) and the headless command (logExtractionCLI.py)
+Rows are pulled from the database in batches of batchSize so memory use doesn't depend on the length of the log
+"""
+
+#Number of rows fetched from the cursor at once
+batchSize = 5000
+#Maximum time difference (in seconds) for rows of two tables to be joined
+timeTolerance = 0.5
+#Value written by the logger when a sensor has no data
+nullValue = -2000
+#Ways of removing duplicated rows, see createTableExpression and writeToFile
+dedupeModes = ('timestamp', 'consecutive', 'none')
+#Columns whose name contains one of these hold angles : averaging 359 and 1 would give 180, so they aren't averaged in buckets
+circularColumnNames = ('heading', 'course', 'direction', 'bearing', 'yaw', 'declination')
+
+
+"""
+ExtractionCancelled is raised by a progress callback (see writeToFile) to stop an extraction
+"""
+class ExtractionCancelled(Exception):
+	pass
+
+
+"""
+connectDatabase opens a connection to the database at dbPath
+
+When readOnly is set the database is opened in read only mode so that an extraction can safely run while the logger is still writing to it
+"""
+def connectDatabase(dbPath, readOnly=False):
+
+	if readOnly:
+		return sqlite3.connect(Path(dbPath).resolve().as_uri() + '?mode=ro', uri=True)
+
+	return sqlite3.connect(dbPath)
+
+
+"""
+groupColumnsByTable receives outputList (Format : table.column) and returns a dict of each table's selected columns
+
+Tables are kept in the order they first appear in outputList, the first one being the primary table whose rows are all kept
+"""
+def groupColumnsByTable(outputList):
+
+	tableColumns = {}
+	for item in outputList:
+		table, column = item.split('.')
+		tableColumns.setdefault(table, []).append(column)
+
+	return tableColumns
+
+
+"""
+createTableExpression receives a table and its selected columns and returns the SQL expression reading them in time order
+
+The first selected value is the timestamp converted to seconds so that tables can be compared to one another
+Rows where any selected column holds null data (-2000) are filtered out by SQLite
+With the 'timestamp' dedupe mode, only the first row of each group of rows sharing the same t_timestamp and selected values is kept
+Rows can be limited to ids after afterId and up to lastId (used by incremental extractions) and to timestamps between fromTimestamp and toTimestamp
+With afterId, dedupeFromTimestamp makes the 'timestamp' dedupe also look at the rows before afterId from that time on, so a row already exported isn't exported again
+Rows are ordered by t_timestamp, which uses the table's timestamp index if there is one (see ensureTimestampIndex)
+
+downsample reduces the number of rows in SQLite, it is either :
+	- ('every', N) : keeps one row out of N
+	- ('bucket', N, 'mean') : one row per N seconds, averagedColumns are averaged, other columns are taken from the first row of the bucket
+	- ('bucket', N, 'last') : one row per N seconds, taken from the last row of the bucket
+With buckets the first selected value is the start of the bucket in seconds
+"""
+def createTableExpression(table, columns, dedupe='timestamp', afterId=None, lastId=None, fromTimestamp=None, toTimestamp=None, downsample=None, averagedColumns=(), dedupeFromTimestamp=None):
+
+	#t_timestamp format : 2018-06-28_07:34:55.850, julianday needs a space between date and time
+	#Rounded to the millisecond, julianday's precision would otherwise put whole seconds on either side of a bucket limit
+	secondsExpression = "round((julianday(replace(t_timestamp, '_', ' ')) - 2440587.5) * 86400.0, 3)"
+
+	bounds = []
+	if afterId is not None:
+		bounds.append('id > ' + str(int(afterId)))
+	if lastId is not None:
+		bounds.append('id <= ' + str(int(lastId)))
+	if fromTimestamp is not None:
+		bounds.append("t_timestamp >= '" + fromTimestamp.replace("'", "''") + "'")
+	if toTimestamp is not None:
+		bounds.append("t_timestamp <= '" + toTimestamp.replace("'", "''") + "'")
+
+	#IS NOT is used rather than != so that empty (NULL) values are kept
+	conditions = bounds + [table + '.' + column + ' IS NOT ' + str(nullValue) for column in columns]
+	if dedupe == 'timestamp':
+		dedupeBounds = bounds
+		if afterId is not None and dedupeFromTimestamp is not None:
+			dedupeBounds = [bound for bound in bounds if not bound.startswith('id > ')] + ["t_timestamp >= '" + dedupeFromTimestamp.replace("'", "''") + "'"]
+		boundsExpression = ' WHERE ' + ' AND '.join(dedupeBounds) if dedupeBounds else ''
+		conditions.append('id IN (SELECT min(id) FROM ' + table + boundsExpression + ' GROUP BY ' + ','.join(['t_timestamp'] + columns) + ')')
+	whereExpression = ' FROM ' + table + ' WHERE ' + ' AND '.join(conditions)
+
+	if downsample is None:
+		columnsToSelect = ','.join([secondsExpression] + [table + '.' + column for column in columns])
+
+		#FORMAT OF CREATED EXPRESSION :
+		#	SELECT seconds,Table.Column1,Table.Column2 FROM Table
+		#		WHERE Table.Column1 IS NOT -2000 AND Table.Column2 IS NOT -2000
+		#			AND id IN (SELECT min(id) FROM Table GROUP BY t_timestamp,Column1,Column2)
+		#		ORDER BY t_timestamp ASC, id ASC
+		return 'SELECT ' + columnsToSelect + whereExpression + ' ORDER BY t_timestamp ASC, id ASC'
+
+	#Selected columns are renamed c0, c1... inside the sub-query so they can't clash with the helper columns
+	aliases = ['c' + str(n) for n in range(len(columns))]
+	innerColumns = [table + '.' + column + ' AS ' + alias for column, alias in zip(columns, aliases)]
+
+	if downsample[0] == 'every':
+		#Rows are numbered in time order and only every Nth is kept
+		innerExpression = 'SELECT ' + ','.join([secondsExpression + ' AS t_seconds'] + innerColumns + ['ROW_NUMBER() OVER (ORDER BY t_timestamp ASC, id ASC) AS rowNumber']) + whereExpression
+
+		return 'SELECT ' + ','.join(['t_seconds'] + aliases) + ' FROM (' + innerExpression + ') WHERE (rowNumber - 1) % ' + str(int(downsample[1])) + ' = 0 ORDER BY rowNumber'
+
+	#Buckets : when a query has a single min() or max(), SQLite takes the other (bare) columns from the row holding that min or max
+	bucketExpression = 'CAST(t_seconds / ' + repr(float(downsample[1])) + ' AS INTEGER)'
+	if downsample[2] == 'mean':
+		aggregates = ['avg(' + alias + ') AS ' + alias if column in averagedColumns else alias for column, alias in zip(columns, aliases)]
+		timeAggregate = 'min(t_time)'
+	else:
+		aggregates = aliases
+		timeAggregate = 'max(t_time)'
+
+	innerExpression = 'SELECT ' + ','.join([secondsExpression + ' AS t_seconds', 't_timestamp AS t_time'] + innerColumns) + whereExpression
+	groupExpression = 'SELECT ' + ','.join([bucketExpression + ' * ' + repr(float(downsample[1])) + ' AS bucket', timeAggregate] + aggregates) + ' FROM (' + innerExpression + ') GROUP BY ' + bucketExpression
+
+	#FORMAT OF CREATED EXPRESSION (bucket of 1 second, mean) :
+	#	SELECT bucket,c0,c1 FROM (
+	#		SELECT CAST(t_seconds / 1.0 AS INTEGER) * 1.0 AS bucket,min(t_time),avg(c0) AS c0,c1 FROM (
+	#			SELECT seconds AS t_seconds,t_timestamp AS t_time,Table.Column0 AS c0,Table.Column1 AS c1 FROM Table WHERE ...)
+	#		GROUP BY CAST(t_seconds / 1.0 AS INTEGER))
+	#	ORDER BY bucket
+	return 'SELECT ' + ','.join(['bucket'] + aliases) + ' FROM (' + groupExpression + ') ORDER BY bucket'
+
+
+"""
+timestampIndexExists checks if table already has an index whose first column is t_timestamp
+"""
+def timestampIndexExists(conn, table):
+
+	c = conn.cursor()
+	c.execute('PRAGMA index_list({0})'.format(table))
+	for index in c.fetchall():
+		c.execute('PRAGMA index_info({0})'.format(index[1]))
+		indexColumns = c.fetchall()
+		if indexColumns and indexColumns[0][2] == 't_timestamp':
+			return True
+
+	return False
+
+
+"""
+ensureTimestampIndex makes sure table has an index on t_timestamp, creating it if needed
+
+If the database is read only the index can't be created, SQLite then sorts the table itself
+Returns True if an index is available
+"""
+def ensureTimestampIndex(conn, table):
+
+	if timestampIndexExists(conn, table):
+		return True
+
+	try:
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_{0}_t_timestamp ON {0}(t_timestamp)'.format(table))
+		conn.commit()
+	except sqlite3.OperationalError:
+		return False
+
+	return True
+
+
+"""
+NearestMatcher walks through the time ordered rows of a secondary table
+
+match() is called with increasing timestamps of the primary table and returns the values of the row closest in time
+If the closest row is further away than tolerance (in seconds), None is returned
+"""
+class NearestMatcher:
+
+	def __init__(self, rows, tolerance):
+
+		self.rows = rows
+		self.tolerance = tolerance
+		self.previous = None #Last row at or before the current time
+		self.next = next(self.rows, None) #First row after the current time
+
+	def match(self, time):
+
+		if time is None:
+			return None
+
+		#Move forward until next is after the current time
+		while self.next is not None and (self.next[0] is None or self.next[0] <= time):
+			if self.next[0] is not None:
+				self.previous = self.next
+			self.next = next(self.rows, None)
+
+		best = None
+		bestDelta = self.tolerance
+		for candidate in (self.previous, self.next):
+			if candidate is not None and abs(candidate[0] - time) <= bestDelta:
+				#Strictly closer candidates only, on a tie the previous row is kept
+				if best is None or abs(candidate[0] - time) < bestDelta:
+					best = candidate
+					bestDelta = abs(candidate[0] - time)
+
+		if best is None:
+			return None
+
+		return best[1:]
+
+
+"""
+mergeJoin receives all columns in outputList and yields rows with the columns in the same order
+
+Every table is read in time order and each row of the first (primary) table is matched with the row closest in time of every other table
+Rows of other tables more than tolerance seconds away are not matched and their columns are left empty, so no primary row is ever dropped
+Null data is filtered out of each table before matching, so a secondary row holding -2000 is replaced by its closest valid neighbour
+tableBounds optionally maps a table to the bounds given to createTableExpression (afterId, lastId, fromTimestamp)
+fromTimestamp and toTimestamp limit all tables to a time range
+With downsample ('every', N) only the primary table is thinned, with ('bucket', ...) every table is reduced to one row per bucket (see createTableExpression)
+Buckets average the decimal columns except angles (see isCircularColumn), which are taken from the bucket's first row like integer and text columns
+"""
+def mergeJoin(conn, outputList, tolerance=timeTolerance, batchSize=batchSize, dedupe='timestamp', tableBounds=None, fromTimestamp=None, toTimestamp=None, downsample=None):
+
+	if tableBounds is None:
+		tableBounds = {}
+
+	tableColumns = groupColumnsByTable(outputList)
+	tables = list(tableColumns)
+
+	#Only float columns are averaged in buckets, integers (rc_on, satellites_used...), angles and text are taken from a single row
+	averagedColumns = [item for item, kind in zip(outputList, getColumnKinds(conn, outputList)) if kind == 'float' and not isCircularColumn(item.split('.')[1])]
+
+	expressions = []
+	for n, table in enumerate(tables):
+		bounds = {'fromTimestamp': fromTimestamp, 'toTimestamp': toTimestamp}
+		bounds.update(tableBounds.get(table, {}))
+		tableDownsample = downsample if n == 0 or (downsample is not None and downsample[0] == 'bucket') else None
+		tableAveraged = [item.split('.')[1] for item in averagedColumns if item.split('.')[0] == table]
+		expressions.append(createTableExpression(table, tableColumns[table], dedupe, downsample=tableDownsample, averagedColumns=tableAveraged, **bounds))
+
+	#Indexes are created before any query is running on the connection
+	for table in tables:
+		ensureTimestampIndex(conn, table)
+
+	streams = []
+	for expression in expressions:
+		c = conn.cursor()
+		c.execute(expression)
+		streams.append(fetchInBatches(c, batchSize))
+
+	#For each output column, index of its table and of its position in that table's values
+	positions = []
+	for item in outputList:
+		table, column = item.split('.')
+		tableIndex = tables.index(table)
+		positions.append((tableIndex, tableColumns[table].index(column)))
+
+	matchers = [NearestMatcher(stream, tolerance) for stream in streams[1:]]
+	emptyValues = [(None,) * len(tableColumns[table]) for table in tables[1:]]
+
+	for row in streams[0]:
+		values = [row[1:]]
+		for matcher, empty in zip(matchers, emptyValues):
+			matched = matcher.match(row[0])
+			values.append(empty if matched is None else matched)
+
+		yield tuple(values[tableIndex][columnIndex] for tableIndex, columnIndex in positions)
+
+
+"""
+isCircularColumn checks if a column holds angles (compass heading, GPS course, wind direction...) from its name, see circularColumnNames
+"""
+def isCircularColumn(column):
+
+	return any(name in column.lower() for name in circularColumnNames)
+
+
+"""
+normalizeTimestamp converts a date and time given by the user (2018-06-28 07:34, 2018-06-28T07:34:55...) to the t_timestamp format : 2018-06-28_07:34:55.000
+Raises ValueError if the text isn't a valid date
+"""
+def normalizeTimestamp(text):
+
+	parsed = datetime.datetime.fromisoformat(text.strip().replace('_', ' '))
+
+	return parsed.strftime('%Y-%m-%d_%H:%M:%S.%f')[:-3]
+
+
+"""
+getColumnKinds receives outputList (Format : table.column) and returns how each column is stored in typed outputs
+Kinds are deduced from the types declared in each table, see outputFormats.columnKind
+"""
+def getColumnKinds(conn, outputList):
+
+	c = conn.cursor()
+	declaredTypes = {}
+	for table in groupColumnsByTable(outputList):
+		c.execute('PRAGMA table_info({0})'.format(table))
+		for column in c.fetchall():
+			declaredTypes[table + '.' + column[1]] = column[2]
+
+	return [outputFormats.columnKind(item.split('.')[1], declaredTypes.get(item, '')) for item in outputList]
+
+
+"""
+defaultOutputFile returns a file name containing today's date up to the current minute
+"""
+def defaultOutputFile(outputFormat='csv'):
+
+	now = datetime.datetime.now()
+	todayDate = str(now.year) + '_' + str(now.month) + '_' + str(now.day) + '__' + str(now.hour) + '_' + str(now.minute)
+
+	return 'logExtraction__' + todayDate + '.' + outputFormat
+
+
+"""
+fetchInBatches receives an executed cursor and yields its rows
+
+Rows are fetched batchSize at a time with fetchmany so only one batch is ever held in memory
+"""
+def fetchInBatches(cursor, batchSize=batchSize):
+
+	while True:
+		rows = cursor.fetchmany(batchSize)
+		if not rows:
+			break
+		for row in rows:
+			yield row
+
+
+"""
+removeConsecutiveDuplicates yields the rows that are not identical to the row just before them
+previousLine is the row written before the first one, if any (used by incremental extractions)
+Only the previous row is kept in memory
+"""
+def removeConsecutiveDuplicates(rows, previousLine=None):
+
+	for line in rows:
+		if line != previousLine:
+			yield line
+		previousLine = line
+
+
+"""
+writeToFile receives the rows extracted from database and exports them to dataFile in outputFormat (see outputFormats)
+
+Null data and duplicates have already been removed by SQLite (see createTableExpression)
+With the 'consecutive' dedupe mode, a row identical to the one just before it (previousRow for the first one) is not written
+Rows are handed to the writer batchSize at a time, returns the number of rows written
+With append set, rows are added at the end of an existing dataFile (csv only)
+If given, progress is called with the number of rows written so far after each batch, it may raise ExtractionCancelled to stop the export
+"""
+def writeToFile(rows, outputList, dataFile, dedupe='timestamp', outputFormat='csv', columnKinds=None, batchSize=batchSize, append=False, progress=None, previousRow=None):
+
+	if columnKinds is None:
+		columnKinds = ['text'] * len(outputList)
+	if dedupe == 'consecutive':
+		rows = removeConsecutiveDuplicates(rows, previousRow)
+
+	rowsWritten = 0
+	writer = outputFormats.createWriter(outputFormat, dataFile, outputList, columnKinds, append)
+	try:
+		while True:
+			batch = list(islice(rows, batchSize))
+			if not batch:
+				break
+			writer.writeBatch(batch)
+			rowsWritten += len(batch)
+			if progress is not None:
+				progress(rowsWritten)
+	finally:
+		writer.close()
+
+	return rowsWritten
+
+
+"""
+extractToFile runs the extraction of all columns in outputList and streams the result to dataFile
+
+Tables are joined on their closest timestamps, see mergeJoin
+dedupe is one of dedupeModes : 'timestamp' removes repeated samples in SQLite, 'consecutive' removes repeated output rows and 'none' keeps everything
+outputFormat is one of outputFormats.outputFormats, typed formats need numpy (npz) or pyarrow (feather, parquet)
+If no dataFile is given, the default timestamped name is used
+progress is passed on to writeToFile, the time range and downsample to mergeJoin
+Returns the name of the file written and the number of rows written to it
+"""
+def extractToFile(conn, outputList, dataFile=None, batchSize=batchSize, tolerance=timeTolerance, dedupe='timestamp', outputFormat='csv', progress=None, fromTimestamp=None, toTimestamp=None, downsample=None):
+
+	if dataFile is None:
+		dataFile = defaultOutputFile(outputFormat)
+
+	rows = mergeJoin(conn, outputList, tolerance, batchSize, dedupe, fromTimestamp=fromTimestamp, toTimestamp=toTimestamp, downsample=downsample)
+	rowsWritten = writeToFile(rows, outputList, dataFile, dedupe, outputFormat, getColumnKinds(conn, outputList), batchSize, progress=progress)
+
+	return dataFile, rowsWritten
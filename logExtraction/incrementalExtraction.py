@@ -0,0 +1,171 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import extractionEngine
+
+"""
+ASPire Log extraction - incremental mode
+
+Description :
+Appends to an existing CSV file only the rows logged since the previous extraction
+The last exported id and t_timestamp of each table (high-water mark) are kept in a small JSON state file next to the output, with the last row written
+Each run only reads the new rows of the primary table and the rows of the other tables close to them, so its cost doesn't grow with the length of the mission
+
+FORMAT OF STATE FILE :
+	{"outputList": ["dataLogs_gps.t_timestamp", ...],
+	 "tables": {"dataLogs_gps": {"id": 1234, "t_timestamp": "2018-06-28_07:34:55.850"}, ...},
+	 "lastRow": ["2018-06-28_07:34:55.850", ...]}
+"""
+
+
+"""
+defaultStateFile returns the name of the state file kept next to dataFile
+"""
+def defaultStateFile(dataFile):
+
+	return dataFile + '.state.json'
+
+
+"""
+loadState reads the state file, returns an empty state if it doesn't exist yet
+"""
+def loadState(stateFile):
+
+	if not os.path.isfile(stateFile):
+		return {}
+
+	with open(stateFile, 'r') as f:
+		return json.load(f)
+
+
+"""
+saveState writes the state file
+
+The state is first written to a temporary file which then replaces the old one, so an interrupted run never leaves a half written state
+"""
+def saveState(stateFile, state):
+
+	tempFile = stateFile + '.tmp'
+	with open(tempFile, 'w') as f:
+		json.dump(state, f, indent=1)
+	os.replace(tempFile, stateFile)
+
+
+"""
+shiftTimestamp returns timestamp (Format : 2018-06-28_07:34:55.850) moved by the given number of seconds, in the same format
+"""
+def shiftTimestamp(timestamp, seconds):
+
+	shifted = datetime.fromisoformat(timestamp.replace('_', ' ')) + timedelta(seconds=seconds)
+
+	return shifted.strftime('%Y-%m-%d_%H:%M:%S.%f')[:-3]
+
+
+"""
+getHighWaterMarks returns, for each table, the id and t_timestamp of its last row
+"""
+def getHighWaterMarks(conn, tables):
+
+	c = conn.cursor()
+	marks = {}
+	for table in tables:
+		c.execute('SELECT id, t_timestamp FROM {0} ORDER BY id DESC LIMIT 1'.format(table))
+		lastRow = c.fetchone()
+		marks[table] = {'id': lastRow[0], 't_timestamp': lastRow[1]} if lastRow else {'id': None, 't_timestamp': None}
+
+	return marks
+
+
+"""
+getExportedMark returns the id and t_timestamp of the last row of the primary table up to lastId and toTimestamp, the high-water mark once the rows after toTimestamp are held back
+Never goes back before previousMark
+"""
+def getExportedMark(conn, table, lastId, toTimestamp, previousMark):
+
+	c = conn.cursor()
+	c.execute('SELECT id, t_timestamp FROM {0} WHERE id <= ? AND t_timestamp <= ? ORDER BY id DESC LIMIT 1'.format(table), (lastId, toTimestamp))
+	lastRow = c.fetchone()
+	if lastRow is None or (previousMark.get('id') is not None and lastRow[0] <= previousMark['id']):
+		return {'id': previousMark.get('id'), 't_timestamp': previousMark.get('t_timestamp')}
+
+	return {'id': lastRow[0], 't_timestamp': lastRow[1]}
+
+
+"""
+getHoldBackTimestamp returns the last t_timestamp of the primary table that can be exported now, or None if every row can (no other table)
+
+A primary row is matched with the closest row of each other table within tolerance : a row of another table logged later could still be closer
+As each table is logged in time order, this can only happen to primary rows less than tolerance before the newest row of another table, they are held back until the next run
+"""
+def getHoldBackTimestamp(marks, tables, tolerance):
+
+	if len(tables) < 2:
+		return None
+	newestTimestamps = [marks[table]['t_timestamp'] for table in tables[1:]]
+	if None in newestTimestamps:
+		return '' #A table without rows yet could match any primary row, no t_timestamp is <= ''
+
+	#Timestamps are to the millisecond, the last exported row is a millisecond before tolerance from the newest row
+	return shiftTimestamp(min(newestTimestamps), -tolerance - 0.001)
+
+
+"""
+rememberLastRow yields rows unchanged, keeping the last one in lastRow[0]
+"""
+def rememberLastRow(rows, lastRow):
+
+	for row in rows:
+		lastRow[0] = row
+		yield row
+
+
+"""
+extractIncremental appends the rows of outputList logged since the previous run to dataFile (csv only)
+
+The last row of every table is read before extracting, rows of the primary table logged during the extraction are left for the next run
+Primary rows whose match could still change, less than tolerance before the newest row of another table, are also left for the next run (see getHoldBackTimestamp)
+A table that stops logging holds back the rows after its last one : once logging is over, a final run writes every row left
+Rows of the other tables are read from tolerance seconds before the previous high-water mark so new primary rows can still be matched with them
+Duplicates are removed as in a single extraction : a logger duplicate arriving after the mark is dropped if its first copy was exported by the previous run
+The state file is only updated once all rows have been written, on the first run (no state file) dataFile is overwritten
+Returns the number of rows written
+"""
+def extractIncremental(conn, outputList, dataFile, stateFile=None, batchSize=extractionEngine.batchSize, tolerance=extractionEngine.timeTolerance, dedupe='timestamp', final=False):
+
+	if stateFile is None:
+		stateFile = defaultStateFile(dataFile)
+
+	state = loadState(stateFile)
+	if state and state['outputList'] != outputList:
+		raise ValueError('State file {0} was created for other columns : {1}'.format(stateFile, ', '.join(state['outputList'])))
+	if state and not os.path.isfile(dataFile):
+		raise ValueError('State file {0} exists but output {1} is missing'.format(stateFile, dataFile))
+
+	tables = list(extractionEngine.groupColumnsByTable(outputList))
+	primaryTable = tables[0]
+	previousMarks = state.get('tables', {})
+	newMarks = getHighWaterMarks(conn, tables)
+
+	primaryMark = previousMarks.get(primaryTable, {})
+	holdBackTimestamp = None if final else getHoldBackTimestamp(newMarks, tables, tolerance)
+	if holdBackTimestamp is not None and newMarks[primaryTable]['id'] is not None:
+		newMarks[primaryTable] = getExportedMark(conn, primaryTable, newMarks[primaryTable]['id'], holdBackTimestamp, primaryMark)
+	#Duplicates of the rows exported last time share their t_timestamp, the 'timestamp' dedupe looks back to it
+	tableBounds = {primaryTable: {'afterId': primaryMark.get('id'), 'lastId': newMarks[primaryTable]['id'], 'toTimestamp': holdBackTimestamp,
+	                              'dedupeFromTimestamp': primaryMark.get('t_timestamp')}}
+	if primaryMark.get('t_timestamp') is not None:
+		fromTimestamp = shiftTimestamp(primaryMark['t_timestamp'], -tolerance)
+		for table in tables[1:]:
+			tableBounds[table] = {'fromTimestamp': fromTimestamp}
+
+	previousRow = tuple(state['lastRow']) if state.get('lastRow') is not None else None
+	lastRow = [previousRow]
+	rows = rememberLastRow(extractionEngine.mergeJoin(conn, outputList, tolerance, batchSize, dedupe, tableBounds), lastRow)
+	#Without a state, any existing output is started again from scratch
+	#The 'consecutive' dedupe goes on from the last row written by the previous run
+	rowsWritten = extractionEngine.writeToFile(rows, outputList, dataFile, dedupe, 'csv', batchSize=batchSize, append=bool(state), previousRow=previousRow)
+
+	saveState(stateFile, {'outputList': outputList, 'tables': newMarks, 'lastRow': lastRow[0]})
+
+	return rowsWritten
@@ -0,0 +1,159 @@
+import sys
+import sqlite3
+import argparse
+from pathlib import Path
+
+import extractionEngine
+import incrementalExtraction
+import outputFormats
+from schemaCatalog import loadCatalog
+
+"""
+ASPire Log extraction - headless mode
+
+Description :
+Creates a CSV (or typed columnar) file from columns in ASPire's log database without opening the extraction window
+Columns are given as arguments and/or in a spec file, so it can run on the boat's onboard computer or from a cron job
+Rows are streamed from the database to the CSV file in batches, memory use stays flat whatever the length of the log
+Tables are joined on their closest timestamps (within tolerance seconds), see extractionEngine.mergeJoin
+
+HOW TO EXECUTE :
+	python3 logExtractionCLI.py <database> -c dataLogs_gps.t_timestamp dataLogs_gps.latitude [-s <spec file>] [-o <output file>] [-f csv|npz|feather|parquet] [-b <batch size>] [-t <tolerance>] [-d timestamp|consecutive|none] [--start <time>] [--end <time>] [--every <N> | --bucket <seconds> [--aggregate mean|last]] [-i [--state <state file>] [--final]] [--create-indexes]
+	python3 logExtractionCLI.py <database> --list
+"""
+
+
+"""
+readSpecFile receives the path of a spec file and returns the list of columns it contains
+
+A spec file contains one 'table.column' per line, blank lines and lines starting with # are ignored
+"""
+def readSpecFile(specFile):
+
+	columns = []
+	with open(specFile, 'r') as f:
+		for line in f:
+			line = line.strip()
+			if line and not line.startswith('#'):
+				columns.append(line)
+
+	return columns
+
+
+"""
+getDownsample converts the --every and --bucket arguments to the downsample given to extractionEngine.createTableExpression
+"""
+def getDownsample(args):
+
+	if args.every is not None:
+		return ('every', args.every)
+	if args.bucket is not None:
+		return ('bucket', args.bucket, args.aggregate)
+
+	return None
+
+
+"""
+getArguments retrieves and checks all passed parameters
+Returns the parsed arguments and the list of columns to export (Format : table.column)
+"""
+def getArguments():
+
+	parser = argparse.ArgumentParser(description='Creates a CSV (or typed columnar) file from columns in ASPire\'s log database')
+	parser.add_argument('database', help='path to the log database')
+	parser.add_argument('-c', '--columns', nargs='+', default=[], metavar='TABLE.COLUMN', help='columns to export')
+	parser.add_argument('-s', '--spec', help='file containing one TABLE.COLUMN per line')
+	parser.add_argument('-o', '--output', help='output file (default : logExtraction__Year_Month_Day__Hour_Minute.<format>)')
+	parser.add_argument('-f', '--format', choices=outputFormats.outputFormats, default='csv', help='output format, npz needs numpy, feather and parquet need pyarrow')
+	parser.add_argument('-b', '--batch-size', type=int, default=extractionEngine.batchSize, help='number of rows fetched from the database at once')
+	parser.add_argument('-t', '--tolerance', type=float, default=extractionEngine.timeTolerance, help='maximum time difference in seconds for rows of two tables to be joined')
+	parser.add_argument('-d', '--dedupe', choices=extractionEngine.dedupeModes, default='timestamp', help='timestamp : drop repeated samples of a table in SQLite, consecutive : drop output rows identical to the previous one, none : keep all rows')
+	parser.add_argument('--start', type=extractionEngine.normalizeTimestamp, help='only export rows from this time on (e.g. "2018-06-28 07:30")')
+	parser.add_argument('--end', type=extractionEngine.normalizeTimestamp, help='only export rows up to this time')
+	downsampleGroup = parser.add_mutually_exclusive_group()
+	downsampleGroup.add_argument('--every', type=int, metavar='N', help='only keep one row of the primary table out of N')
+	downsampleGroup.add_argument('--bucket', type=float, metavar='SECONDS', help='aggregate every table into one row per SECONDS')
+	parser.add_argument('--aggregate', choices=('mean', 'last'), default='mean', help='with --bucket : mean averages decimal columns (angles excepted), last keeps the last row of each bucket')
+	parser.add_argument('-i', '--incremental', action='store_true', help='only append rows logged since the previous run to the output (csv only, needs --output)')
+	parser.add_argument('--state', help='state file of the incremental mode (default : <output>.state.json)')
+	parser.add_argument('--final', action='store_true', help='with --incremental : once logging is over, also write the last rows held back until the other tables catch up')
+	parser.add_argument('-l', '--list', action='store_true', help='list the dataLogs tables with their columns, number of rows and time range, then exit')
+	parser.add_argument('--create-indexes', action='store_true', help='open the database for writing to create missing t_timestamp indexes')
+	args = parser.parse_args()
+
+	if not Path(args.database).is_file():
+		sys.exit("Database doesn't exist or can't be found!")
+
+	outputList = []
+	if args.spec:
+		if not Path(args.spec).is_file():
+			sys.exit("Spec file doesn't exist or can't be found!")
+		outputList += readSpecFile(args.spec)
+	outputList += args.columns
+
+	#Remove duplicates while keeping the order columns were given in
+	outputList = list(dict.fromkeys(outputList))
+
+	if args.list:
+		return args, outputList
+	if not outputList:
+		sys.exit('No columns to export, use --columns and/or --spec')
+	for column in outputList:
+		if len(column.split('.')) != 2:
+			sys.exit('Invalid column {0}, expected format is table.column'.format(column))
+	if args.batch_size < 1:
+		sys.exit('Invalid batch size')
+	if args.tolerance < 0:
+		sys.exit('Invalid tolerance')
+	if (args.every is not None and args.every < 1) or (args.bucket is not None and args.bucket <= 0):
+		sys.exit('Invalid downsampling')
+	args.downsample = getDownsample(args)
+	if args.incremental and (args.downsample or args.start or args.end):
+		sys.exit('Incremental mode can\'t be combined with a time range or downsampling')
+	if args.final and not args.incremental:
+		sys.exit('--final only applies to the incremental mode')
+	if args.incremental and (not args.output or args.format != 'csv'):
+		sys.exit('Incremental mode needs a fixed --output and the csv format')
+
+	return args, outputList
+
+
+"""
+printCatalog prints every dataLogs table of the catalog with its number of rows, time range and columns
+"""
+def printCatalog(catalog):
+
+	for table in catalog.dataLogTables():
+		tableInfo = catalog.tables[table]
+		print('{0} : {1} rows from {2} to {3}'.format(table, tableInfo['rows'], tableInfo['firstTimestamp'], tableInfo['lastTimestamp']))
+		for column, declaredType in tableInfo['columns']:
+			print('\t{0} {1}'.format(column, declaredType))
+
+
+#MAIN SCRIPT
+if __name__ == "__main__":
+
+	args, outputList = getArguments()
+
+	catalog = loadCatalog(args.database)
+	if args.list:
+		printCatalog(catalog)
+		sys.exit()
+	for column in outputList:
+		if not catalog.hasColumn(column):
+			sys.exit('Column {0} not found in database'.format(column))
+
+	conn = extractionEngine.connectDatabase(args.database, readOnly=not args.create_indexes)
+	try:
+		if args.incremental:
+			dataFile = args.output
+			rowsWritten = incrementalExtraction.extractIncremental(conn, outputList, dataFile, args.state, args.batch_size, args.tolerance, args.dedupe, args.final)
+		else:
+			dataFile, rowsWritten = extractionEngine.extractToFile(conn, outputList, args.output, args.batch_size, args.tolerance, args.dedupe, args.format,
+			                                                            fromTimestamp=args.start, toTimestamp=args.end, downsample=args.downsample)
+	except (sqlite3.Error, ImportError, ValueError) as e:
+		sys.exit('Extraction failed : {0}'.format(e))
+	finally:
+		conn.close()
+
+	print('Exported {0} rows to {1}'.format(rowsWritten, dataFile))
@@ -1,12 +1,13 @@
-import sys
+import os
+import time
+import queue
 import sqlite3
+import threading
 from pathlib import Path
 from tkinter import *
-import csv
-import datetime
-import re
 
-now = datetime.datetime.now()
+from extractionEngine import groupColumnsByTable, createTableExpression, extractToFile, connectDatabase, defaultOutputFile, ExtractionCancelled
+from schemaCatalog import loadCatalog
 
 """
 ASPire Log extraction software
@@ -27,6 +28,8 @@ outputList = []
 listWidth = 30
 buttonWidth = 7
 hPadding = 0
+#Time in ms between two checks of the export's progress
+progressInterval = 200
 
 """
 Asks use to input his database and checks if it exists.
@@ -47,19 +50,12 @@ while dbFoundFlag == 0:
 		print("Yosh hasn't found the database or it doesn't exist, please try again")
 	
 conn = sqlite3.connect(dbPath)
-c = conn.cursor()
 
-#Get all database's tables
-c.execute('SELECT name FROM main.sqlite_master WHERE type=\'table\'')
-allTables = c.fetchall()
+#Tables and columns are read once from the catalog, cached next to the database for the next time it is opened
+catalog = loadCatalog(dbPath, conn)
 
 #Keep only the 'dataLogs' tables
-dbTables=[]
-for n in range(len(allTables)):
-	#Each item in allTables is a tuple with this format : (table, ). Since it has two values (for some reason) we must keep only what is at index 0 of this tuple
-	item = allTables[n][0]
-	if re.match('^dataLogs_.*', str(item)):
-		dbTables.append(item)
+dbTables = catalog.dataLogTables()
 
 
 
@@ -105,17 +101,13 @@ class TableList:
 			
 		
 		#Logging
-		print("Table {0} selected - Yosh thanks you".format(selectedTable))
-		
-		#Get all tables' columns
-		c.execute('PRAGMA table_info({0})'.format(selectedTable))
-		tableColumns = c.fetchall()
+		tableInfo = catalog.tables[selectedTable]
+		print("Table {0} selected ({1} rows from {2} to {3}) - Yosh thanks you".format(selectedTable, tableInfo['rows'], tableInfo['firstTimestamp'], tableInfo['lastTimestamp']))
 		
 		#Delete all column list to refresh display
 		columnList.columnList.delete(0,END)
-		#Insert columns into the columnList listbox
-		for item in tableColumns:
-			columnName = item[1]
+		#Insert columns from the catalog into the columnList listbox
+		for columnName in catalog.columns(selectedTable):
 			columnList.columnList.insert(END, columnName)
 
 		
@@ -179,8 +171,10 @@ class ColumnList:
 """
 ChosenList is the list containing all columns the user has chosen from using previous TableList and ColumnList
 
-Three features : Visualising selected columns, deleting them from list and submitting
+Four features : Visualising selected columns, deleting them from list, submitting and cancelling
 Submitting will take all columns and output a CSV file with all their data
+The export runs in a worker thread which reports its progress through a queue read by the Tk loop, so the window never freezes
+Cancelling interrupts the running SQLite query and stops the export
 """
 class ChosenList:
 	
@@ -203,22 +197,148 @@ class ChosenList:
 		
 		self.deleteButton = Button(self.chosenButtonsFrame, text = "DELETE", command=self.deleteColumns, width=buttonWidth, padx=hPadding)
 		self.deleteButton.grid(row=1, column=0, sticky='w')
+		
+		self.cancelButton = Button(self.chosenButtonsFrame, text = "CANCEL", command=self.cancelExport, width=buttonWidth, padx=hPadding, state=DISABLED)
+		self.cancelButton.grid(row=2, column=0, sticky='w')
+		
+		#Progress of the running export
+		self.progressLabel = Label(self.chosenFrame, text="", anchor='w')
+		self.progressLabel.grid(row=2, column=0, columnspan=2, sticky='w')
+		
+		self.progressQueue = queue.Queue()
+		self.cancelEvent = threading.Event()
+		self.exportConn = None
+		self.exportThread = None
 	
-	#All selected columns are output to a csv file
+	#All selected columns are output to a csv file by a worker thread
 	def submitColumns(self):
 		
 		global outputList
 		
+		if self.exportThread is not None:
+			print("Yosh is already exporting, please wait or cancel!")
+			return
+		
 		if not outputList:
 			print("No columns to submit to Yosh!")
 			return
 		
-		expression = createExecuteExpression(outputList)
+		tableColumns = groupColumnsByTable(outputList)
+		print("Yosh has generated these SQL expressions for you :")
+		for table in tableColumns:
+			print(createTableExpression(table, tableColumns[table]))
+		
+		#Number of rows of the primary table, used to estimate when the export will be done
+		primaryTable = list(tableColumns)[0]
+		expectedRows = catalog.tables[primaryTable]['rows'] if primaryTable in catalog.tables else 0
+		
+		dataFile = defaultOutputFile()
+		self.cancelEvent.clear()
+		self.exportThread = threading.Thread(target=self.runExport, args=(list(outputList), dataFile, expectedRows), daemon=True)
+		self.exportThread.start()
+		
+		self.submitButton.config(state=DISABLED)
+		self.cancelButton.config(state=NORMAL)
+		self.progressLabel.config(text="Yosh is starting the export...")
+		root.after(progressInterval, self.checkProgress)
+	
+	#Runs in the worker thread : exports the columns and puts progress messages on the queue
+	def runExport(self, exportList, dataFile, expectedRows):
+		
+		startTime = time.time()
+		
+		#Called after each batch of rows written, stops the export if the user has cancelled it
+		def progress(rowsWritten):
+			if self.cancelEvent.is_set():
+				raise ExtractionCancelled()
+			self.progressQueue.put(('progress', rowsWritten, expectedRows, time.time() - startTime))
+		
+		#sqlite3 connections can't be shared between threads, the worker opens its own
+		self.exportConn = None
+		try:
+			self.exportConn = connectDatabase(dbPath)
+			#Tables are merged on their closest timestamps and rows are streamed from the database to the file in batches
+			dataFile, rowsWritten = extractToFile(self.exportConn, exportList, dataFile, progress=progress)
+			self.progressQueue.put(('done', rowsWritten, dataFile, time.time() - startTime))
+		except (ExtractionCancelled, sqlite3.OperationalError) as e:
+			if self.cancelEvent.is_set():
+				if os.path.isfile(dataFile):
+					os.remove(dataFile) #Don't leave a half written file behind
+				self.progressQueue.put(('cancelled',))
+			else:
+				self.progressQueue.put(('error', str(e)))
+		except sqlite3.Error as e:
+			self.progressQueue.put(('error', str(e)))
+		except Exception as e:
+			#Output file, writer or missing module : checkProgress must still hear that the export is over
+			self.progressQueue.put(('error', "{0} : {1}".format(type(e).__name__, e)))
+		finally:
+			if self.exportConn is not None:
+				self.exportConn.close()
+			self.exportConn = None
+	
+	#Runs in the Tk loop : reads the worker's messages and updates the display until the export is over
+	def checkProgress(self):
+		
+		finished = False
+		keepPolling = False
+		try:
+			while not self.progressQueue.empty():
+				message = self.progressQueue.get()
+			
+				if message[0] == 'progress':
+					rowsWritten, expectedRows, elapsed = message[1:]
+					rate = rowsWritten / elapsed if elapsed > 0 else 0
+					text = "Yosh has exported {0} rows ({1:.0f} rows/s)".format(rowsWritten, rate)
+					if expectedRows and rate:
+						remaining = max(expectedRows - rowsWritten, 0) / rate
+						text += ", about {0:.0f}s left".format(remaining)
+					self.progressLabel.config(text=text)
+			
+				elif message[0] == 'done':
+					rowsWritten, dataFile, elapsed = message[1:]
+					self.progressLabel.config(text="Yosh has finished exporting {0} rows to {1} in {2:.1f}s".format(rowsWritten, dataFile, elapsed))
+					print("Yosh has finished exporting {0} rows to {1}".format(rowsWritten, dataFile))
+					finished = True
+			
+				elif message[0] == 'cancelled':
+					self.progressLabel.config(text="Export cancelled - Yosh has deleted the unfinished file")
+					print("Yosh has cancelled the export")
+					finished = True
+			
+				else:
+					self.progressLabel.config(text="Export failed : {0}".format(message[1]))
+					print("Yosh couldn't export : {0}".format(message[1]))
+					finished = True
+			
+			#The worker always posts how the export ended, this only catches a thread that died without a word
+			if not finished and not self.exportThread.is_alive() and self.progressQueue.empty():
+				self.progressLabel.config(text="Export failed : the export stopped unexpectedly")
+				finished = True
+			keepPolling = not finished
+		finally:
+			#Buttons are given back even if a message couldn't be shown
+			if keepPolling:
+				root.after(progressInterval, self.checkProgress)
+			else:
+				self.exportThread = None
+				self.submitButton.config(state=NORMAL)
+				self.cancelButton.config(state=DISABLED)
+	
+	#Stops the running export, interrupting the current SQLite query if there is one
+	def cancelExport(self):
 		
-		c.execute(expression)
-		data = c.fetchall()
+		if self.exportThread is None:
+			return
 		
-		writeToFile(data)
+		print("Yosh is cancelling the export...")
+		self.cancelEvent.set()
+		exportConn = self.exportConn
+		if exportConn is not None:
+			try:
+				exportConn.interrupt()
+			except sqlite3.ProgrammingError:
+				pass #The export has just finished and closed its connection
 	
 	
 	#Deletes all columns selected by user from the outputList
@@ -250,117 +370,6 @@ class ChosenList:
 					self.chosenList.insert(END, item)
 	
 	
-"""
-createExecuteExpression receives outputList and returns a proper SQL expression to be executed by sqlite3's cursor
-
-Joins all 'table.column' contained in outputList into a string to be inserted after the SELECT keyword
-Extracts all table names to be insterted after FROM and sends them to the joinExpression function in order to create what is needed after the FROM
-Puts the expression into format and returns it
-"""
-def createExecuteExpression(outputList):
-	
-	#String used after the SELECT instruction, need to be separated by commas
-	columnsToSelect = ','.join(outputList)
-	
-	#Extract all table names from the outputList, used after the 'FROM' in our expression
-	outputTables = []
-	for n in range(len(outputList)):
-		#Split outputList at the '.' and keep only first part, which is the table
-		outputTables.append(outputList[n].split('.')[0])
-	#Join all tables separated by commas to fit the expression's format
-	outputTablesString = ','.join(outputTables)
-	
-	#String containing the name of first table, used as primary table
-	firstTable = outputTables[0]
-	
-	#Create the expression to be executed
-	expression = 'SELECT ' + columnsToSelect + ' FROM ' + firstTable + joinExpression(firstTable, outputTables)
-	print("Yosh has generated this SQL expression for you :")
-	print(expression)
-	
-	return expression
-
-
-"""
-joinExpression receives the first table and list of all output tables
-
-Out of the outputTables list, extracts each unique table and removes the first one
-For each unique table, creates an INNER JOIN expression and adds it to res before being returned
-"""
-def joinExpression(firstTable, outputTables):
-	
-	#res is the returned INNER JOIN part of the expression
-	res = ''
-	#uniqueTables contains all unique table names to avoid duplicates
-	uniqueTables = []
-	
-	#For each unique word in outputTables, add that to uniqueTables and remove the first that who's timestamp serves as the primary key. This is done to avoid joining the primary table to itself
-	for item in set(outputTables):
-		uniqueTables.append(item)
-	uniqueTables.remove(firstTable)
-	
-	#If there is more than just the primary table then start creating the INNER JOIN expression, otherwise return an empty result
-	if len(uniqueTables)>=1:
-		for n in range(len(uniqueTables)):
-			res += ' INNER JOIN ' + uniqueTables[n] + ' ON ' + firstTable + '.t_timestamp = ' + uniqueTables[n] + '.t_timestamp'
-			
-		#FORMAT OF CREATED EXPRESSION : 
-		#	INNER JOIN Table1 ON Table0.t_timestamp = Table1.t_timestamp
-		#		INNER JOIN Table2 ON Table0.t_timestamp = Table2.t_timestamp
-		#			etc
-	else:
-		res = ''
-		
-	res += ' ORDER BY ' + firstTable + '.id ASC'
-
-	return res
-
-"""
-writeToFile receives the data extracted from database and exports it to a csv file
-
-Creates a new file with today's date up to the minute as its name
-First writes a header to that file to indicate each column's name
-Goes through all the data, removing the rows with null data (-2000)
-Writes the rest to the file in a csv format
-"""
-def writeToFile(data):
-	
-	global outputList
-	
-	output = []
-	#Create a string containing today's date up to the current minute
-	todayDate = str(now.year) + '_' + str(now.month) + '_' + str(now.day) + '__' + str(now.hour) + '_' + str(now.minute)
-	#Add to this string a name and extension
-	dataFile = 'logExtraction__' + todayDate + '.csv'
-	
-	#Take length of first data tuple as an indicator of how many columns exist
-	numberOfColumns = len(data[0])
-	
-	#Create the header, going through outputList (Format : table.column) and keeping only the second part, the column
-	header = []
-	for column in range(len(outputList)):
-		header.append(outputList[column].split('.')[1])
-	
-	lines_seen = set() # holds lines already seen
-	with open(dataFile, "w") as f:
-		
-		writer = csv.writer(f, lineterminator='\n')
-		writer.writerow(header)
-		
-		#Go through each row, remove those that have null data and write the others to the csv file
-		for rowNo in range(len(data)):
-			line = 	data[rowNo] #Contains the line of data to process to csv
-			
-			if -2000 in line:
-				pass #Null data found in database, do not write it to csv file
-			else:
-				if line not in lines_seen: #Not a duplicate
-					lines_seen.add(line)
-					writer.writerow(line)
-				
-		print("Yosh has finished exporting to " + dataFile)
-
-	
 root = Tk()
 root.title("ASPire Log Extraction - Joshua Bruylant")
 root.resizable(False, False)
@@ -0,0 +1,248 @@
+import csv
+import tempfile
+import zipfile
+from datetime import datetime
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+try:
+	import pyarrow as pa
+	import pyarrow.parquet as pq
+except ImportError:
+	pa = None
+
+"""
+ASPire Log extraction output formats
+
+Description :
+Writers used by extractionEngine.writeToFile to export the extracted rows
+Rows are handed over in batches, every writer keeps at most one batch in memory
+
+	- csv : text file with a header line (default, no extra dependency)
+	- npz : NumPy archive with one typed array per column, t_timestamp is stored as datetime64[ms] (needs numpy)
+	- feather : Arrow IPC file written one record batch at a time, can be memory-mapped when read back (needs pyarrow)
+	- parquet : Parquet file written one row group per batch (needs pyarrow)
+"""
+
+outputFormats = ('csv', 'npz', 'feather', 'parquet')
+
+
+"""
+columnKind receives a column name and its type as declared in the database and returns how it is stored in typed outputs
+One of 'timestamp', 'int', 'float' or 'text', following SQLite's type affinity rules
+"""
+def columnKind(column, declaredType):
+
+	declaredType = declaredType.upper()
+
+	if column == 't_timestamp':
+		return 'timestamp'
+	if 'INT' in declaredType:
+		return 'int'
+	if any(name in declaredType for name in ('REAL', 'FLOA', 'DOUB', 'NUM', 'DEC')):
+		return 'float'
+
+	return 'text'
+
+
+"""
+parseTimestamp converts a t_timestamp (Format : 2018-06-28_07:34:55.850) into a datetime, None stays None
+"""
+def parseTimestamp(text):
+
+	if text is None:
+		return None
+
+	return datetime.fromisoformat(text.replace('_', ' '))
+
+
+"""
+createHeader receives outputList (Format : table.column) and keeps only the second part, the column
+"""
+def createHeader(outputList):
+
+	return [column.split('.')[1] for column in outputList]
+
+
+"""
+createColumnNames receives outputList (Format : table.column) and returns the name of each column in typed outputs
+
+The column name is used on its own unless two selected tables share it, in which case the table is kept in front of it
+"""
+def createColumnNames(outputList):
+
+	columns = createHeader(outputList)
+
+	return [column if columns.count(column) == 1 else item for item, column in zip(outputList, columns)]
+
+
+"""
+CSVWriter writes rows to a csv file, first line being a header containing the name of each column
+With append set, rows are added at the end of the file and the header is only written if the file is empty
+"""
+class CSVWriter:
+
+	def __init__(self, dataFile, header, columnKinds, append=False):
+
+		self.file = open(dataFile, 'a' if append else 'w')
+		self.writer = csv.writer(self.file, lineterminator='\n')
+		if self.file.tell() == 0:
+			self.writer.writerow(header)
+
+	def writeBatch(self, rows):
+
+		self.writer.writerows(rows)
+
+	def close(self):
+
+		self.file.close()
+
+
+"""
+NPZWriter writes each column to a typed array inside a NumPy .npz archive
+
+An .npz archive needs the final length of every array in its header, so each batch is first converted and saved to a temporary file per column
+On close the arrays are copied batch after batch into the (uncompressed) archive
+Integer columns containing empty values are stored as float with NaN, empty timestamps as NaT
+"""
+class NPZWriter:
+
+	def __init__(self, dataFile, columnNames, columnKinds):
+
+		if np is None:
+			raise ImportError('numpy is needed to export to npz')
+
+		self.dataFile = dataFile
+		self.columnNames = columnNames
+		self.columnKinds = columnKinds
+		self.tempFiles = [tempfile.TemporaryFile() for column in columnNames]
+		self.hasMissing = [False] * len(columnNames)
+		self.textWidths = [1] * len(columnNames)
+		self.numberOfRows = 0
+		self.numberOfBatches = 0
+
+	def toArray(self, n, values):
+
+		kind = self.columnKinds[n]
+
+		if kind == 'timestamp':
+			return np.array(['NaT' if value is None else value.replace('_', 'T') for value in values], dtype='datetime64[ms]')
+		if kind == 'float':
+			return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+		if kind == 'int':
+			if None in values:
+				self.hasMissing[n] = True
+				return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+			return np.array(values, dtype=np.int64)
+
+		array = np.array(['' if value is None else str(value) for value in values], dtype=np.str_)
+		self.textWidths[n] = max(self.textWidths[n], array.dtype.itemsize // 4)
+		return array
+
+	def finalType(self, n):
+
+		kind = self.columnKinds[n]
+
+		if kind == 'timestamp':
+			return np.dtype('datetime64[ms]')
+		if kind == 'float' or (kind == 'int' and self.hasMissing[n]):
+			return np.dtype(np.float64)
+		if kind == 'int':
+			return np.dtype(np.int64)
+
+		return np.dtype('<U{0}'.format(self.textWidths[n]))
+
+	def writeBatch(self, rows):
+
+		columns = list(zip(*rows))
+		for n in range(len(self.columnNames)):
+			np.save(self.tempFiles[n], self.toArray(n, columns[n]))
+
+		self.numberOfRows += len(rows)
+		self.numberOfBatches += 1
+
+	def close(self):
+
+		with zipfile.ZipFile(self.dataFile, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+			for n in range(len(self.columnNames)):
+				dtype = self.finalType(n)
+				tempFile = self.tempFiles[n]
+				tempFile.seek(0)
+
+				with archive.open(self.columnNames[n] + '.npy', 'w', force_zip64=True) as member:
+					header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (self.numberOfRows,)}
+					np.lib.format.write_array_header_1_0(member, header)
+					for batch in range(self.numberOfBatches):
+						member.write(np.load(tempFile).astype(dtype).tobytes())
+
+				tempFile.close()
+
+
+"""
+ArrowWriter writes rows to an Arrow IPC (feather) or a Parquet file, one record batch or row group per batch
+All columns are nullable, empty values stay empty
+"""
+class ArrowWriter:
+
+	def __init__(self, dataFile, columnNames, columnKinds, outputFormat):
+
+		if pa is None:
+			raise ImportError('pyarrow is needed to export to {0}'.format(outputFormat))
+
+		arrowTypes = {'timestamp': pa.timestamp('ms'), 'int': pa.int64(), 'float': pa.float64(), 'text': pa.string()}
+
+		self.columnKinds = columnKinds
+		self.schema = pa.schema([pa.field(name, arrowTypes[kind]) for name, kind in zip(columnNames, columnKinds)])
+		self.sink = None
+
+		if outputFormat == 'parquet':
+			self.writer = pq.ParquetWriter(dataFile, self.schema)
+		else:
+			self.sink = pa.OSFile(dataFile, 'wb')
+			self.writer = pa.ipc.new_file(self.sink, self.schema)
+
+	def writeBatch(self, rows):
+
+		columns = list(zip(*rows))
+		arrays = []
+		for n, field in enumerate(self.schema):
+			values = columns[n]
+			if self.columnKinds[n] == 'timestamp':
+				values = [parseTimestamp(value) for value in values]
+			elif self.columnKinds[n] == 'text':
+				values = [None if value is None else str(value) for value in values]
+			arrays.append(pa.array(values, type=field.type))
+
+		batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+		if self.sink is None:
+			self.writer.write_table(pa.Table.from_batches([batch]))
+		else:
+			self.writer.write_batch(batch)
+
+	def close(self):
+
+		self.writer.close()
+		if self.sink is not None:
+			self.sink.close()
+
+
+"""
+createWriter returns the writer corresponding to outputFormat (one of outputFormats)
+Only csv files can be appended to
+Raises ImportError if the library needed by the format isn't installed
+"""
+def createWriter(outputFormat, dataFile, outputList, columnKinds, append=False):
+
+	if outputFormat == 'csv':
+		return CSVWriter(dataFile, createHeader(outputList), columnKinds, append)
+	if append:
+		raise ValueError('Only csv files can be appended to')
+	if outputFormat == 'npz':
+		return NPZWriter(dataFile, createColumnNames(outputList), columnKinds)
+	if outputFormat in ('feather', 'parquet'):
+		return ArrowWriter(dataFile, createColumnNames(outputList), columnKinds, outputFormat)
+
+	raise ValueError('Unknown output format {0}'.format(outputFormat))
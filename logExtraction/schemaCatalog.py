@@ -0,0 +1,138 @@
+import os
+import re
+import json
+
+import extractionEngine
+
+"""
+ASPire Log extraction - schema catalog
+
+Description :
+Describes every table of a database : its columns and their types, its number of rows and its first and last t_timestamp
+The catalog is built once and saved in a JSON cache file next to the database, keyed by the size and modification time of the database (and of its write-ahead log)
+Opening the same database again reads the cache instead of querying every table, which matters on slow SD cards
+Used by the extraction GUI and the headless command
+"""
+
+
+"""
+defaultCacheFile returns the name of the cache file kept next to the database
+"""
+def defaultCacheFile(dbPath):
+
+	return str(dbPath) + '.catalog.json'
+
+
+"""
+SchemaCatalog holds the description of a database's tables
+
+tables is a dict keyed by table name (in database order) whose values are dicts with the keys :
+	- columns : list of [column, declared type]
+	- rows : number of rows
+	- firstTimestamp, lastTimestamp : first and last t_timestamp, None if the table has no t_timestamp column or no rows
+"""
+class SchemaCatalog:
+
+	def __init__(self, tables):
+
+		self.tables = tables
+
+	#Builds the catalog by querying every table of the database
+	@classmethod
+	def build(cls, conn):
+
+		c = conn.cursor()
+		c.execute('SELECT name FROM main.sqlite_master WHERE type=\'table\'')
+		tableNames = [item[0] for item in c.fetchall()]
+
+		tables = {}
+		for table in tableNames:
+			c.execute('PRAGMA table_info({0})'.format(table))
+			columns = [[column[1], column[2]] for column in c.fetchall()]
+
+			c.execute('SELECT count(*) FROM {0}'.format(table))
+			rows = c.fetchone()[0]
+
+			firstTimestamp, lastTimestamp = None, None
+			if 't_timestamp' in [column[0] for column in columns]:
+				#Both use the t_timestamp index if there is one
+				c.execute('SELECT min(t_timestamp) FROM {0}'.format(table))
+				firstTimestamp = c.fetchone()[0]
+				c.execute('SELECT max(t_timestamp) FROM {0}'.format(table))
+				lastTimestamp = c.fetchone()[0]
+
+			tables[table] = {'columns': columns, 'rows': rows, 'firstTimestamp': firstTimestamp, 'lastTimestamp': lastTimestamp}
+
+		return cls(tables)
+
+	#Returns the names of all 'dataLogs_*' tables
+	def dataLogTables(self):
+
+		return [table for table in self.tables if re.match('^dataLogs_.*', table)]
+
+	#Returns the names of all columns of table
+	def columns(self, table):
+
+		return [column[0] for column in self.tables[table]['columns']]
+
+	#Checks that item (Format : table.column) exists in the database
+	def hasColumn(self, item):
+
+		table, column = item.split('.')
+
+		return table in self.tables and column in self.columns(table)
+
+
+"""
+databaseKey returns what identifies a version of the database : the size and modification time of its file and of its write-ahead log if there is one
+In WAL mode, rows written by the logger stay in "<database>-wal" until a checkpoint, the database file itself doesn't change
+"""
+def databaseKey(dbPath):
+
+	stat = os.stat(dbPath)
+	key = [stat.st_size, stat.st_mtime_ns]
+
+	walPath = str(dbPath) + '-wal'
+	if os.path.isfile(walPath):
+		walStat = os.stat(walPath)
+		key += [walStat.st_size, walStat.st_mtime_ns]
+
+	return key
+
+
+"""
+loadCatalog returns the SchemaCatalog of the database at dbPath
+
+If the cache file was written for the current version of the database it is used, otherwise the catalog is built (using conn if given) and cached
+A cache that can't be written (read only folder) is simply skipped
+"""
+def loadCatalog(dbPath, conn=None, cacheFile=None):
+
+	if cacheFile is None:
+		cacheFile = defaultCacheFile(dbPath)
+	key = databaseKey(dbPath)
+
+	try:
+		with open(cacheFile, 'r') as f:
+			cache = json.load(f)
+		if cache['key'] == key:
+			return SchemaCatalog(cache['tables'])
+	except (OSError, ValueError, KeyError):
+		pass
+
+	if conn is None:
+		catalogConn = extractionEngine.connectDatabase(dbPath, readOnly=True)
+		try:
+			catalog = SchemaCatalog.build(catalogConn)
+		finally:
+			catalogConn.close()
+	else:
+		catalog = SchemaCatalog.build(conn)
+
+	try:
+		with open(cacheFile, 'w') as f:
+			json.dump({'key': key, 'tables': catalog.tables}, f)
+	except OSError:
+		pass
+
+	return catalog
@@ -0,0 +1,194 @@
+import sys
+import math
+import random
+import sqlite3
+import argparse
+import datetime
+from array import array
+from itertools import islice
+from pathlib import Path
+
+"""
+ASPire synthetic log database generator
+
+Description :
+Creates a database looking like ASPire's asr.db, used to benchmark the extraction without a real test sail
+	- dataLogs_gps, dataLogs_compass and dataLogs_windsensor logged at different rates, each logger a few milliseconds off the others
+	- -2000 null data gaps and duplicated rows, as written by the real loggers
+	- a current_Mission table with a few waypoints around the generated track
+
+HOW TO EXECUTE :
+	python3 syntheticDatabase.py <database> [-r <total number of rows>] [--seed <seed>]
+"""
+
+#Logging rate (Hz) and columns (name, type) of each generated table
+tableRates = {'dataLogs_gps': 1, 'dataLogs_compass': 10, 'dataLogs_windsensor': 4}
+tableColumns = {
+	'dataLogs_gps': [('latitude', 'DOUBLE'), ('longitude', 'DOUBLE'), ('speed', 'DOUBLE'), ('course', 'DOUBLE'), ('satellites_used', 'INTEGER'), ('rc_on', 'INTEGER')],
+	'dataLogs_compass': [('heading', 'DOUBLE'), ('pitch', 'DOUBLE'), ('roll', 'DOUBLE')],
+	'dataLogs_windsensor': [('direction', 'DOUBLE'), ('speed', 'DOUBLE'), ('temperature', 'DOUBLE')],
+}
+
+#Probabilities, per row, of starting a -2000 gap and of writing the row twice
+gapProbability = 0.002
+duplicateProbability = 0.005
+#Longest -2000 gap, in rows
+maxGapLength = 30
+
+startTime = datetime.datetime(2018, 6, 28, 7, 0, 0)
+startLat = 60.1072
+startLon = 19.9244
+
+#Rows are inserted and committed this many at a time
+insertBatchSize = 10000
+
+
+"""
+formatTimestamp returns a datetime in the t_timestamp format : 2018-06-28_07:34:55.850
+"""
+def formatTimestamp(time):
+
+	return time.strftime('%Y-%m-%d_%H:%M:%S.%f')[:-3]
+
+
+"""
+Boat simulates the sailing boat : a slowly turning course, a speed around 1.5 m/s and the RC switched on and off every few minutes
+The whole track is drawn once, one point per second, when the boat is created
+state(t) interpolates it t seconds after the start : it only depends on t, so every sensor table and the mission's waypoints see the same boat
+"""
+class Boat:
+
+	def __init__(self, randomGenerator, duration):
+
+		self.lats, self.lons, self.speeds, self.courses = array('d'), array('d'), array('d'), array('d')
+		self.rcOn = array('b')
+
+		lat, lon, course, speed, rcOn = startLat, startLon, 90.0, 1.5, 0
+		nextRCSwitch = randomGenerator.uniform(120, 600)
+		#Loggers start up to 50 ms late and samples are a few ms off, the track goes on a little after duration
+		for second in range(int(math.ceil(duration)) + 2):
+			self.lats.append(lat)
+			self.lons.append(lon)
+			self.speeds.append(speed)
+			self.courses.append(course)
+			self.rcOn.append(rcOn)
+
+			course = (course + randomGenerator.gauss(0, 2)) % 360
+			speed = min(max(speed + randomGenerator.gauss(0, 0.05), 0.2), 3.0)
+			lat += speed * math.cos(math.radians(course)) / 111320.0
+			lon += speed * math.sin(math.radians(course)) / (111320.0 * math.cos(math.radians(lat)))
+			if second + 1 >= nextRCSwitch:
+				rcOn = 1 - rcOn
+				nextRCSwitch = second + 1 + randomGenerator.uniform(120, 600)
+
+	def state(self, t):
+
+		second = min(max(int(t), 0), len(self.lats) - 2)
+		fraction = min(max(t - second, 0.0), 1.0)
+		lat = self.lats[second] + (self.lats[second + 1] - self.lats[second]) * fraction
+		lon = self.lons[second] + (self.lons[second + 1] - self.lons[second]) * fraction
+		speed = self.speeds[second] + (self.speeds[second + 1] - self.speeds[second]) * fraction
+		#Course turns the short way round, 359 to 1 goes through 0
+		turn = (self.courses[second + 1] - self.courses[second] + 180) % 360 - 180
+		course = (self.courses[second] + turn * fraction) % 360
+
+		return lat, lon, speed, course, self.rcOn[second]
+
+
+"""
+generateRows yields the rows (t_timestamp, values...) of table for the given duration in seconds
+
+boat gives the position and course of the boat, randomGenerator the sensor noise
+Every logger starts a few milliseconds after the others and each sample is a few milliseconds late or early
+"""
+def generateRows(table, duration, boat, randomGenerator):
+
+	rate = tableRates[table]
+	numberOfColumns = len(tableColumns[table])
+	offset = randomGenerator.uniform(0, 0.05)
+	gapLeft = 0
+
+	for n in range(int(duration * rate)):
+		t = n / rate + offset
+		jitter = randomGenerator.uniform(-0.003, 0.003)
+		timestamp = formatTimestamp(startTime + datetime.timedelta(seconds=t + jitter))
+		lat, lon, speed, course, rcOn = boat.state(t)
+
+		if table == 'dataLogs_gps':
+			values = (round(lat, 8), round(lon, 8), round(speed, 2), round(course, 1), randomGenerator.randint(5, 11), rcOn)
+		elif table == 'dataLogs_compass':
+			values = (round((course + randomGenerator.gauss(0, 3)) % 360, 1), round(randomGenerator.gauss(0, 5), 1), round(randomGenerator.gauss(0, 10), 1))
+		else:
+			values = (round(randomGenerator.uniform(170, 230), 1), round(randomGenerator.uniform(3, 9), 1), round(randomGenerator.uniform(12, 18), 1))
+
+		#Sensor without data : the logger writes -2000 in every column
+		if gapLeft == 0 and randomGenerator.random() < gapProbability:
+			gapLeft = randomGenerator.randint(1, maxGapLength)
+		if gapLeft > 0:
+			values = (-2000,) * numberOfColumns
+			gapLeft -= 1
+
+		yield (timestamp,) + values
+		if randomGenerator.random() < duplicateProbability:
+			yield (timestamp,) + values
+
+
+"""
+createDatabase creates the synthetic database at dbPath with about totalRows rows in its dataLogs tables
+Returns the number of rows written in each table
+"""
+def createDatabase(dbPath, totalRows, seed=0):
+
+	duration = totalRows / sum(tableRates.values())
+
+	conn = sqlite3.connect(dbPath)
+	conn.execute('PRAGMA journal_mode=OFF')
+	conn.execute('PRAGMA synchronous=OFF')
+
+	#Every table and the waypoints follow the same track
+	boat = Boat(random.Random(seed), duration)
+
+	rowCounts = {}
+	for n, table in enumerate(tableRates):
+		columns = tableColumns[table]
+		conn.execute('DROP TABLE IF EXISTS {0}'.format(table))
+		conn.execute('CREATE TABLE {0} (id INTEGER PRIMARY KEY AUTOINCREMENT, t_timestamp TEXT, {1})'.format(table, ', '.join(name + ' ' + declaredType for name, declaredType in columns)))
+
+		insert = 'INSERT INTO {0} (t_timestamp, {1}) VALUES ({2})'.format(table, ', '.join(name for name, declaredType in columns), ','.join('?' * (len(columns) + 1)))
+		rows = generateRows(table, duration, boat, random.Random(seed + n + 1))
+		rowCounts[table] = 0
+		while True:
+			batch = list(islice(rows, insertBatchSize))
+			if not batch:
+				break
+			conn.executemany(insert, batch)
+			conn.commit()
+			rowCounts[table] += len(batch)
+
+	#A few waypoints spread along the track
+	conn.execute('DROP TABLE IF EXISTS current_Mission')
+	conn.execute('CREATE TABLE current_Mission (id INTEGER PRIMARY KEY, is_checkpoint BOOLEAN, latitude DOUBLE, longitude DOUBLE, declination INTEGER, radius INTEGER, stay_time INTEGER, harvested BOOLEAN)')
+	for n in range(1, 6):
+		lat, lon, speed, course, rcOn = boat.state(duration * n / 6)
+		conn.execute('INSERT INTO current_Mission VALUES (?, 0, ?, ?, 6, 30, 0, 0)', (n, round(lat, 5), round(lon, 5)))
+	conn.commit()
+	conn.close()
+
+	return rowCounts
+
+
+#MAIN SCRIPT
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description='Creates a synthetic ASPire log database')
+	parser.add_argument('database', help='path of the database to create')
+	parser.add_argument('-r', '--rows', type=int, default=10000, help='total number of rows in the dataLogs tables (default : 10000)')
+	parser.add_argument('--seed', type=int, default=0, help='random seed, the same seed always gives the same database')
+	args = parser.parse_args()
+
+	if Path(args.database).exists():
+		sys.exit('{0} already exists, please remove it or choose another name'.format(args.database))
+
+	rowCounts = createDatabase(args.database, args.rows, args.seed)
+	for table in rowCounts:
+		print('{0} : {1} rows'.format(table, rowCounts[table]))
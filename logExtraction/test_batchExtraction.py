@@ -0,0 +1,158 @@
+import os
+import csv
+
+import pytest
+
+import batchExtraction
+from test_extractionEngine import createDatabase
+
+"""
+Tests of batchExtraction.py, run with : python3 -m pytest
+Sails are small databases logged over the same hour, so their rows interleave when merged
+"""
+
+outputList = ['gps.t_timestamp', 'gps.latitude', 'gps.rc_on', 'wind.speed']
+
+
+"""
+extractSails writes one database per seed under tmp_path/sail<n>/asr.db and extracts each of them, returns the csv outputs
+"""
+def extractSails(tmp_path, seeds):
+
+	databases = []
+	for n, seed in enumerate(seeds):
+		os.makedirs(tmp_path / 'sail{0}'.format(n))
+		databases.append(str(tmp_path / 'sail{0}'.format(n) / 'asr.db'))
+		createDatabase(databases[-1], seed, numberOfRows=300)
+
+	dataFiles = batchExtraction.createOutputNames(databases, str(tmp_path / 'out'), 'csv')
+	os.makedirs(tmp_path / 'out')
+	for database, dataFile in zip(databases, dataFiles):
+		error = batchExtraction.extractDatabase(database, dataFile, outputList, 50, 0.5, 'timestamp', 'csv', None, None, None)[3]
+		assert error is None
+
+	return dataFiles
+
+
+"""
+readCSV returns the header and the rows of a csv file
+"""
+def readCSV(dataFile):
+
+	with open(dataFile, newline='') as f:
+		lines = list(csv.reader(f))
+
+	return lines[0], lines[1:]
+
+
+@pytest.mark.parametrize('seeds', [[0, 1], [2, 3, 4]])
+def test_mergedRowsAreInTimeOrder(tmp_path, seeds):
+
+	dataFiles = extractSails(tmp_path, seeds)
+	mergedFile = str(tmp_path / 'merged.csv')
+	timeCol = batchExtraction.getMergeColumn(outputList)
+
+	allRows = []
+	for dataFile in dataFiles:
+		header, rows = readCSV(dataFile)
+		allRows += rows
+
+	assert batchExtraction.mergeCSVFiles(dataFiles, mergedFile, timeCol) == len(allRows)
+	mergedHeader, mergedRows = readCSV(mergedFile)
+	assert mergedHeader == header
+	#Sorting is stable : rows logged at the same time stay in the order of the files
+	assert mergedRows == sorted(allRows, key=lambda row: row[timeCol])
+
+	#The sails interleave, the merge isn't only a concatenation
+	assert mergedRows != allRows
+
+
+def test_mergeSkipsEmptyOutputs(tmp_path):
+
+	dataFiles = extractSails(tmp_path, [5])
+	headerOnly = str(tmp_path / 'headerOnly.csv')
+	empty = str(tmp_path / 'empty.csv')
+	with open(headerOnly, 'w') as f:
+		f.write(','.join(['t_timestamp', 'latitude', 'rc_on', 'speed']) + '\n')
+	open(empty, 'w').close()
+
+	mergedFile = str(tmp_path / 'merged.csv')
+	batchExtraction.mergeCSVFiles([empty, headerOnly] + dataFiles, mergedFile, 0)
+
+	assert readCSV(mergedFile) == readCSV(dataFiles[0])
+
+
+def test_extractionIsRenamedOnceComplete(tmp_path):
+
+	dbPath = str(tmp_path / 'asr.db')
+	createDatabase(dbPath, 6)
+	dataFile = str(tmp_path / 'asr.csv')
+
+	database, dataFile, rowsWritten, error = batchExtraction.extractDatabase(dbPath, dataFile, outputList, 50, 0.5, 'timestamp', 'csv', None, None, None)
+
+	assert error is None
+	assert rowsWritten == len(readCSV(dataFile)[1]) > 0
+	assert sorted(os.listdir(tmp_path)) == ['asr.csv', 'asr.db']
+
+
+@pytest.mark.parametrize('columns', [['gps.t_timestamp', 'gps.missing'], ['missing.t_timestamp']])
+def test_failedExtractionLeavesNoFile(tmp_path, columns):
+
+	dbPath = str(tmp_path / 'asr.db')
+	createDatabase(dbPath, 7)
+	dataFile = str(tmp_path / 'asr.csv')
+
+	database, dataFile, rowsWritten, error = batchExtraction.extractDatabase(dbPath, dataFile, columns, 50, 0.5, 'timestamp', 'csv', None, None, None)
+
+	assert error is not None and rowsWritten == 0
+	assert sorted(os.listdir(tmp_path)) == ['asr.db']
+
+
+def test_missingDatabaseIsReported(tmp_path):
+
+	dataFile = str(tmp_path / 'asr.csv')
+	error = batchExtraction.extractDatabase(str(tmp_path / 'missing.db'), dataFile, outputList, 50, 0.5, 'timestamp', 'csv', None, None, None)[3]
+
+	assert error is not None
+	assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('databases, expected', [
+	(['sails/sail1/asr.db', 'sails/sail2/asr.db'], ['sail1.csv', 'sail2.csv']),
+	(['sails/sail1/asr.db'], ['asr.csv']),
+	(['sails/june/sail1/asr.db', 'sails/july/sail1/asr.db'], ['june__sail1.csv', 'july__sail1.csv']),
+	(['sails/sail1.db', 'sails/sail1/asr.db'], ['sail1.db.csv', 'sail1__asr.db.csv']),
+	(['sails/sail1.db', 'sails/sail2.db'], ['sail1.csv', 'sail2.csv']),
+])
+def test_outputNamesFollowFolders(databases, expected):
+
+	names = batchExtraction.createOutputNames(databases, 'out', 'csv')
+
+	assert names == [os.path.join('out', name) for name in expected]
+
+
+def test_outputNameCollisionIsRefused():
+
+	with pytest.raises(ValueError):
+		batchExtraction.createOutputNames(['sails/a__b/asr.db', 'sails/a/b/asr.db'], 'out', 'csv')
+
+
+def test_databasesAreOnlyFoundOnce(tmp_path):
+
+	os.makedirs(tmp_path / 'sail1')
+	for path in ('sail1/asr.db', 'sail2.db', 'notes.txt'):
+		(tmp_path / path).write_text('')
+
+	databases = batchExtraction.findDatabases([str(tmp_path), str(tmp_path / 'sail1' / 'asr.db'), str(tmp_path / '*.db')])
+
+	assert databases == sorted([os.path.realpath(tmp_path / 'sail1' / 'asr.db'), os.path.realpath(tmp_path / 'sail2.db')])
+
+
+@pytest.mark.parametrize('columns, expected', [
+	(['gps.t_timestamp', 'wind.speed'], 0),
+	(['gps.latitude', 'wind.t_timestamp', 'gps.t_timestamp'], 2),
+	(['gps.latitude', 'wind.t_timestamp'], None),
+])
+def test_mergeColumnIsThePrimaryTimestamp(columns, expected):
+
+	assert batchExtraction.getMergeColumn(columns) == expected
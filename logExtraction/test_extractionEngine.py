@@ -0,0 +1,306 @@
+import io
+import csv
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import extractionEngine
+
+"""
+Tests of extractionEngine.py, run with : python3 -m pytest
+Tables are written to small databases, the extracted rows are checked against the same rows filtered and matched by brute force in Python
+"""
+
+startTime = datetime(2018, 6, 28, 7, 0, 0)
+
+
+"""
+createDatabase writes a primary table (gps) and a secondary table (wind) to dbPath and returns their rows, in id order
+
+gps has logger duplicates (same t_timestamp and values), several different rows at the same t_timestamp, null data (-2000) and empty values
+wind is logged 7 ms off a 10 ms grid, so it is never exactly tolerance away from a gps row nor at the same distance from two gps rows
+"""
+def createDatabase(dbPath, seed, numberOfRows=600):
+
+	rng = np.random.default_rng(seed)
+	gpsRows, windRows = [], []
+
+	milliseconds = 0
+	for n in range(numberOfRows):
+		if gpsRows and rng.random() < 0.1:
+			gpsRows.append(dict(gpsRows[-1], id=n + 1))
+			continue
+		milliseconds += int(rng.choice([0, 200, 1000, 1000, 3000]))
+		gpsRows.append({'id': n + 1, 't_timestamp': formatTime(milliseconds),
+		                'latitude': -2000.0 if rng.random() < 0.05 else round(60.1 + rng.normal(0, 1e-3), 6),
+		                'longitude': round(19.9 + rng.normal(0, 1e-3), 6),
+		                'rc_on': None if rng.random() < 0.05 else int(rng.integers(0, 2))})
+
+	milliseconds = 7
+	for n in range(numberOfRows // 2):
+		milliseconds += 10 * int(rng.integers(1, 300))
+		windRows.append({'id': n + 1, 't_timestamp': formatTime(milliseconds),
+		                 'speed': -2000.0 if rng.random() < 0.05 else round(float(rng.uniform(0, 15)), 2),
+		                 'direction': round(float(rng.uniform(0, 360)), 1)})
+
+	conn = sqlite3.connect(dbPath)
+	conn.execute('CREATE TABLE gps (id INTEGER PRIMARY KEY, t_timestamp TEXT, latitude REAL, longitude REAL, rc_on INTEGER)')
+	conn.execute('CREATE TABLE wind (id INTEGER PRIMARY KEY, t_timestamp TEXT, speed REAL, direction REAL)')
+	conn.executemany('INSERT INTO gps VALUES (:id, :t_timestamp, :latitude, :longitude, :rc_on)', gpsRows)
+	conn.executemany('INSERT INTO wind VALUES (:id, :t_timestamp, :speed, :direction)', windRows)
+	conn.commit()
+	conn.close()
+
+	return {'gps': gpsRows, 'wind': windRows}
+
+
+"""
+formatTime returns the t_timestamp milliseconds after startTime
+"""
+def formatTime(milliseconds):
+
+	return (startTime + timedelta(milliseconds=milliseconds)).strftime('%Y-%m-%d_%H:%M:%S.%f')[:-3]
+
+
+"""
+toMilliseconds returns the time of a t_timestamp in milliseconds after startTime
+"""
+def toMilliseconds(timestamp):
+
+	return round((datetime.fromisoformat(timestamp.replace('_', ' ')) - startTime) / timedelta(milliseconds=1))
+
+
+"""
+referenceTableRows returns the rows of a table an extraction keeps, in time order
+
+Rows holding -2000 in a selected column are dropped, with the 'timestamp' dedupe so is every row but the first of rows sharing t_timestamp and selected values
+"""
+def referenceTableRows(rows, columns, dedupe='timestamp'):
+
+	firstIds = {}
+	for row in rows:
+		firstIds.setdefault(tuple(row[column] for column in ['t_timestamp'] + columns), row['id'])
+
+	kept = [row for row in rows if all(row[column] != extractionEngine.nullValue for column in columns)]
+	if dedupe == 'timestamp':
+		kept = [row for row in kept if firstIds[tuple(row[column] for column in ['t_timestamp'] + columns)] == row['id']]
+
+	return sorted(kept, key=lambda row: (row['t_timestamp'], row['id']))
+
+
+"""
+referenceMergeJoin matches every kept gps row with the closest kept wind row, compared with every one of them
+"""
+def referenceMergeJoin(tableRows, outputList, tolerance, dedupe='timestamp'):
+
+	tableColumns = extractionEngine.groupColumnsByTable(outputList)
+	gpsRows = referenceTableRows(tableRows['gps'], tableColumns['gps'], dedupe)
+	windRows = referenceTableRows(tableRows['wind'], tableColumns.get('wind', []), dedupe)
+
+	result = []
+	for gpsRow in gpsRows:
+		time = toMilliseconds(gpsRow['t_timestamp'])
+		distances = [abs(toMilliseconds(windRow['t_timestamp']) - time) for windRow in windRows]
+		closest = windRows[int(np.argmin(distances))] if distances and min(distances) <= tolerance * 1000 else {}
+		result.append(tuple((gpsRow if table == 'gps' else closest).get(column) for table, column in (item.split('.') for item in outputList)))
+
+	return result
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('tolerance', [0.05, 0.5, 2.0])
+@pytest.mark.parametrize('dedupe', ['timestamp', 'none'])
+def test_mergeJoinMatchesClosestRow(tmp_path, seed, tolerance, dedupe):
+
+	dbPath = str(tmp_path / 'asr.db')
+	tableRows = createDatabase(dbPath, seed)
+	outputList = ['gps.t_timestamp', 'wind.speed', 'gps.latitude', 'gps.rc_on', 'wind.t_timestamp', 'wind.direction']
+
+	conn = extractionEngine.connectDatabase(dbPath, readOnly=True)
+	try:
+		rows = list(extractionEngine.mergeJoin(conn, outputList, tolerance, batchSize=7, dedupe=dedupe))
+	finally:
+		conn.close()
+
+	expected = referenceMergeJoin(tableRows, outputList, tolerance, dedupe)
+	assert rows == expected
+	assert any(row[1] is None for row in expected) and any(row[1] is not None for row in expected)
+
+
+def test_nearestMatcherKeepsPreviousRowOnTie():
+
+	matcher = extractionEngine.NearestMatcher(iter([(1.0, 'a'), (2.0, 'b'), (4.0, 'c')]), 0.5)
+
+	assert [matcher.match(time) for time in (0.4, 1.5, 2.2, 3.0, 4.5, 9.0)] == [None, ('a',), ('b',), None, ('c',), None]
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('columns', [['latitude'], ['latitude', 'rc_on'], ['longitude']])
+@pytest.mark.parametrize('dedupe', ['timestamp', 'none'])
+def test_tableExpressionFiltersNullDataAndDuplicates(tmp_path, seed, columns, dedupe):
+
+	dbPath = str(tmp_path / 'asr.db')
+	tableRows = createDatabase(dbPath, seed)
+
+	conn = extractionEngine.connectDatabase(dbPath)
+	try:
+		rows = conn.execute(extractionEngine.createTableExpression('gps', columns, dedupe)).fetchall()
+	finally:
+		conn.close()
+
+	expected = referenceTableRows(tableRows['gps'], columns, dedupe)
+	assert [row[1:] for row in rows] == [tuple(row[column] for column in columns) for row in expected]
+	assert [round(row[0] * 1000) for row in rows] == [toMilliseconds(row['t_timestamp']) + round((startTime - datetime(1970, 1, 1)) / timedelta(milliseconds=1)) for row in expected]
+	if dedupe == 'timestamp':
+		assert len(rows) < len([row for row in tableRows['gps'] if all(row[column] != extractionEngine.nullValue for column in columns)])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_consecutiveDedupeDropsRepeatedOutputRows(tmp_path, seed):
+
+	dbPath = str(tmp_path / 'asr.db')
+	tableRows = createDatabase(dbPath, seed)
+	outputList = ['gps.t_timestamp', 'gps.rc_on', 'wind.direction']
+
+	conn = extractionEngine.connectDatabase(dbPath)
+	try:
+		dataFile, rowsWritten = extractionEngine.extractToFile(conn, outputList, str(tmp_path / 'out.csv'), batchSize=11, dedupe='consecutive')
+	finally:
+		conn.close()
+
+	allRows = referenceMergeJoin(tableRows, outputList, extractionEngine.timeTolerance, 'none')
+	expected = [row for n, row in enumerate(allRows) if n == 0 or row != allRows[n - 1]]
+	expectedText = io.StringIO()
+	csv.writer(expectedText, lineterminator='\n').writerows([['t_timestamp', 'rc_on', 'direction']] + expected)
+	with open(dataFile) as f:
+		assert f.read() == expectedText.getvalue()
+	assert rowsWritten == len(expected)
+	assert len(expected) < len(allRows)
+
+
+"""
+createCompassTable adds a compass table to dbPath, logged 3 ms off a 10 ms grid so no row is ever on a bucket limit, and returns its rows
+heading turns round north several times, calibrated is an integer column
+"""
+def createCompassTable(dbPath, seed, numberOfRows=400):
+
+	rng = np.random.default_rng(seed)
+	milliseconds = np.cumsum(10 * rng.integers(1, 80, numberOfRows)) + 3
+	headings = np.cumsum(rng.normal(0, 15, numberOfRows)) % 360
+	rows = [{'id': n + 1, 't_timestamp': formatTime(int(milliseconds[n])), 'heading': round(float(headings[n]), 1),
+	         'pitch': -2000.0 if rng.random() < 0.03 else round(float(rng.normal(0, 5)), 2), 'calibrated': int(rng.integers(0, 3))} for n in range(numberOfRows)]
+
+	conn = sqlite3.connect(dbPath)
+	conn.execute('CREATE TABLE compass (id INTEGER PRIMARY KEY, t_timestamp TEXT, heading REAL, pitch REAL, calibrated INTEGER)')
+	conn.executemany('INSERT INTO compass VALUES (:id, :t_timestamp, :heading, :pitch, :calibrated)', rows)
+	conn.commit()
+	conn.close()
+
+	return rows
+
+
+"""
+referenceBuckets groups rows by bucket of bucketSeconds, averaging averagedColumns (mean) or taking the last row of each bucket (last)
+"""
+def referenceBuckets(rows, columns, bucketSeconds, aggregate, averagedColumns=()):
+
+	epoch = round((startTime - datetime(1970, 1, 1)) / timedelta(milliseconds=1))
+	buckets = {}
+	for row in rows:
+		buckets.setdefault((epoch + toMilliseconds(row['t_timestamp'])) // round(bucketSeconds * 1000), []).append(row)
+
+	result = []
+	for bucket, bucketRows in sorted(buckets.items()):
+		chosen = bucketRows[0] if aggregate == 'mean' else bucketRows[-1]
+		values = [np.mean([row[column] for row in bucketRows]) if aggregate == 'mean' and column in averagedColumns else chosen[column] for column in columns]
+		result.append([bucket * bucketSeconds] + values)
+
+	return result
+
+
+def executeExpression(dbPath, expression):
+
+	conn = extractionEngine.connectDatabase(dbPath)
+	try:
+		return conn.execute(expression).fetchall()
+	finally:
+		conn.close()
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('bucketSeconds', [1.0, 2.5, 60.0])
+@pytest.mark.parametrize('aggregate', ['mean', 'last'])
+def test_bucketsMatchGroupedRows(tmp_path, seed, bucketSeconds, aggregate):
+
+	dbPath = str(tmp_path / 'asr.db')
+	columns = ['heading', 'pitch', 'calibrated']
+	rows = referenceTableRows(createCompassTable(dbPath, seed), columns)
+	expression = extractionEngine.createTableExpression('compass', columns, downsample=('bucket', bucketSeconds, aggregate), averagedColumns=['pitch'])
+
+	result = executeExpression(dbPath, expression)
+	expected = referenceBuckets(rows, columns, bucketSeconds, aggregate, ['pitch'])
+	assert len(result) == len(expected)
+	for row, expectedRow in zip(result, expected):
+		assert row[0] == pytest.approx(expectedRow[0]) and row[1] == expectedRow[1] and row[3] == expectedRow[3]
+		assert row[2] == pytest.approx(expectedRow[2])
+
+
+def test_bucketsDontAverageAngles(tmp_path):
+
+	dbPath = str(tmp_path / 'asr.db')
+	rows = referenceTableRows(createCompassTable(dbPath, 0), ['heading', 'pitch'])
+	outputList = ['compass.t_timestamp', 'compass.heading', 'compass.pitch']
+
+	conn = extractionEngine.connectDatabase(dbPath)
+	try:
+		result = list(extractionEngine.mergeJoin(conn, outputList, downsample=('bucket', 10.0, 'mean')))
+	finally:
+		conn.close()
+
+	expected = referenceBuckets(rows, ['t_timestamp', 'heading', 'pitch'], 10.0, 'mean', ['pitch'])
+	assert [list(row[:2]) for row in result] == [row[1:3] for row in expected]
+	assert np.allclose([row[2] for row in result], [row[3] for row in expected])
+	assert extractionEngine.isCircularColumn('wind_direction') and extractionEngine.isCircularColumn('Heading') and not extractionEngine.isCircularColumn('pitch')
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('every', [1, 2, 7, 1000])
+def test_everyKeepsOneRowOutOfN(tmp_path, seed, every):
+
+	dbPath = str(tmp_path / 'asr.db')
+	tableRows = createDatabase(dbPath, seed)
+	outputList = ['gps.t_timestamp', 'gps.latitude', 'wind.speed']
+
+	conn = extractionEngine.connectDatabase(dbPath)
+	try:
+		result = list(extractionEngine.mergeJoin(conn, outputList, downsample=('every', every)))
+	finally:
+		conn.close()
+
+	#Only the primary table is thinned, its rows are still matched with every wind row
+	assert result == referenceMergeJoin(tableRows, outputList, extractionEngine.timeTolerance)[::every]
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('fromMilliseconds, toMilliseconds', [(0, 10 ** 9), (60000, 200000), (120000, None), (None, 90500)])
+def test_timeBoundsLimitEveryTable(tmp_path, seed, fromMilliseconds, toMilliseconds):
+
+	dbPath = str(tmp_path / 'asr.db')
+	tableRows = createDatabase(dbPath, seed)
+	outputList = ['gps.t_timestamp', 'gps.latitude', 'wind.t_timestamp', 'wind.speed']
+	fromTimestamp = formatTime(fromMilliseconds) if fromMilliseconds is not None else None
+	toTimestamp = formatTime(toMilliseconds) if toMilliseconds is not None else None
+
+	conn = extractionEngine.connectDatabase(dbPath)
+	try:
+		result = list(extractionEngine.mergeJoin(conn, outputList, fromTimestamp=fromTimestamp, toTimestamp=toTimestamp))
+	finally:
+		conn.close()
+
+	#Rows outside the range are neither exported nor matched
+	boundedRows = {table: [row for row in rows if (fromTimestamp is None or row['t_timestamp'] >= fromTimestamp) and (toTimestamp is None or row['t_timestamp'] <= toTimestamp)]
+	               for table, rows in tableRows.items()}
+	assert result == referenceMergeJoin(boundedRows, outputList, extractionEngine.timeTolerance)
+	assert len(result) < len(referenceMergeJoin(tableRows, outputList, extractionEngine.timeTolerance)) or fromMilliseconds == 0
@@ -0,0 +1,121 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+import extractionEngine
+import incrementalExtraction
+from test_extractionEngine import createDatabase, toMilliseconds
+
+"""
+Tests of incrementalExtraction.py, run with : python3 -m pytest
+The logger is replayed by copying the rows of a full database into a growing one, with an incremental run after each copy
+Once all rows are copied, the output must be the same as a single extraction of the full database
+"""
+
+
+"""
+getCuts returns the gps ids after which incremental runs are made, some of them just before a logger duplicate of the last exported row
+"""
+def getCuts(tableRows, seed):
+
+	gpsRows = tableRows['gps']
+	duplicates = [n for n in range(1, len(gpsRows)) if {**gpsRows[n], 'id': 0} == {**gpsRows[n - 1], 'id': 0}]
+	randomCuts = np.random.default_rng(seed).integers(1, len(gpsRows), 8).tolist()
+
+	return sorted(set(randomCuts + duplicates[:4] + [len(gpsRows)]))
+
+
+"""
+copyRows copies the gps rows up to lastId into the growing database, and the wind rows logged up to windLag milliseconds before the last of them
+"""
+def copyRows(conn, tableRows, lastId, windLag):
+
+	lastTime = toMilliseconds(tableRows['gps'][lastId - 1]['t_timestamp']) - windLag
+	conn.execute('INSERT OR IGNORE INTO gps SELECT * FROM full.gps WHERE id <= ?', (lastId,))
+	conn.executemany('INSERT OR IGNORE INTO wind VALUES (:id, :t_timestamp, :speed, :direction)',
+	                 [row for row in tableRows['wind'] if toMilliseconds(row['t_timestamp']) <= lastTime])
+	conn.commit()
+
+
+#Wind rows are copied ahead of the gps rows, or lagging them : gps rows exported before their closest wind row is logged would be matched wrongly
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('dedupe', extractionEngine.dedupeModes)
+@pytest.mark.parametrize('windLag', [-1000, 300, 1500, 20000])
+def test_incrementalRunsMatchSingleExtraction(tmp_path, seed, dedupe, windLag):
+
+	fullPath, growingPath = str(tmp_path / 'full.db'), str(tmp_path / 'asr.db')
+	tableRows = createDatabase(fullPath, seed)
+	outputList = ['gps.t_timestamp', 'gps.latitude', 'gps.rc_on', 'wind.speed']
+	dataFile = str(tmp_path / 'incremental.csv')
+
+	conn = sqlite3.connect(growingPath)
+	conn.execute('CREATE TABLE gps (id INTEGER PRIMARY KEY, t_timestamp TEXT, latitude REAL, longitude REAL, rc_on INTEGER)')
+	conn.execute('CREATE TABLE wind (id INTEGER PRIMARY KEY, t_timestamp TEXT, speed REAL, direction REAL)')
+	conn.execute('ATTACH DATABASE ? AS full', (fullPath,))
+	try:
+		for lastId in getCuts(tableRows, seed):
+			copyRows(conn, tableRows, lastId, windLag)
+			incrementalExtraction.extractIncremental(conn, outputList, dataFile, batchSize=13, dedupe=dedupe)
+			state = incrementalExtraction.loadState(incrementalExtraction.defaultStateFile(dataFile))
+			assert state['tables']['gps']['id'] is None or state['tables']['gps']['id'] <= lastId
+
+		#Logging over : the last run writes the rows held back, then there is nothing left
+		copyRows(conn, tableRows, len(tableRows['gps']), -10 ** 9)
+		incrementalExtraction.extractIncremental(conn, outputList, dataFile, dedupe=dedupe, final=True)
+		state = incrementalExtraction.loadState(incrementalExtraction.defaultStateFile(dataFile))
+		assert state['tables']['gps'] == {'id': len(tableRows['gps']), 't_timestamp': tableRows['gps'][-1]['t_timestamp']}
+		assert incrementalExtraction.extractIncremental(conn, outputList, dataFile, dedupe=dedupe) == 0
+	finally:
+		conn.close()
+
+	conn = extractionEngine.connectDatabase(fullPath)
+	try:
+		singleFile, rowsWritten = extractionEngine.extractToFile(conn, outputList, str(tmp_path / 'single.csv'), dedupe=dedupe)
+	finally:
+		conn.close()
+
+	with open(dataFile) as incremental, open(singleFile) as single:
+		assert incremental.read() == single.read()
+
+
+def test_stateOfOtherColumnsIsRefused(tmp_path):
+
+	dbPath = str(tmp_path / 'asr.db')
+	createDatabase(dbPath, 0, numberOfRows=50)
+	dataFile = str(tmp_path / 'out.csv')
+
+	conn = extractionEngine.connectDatabase(dbPath)
+	try:
+		incrementalExtraction.extractIncremental(conn, ['gps.t_timestamp', 'gps.latitude'], dataFile)
+		with pytest.raises(ValueError):
+			incrementalExtraction.extractIncremental(conn, ['gps.t_timestamp', 'gps.longitude'], dataFile)
+	finally:
+		conn.close()
+
+
+def test_rowsCloseToTheNewestWindRowAreHeldBack(tmp_path):
+
+	dbPath = str(tmp_path / 'asr.db')
+	conn = sqlite3.connect(dbPath)
+	conn.execute('CREATE TABLE gps (id INTEGER PRIMARY KEY, t_timestamp TEXT, latitude REAL)')
+	conn.execute('CREATE TABLE wind (id INTEGER PRIMARY KEY, t_timestamp TEXT, speed REAL)')
+	conn.executemany('INSERT INTO gps (t_timestamp, latitude) VALUES (?, ?)', [('2018-06-28_07:00:0{0}.000'.format(n), 60.0 + n) for n in range(6)])
+	conn.executemany('INSERT INTO wind (t_timestamp, speed) VALUES (?, ?)', [('2018-06-28_07:00:00.100', 1.0), ('2018-06-28_07:00:02.400', 2.0)])
+	conn.commit()
+	dataFile = str(tmp_path / 'out.csv')
+	outputList = ['gps.t_timestamp', 'wind.speed']
+
+	try:
+		#07:00:02.000 is within 0.5 s of the newest wind row, a closer one may still come
+		assert incrementalExtraction.extractIncremental(conn, outputList, dataFile) == 2
+		conn.execute("INSERT INTO wind (t_timestamp, speed) VALUES ('2018-06-28_07:00:02.050', 3.0)")
+		conn.commit()
+		assert incrementalExtraction.extractIncremental(conn, outputList, dataFile) == 0
+		assert incrementalExtraction.extractIncremental(conn, outputList, dataFile, final=True) == 4
+	finally:
+		conn.close()
+
+	with open(dataFile) as f:
+		assert f.read().splitlines()[1:] == ['2018-06-28_07:00:00.000,1.0', '2018-06-28_07:00:01.000,', '2018-06-28_07:00:02.000,3.0',
+		                                     '2018-06-28_07:00:03.000,', '2018-06-28_07:00:04.000,', '2018-06-28_07:00:05.000,']
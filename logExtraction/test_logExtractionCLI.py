@@ -0,0 +1,186 @@
+import os
+import sys
+import sqlite3
+import subprocess
+
+import pytest
+
+import extractionEngine
+import logExtractionCLI
+from test_extractionEngine import createDatabase
+
+"""
+Tests of logExtractionCLI.py, run with : python3 -m pytest
+Arguments are checked by calling getArguments, whole runs start the script in its own process like cron would
+"""
+
+cliScript = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logExtractionCLI.py')
+outputList = ['dataLogs_gps.t_timestamp', 'dataLogs_gps.latitude', 'dataLogs_wind.speed']
+
+
+"""
+createLogDatabase writes the test database with its tables named like ASPire's (dataLogs_gps and dataLogs_wind)
+"""
+def createLogDatabase(dbPath, seed):
+
+	tableRows = createDatabase(dbPath, seed)
+
+	conn = sqlite3.connect(dbPath)
+	conn.execute('ALTER TABLE gps RENAME TO dataLogs_gps')
+	conn.execute('ALTER TABLE wind RENAME TO dataLogs_wind')
+	conn.commit()
+	conn.close()
+
+	return tableRows
+
+
+"""
+runCLI runs logExtractionCLI.py with arguments in tmp_path and returns the finished process
+"""
+def runCLI(tmp_path, *arguments):
+
+	return subprocess.run([sys.executable, cliScript] + [str(argument) for argument in arguments], cwd=str(tmp_path), capture_output=True, text=True)
+
+
+"""
+parseArguments calls getArguments with arguments as the command line
+"""
+def parseArguments(monkeypatch, *arguments):
+
+	monkeypatch.setattr(sys, 'argv', ['logExtractionCLI.py'] + [str(argument) for argument in arguments])
+
+	return logExtractionCLI.getArguments()
+
+
+@pytest.fixture
+def database(tmp_path):
+
+	dbPath = tmp_path / 'asr.db'
+	createLogDatabase(dbPath, 0)
+
+	return dbPath
+
+
+def test_columnsAndSpecFileAreMerged(tmp_path, monkeypatch, database):
+
+	specFile = tmp_path / 'columns.txt'
+	specFile.write_text('# Position\ndataLogs_gps.t_timestamp\n\n  dataLogs_gps.latitude  \ndataLogs_wind.speed\n')
+
+	args, columns = parseArguments(monkeypatch, database, '-s', specFile, '-c', 'dataLogs_gps.latitude', 'dataLogs_wind.direction')
+
+	assert columns == outputList + ['dataLogs_wind.direction']
+	assert args.downsample is None and not args.incremental
+
+
+@pytest.mark.parametrize('arguments, downsample', [
+	(['--every', '10'], ('every', 10)),
+	(['--bucket', '2.5'], ('bucket', 2.5, 'mean')),
+	(['--bucket', '60', '--aggregate', 'last'], ('bucket', 60.0, 'last')),
+])
+def test_downsampleArguments(monkeypatch, database, arguments, downsample):
+
+	args, columns = parseArguments(monkeypatch, database, '-c', *outputList, *arguments)
+
+	assert args.downsample == downsample
+
+
+def test_timeBoundsAreNormalized(monkeypatch, database):
+
+	args, columns = parseArguments(monkeypatch, database, '-c', *outputList, '--start', '2018-06-28 07:30', '--end', '2018-06-28_08:15:00.5')
+
+	assert (args.start, args.end) == ('2018-06-28_07:30:00.000', '2018-06-28_08:15:00.500')
+
+
+@pytest.mark.parametrize('arguments', [
+	[],
+	['-c', 'dataLogs_gps'],
+	['-c', 'dataLogs_gps.latitude.x'],
+	['-c', 'dataLogs_gps.latitude', '-b', '0'],
+	['-c', 'dataLogs_gps.latitude', '-t', '-1'],
+	['-c', 'dataLogs_gps.latitude', '--every', '0'],
+	['-c', 'dataLogs_gps.latitude', '--bucket', '0'],
+	['-c', 'dataLogs_gps.latitude', '--every', '2', '--bucket', '1'],
+	['-c', 'dataLogs_gps.latitude', '-f', 'xlsx'],
+	['-c', 'dataLogs_gps.latitude', '-s', 'missing.txt'],
+	['-c', 'dataLogs_gps.latitude', '-i'],
+	['-c', 'dataLogs_gps.latitude', '-i', '-o', 'out.npz', '-f', 'npz'],
+	['-c', 'dataLogs_gps.latitude', '-i', '-o', 'out.csv', '--every', '2'],
+	['-c', 'dataLogs_gps.latitude', '-i', '-o', 'out.csv', '--start', '2018-06-28 07:30'],
+	['-c', 'dataLogs_gps.latitude', '-o', 'out.csv', '--final'],
+])
+def test_invalidArgumentsExit(tmp_path, monkeypatch, database, arguments):
+
+	monkeypatch.chdir(tmp_path)
+
+	with pytest.raises(SystemExit) as exit:
+		parseArguments(monkeypatch, database, *arguments)
+	assert exit.value.code not in (0, None)
+
+
+def test_missingDatabaseExits(tmp_path, monkeypatch):
+
+	with pytest.raises(SystemExit):
+		parseArguments(monkeypatch, tmp_path / 'missing.db', '-c', *outputList)
+
+
+@pytest.mark.parametrize('arguments, engineArguments', [
+	([], {}),
+	(['-b', '7', '-t', '2', '-d', 'none'], {'batchSize': 7, 'tolerance': 2.0, 'dedupe': 'none'}),
+	(['--every', '3', '--start', '2018-06-28 07:01', '--end', '2018-06-28 07:05'],
+	 {'downsample': ('every', 3), 'fromTimestamp': '2018-06-28_07:01:00.000', 'toTimestamp': '2018-06-28_07:05:00.000'}),
+	(['--bucket', '5', '--aggregate', 'last'], {'downsample': ('bucket', 5.0, 'last')}),
+])
+def test_exportMatchesExtractionEngine(tmp_path, database, arguments, engineArguments):
+
+	process = runCLI(tmp_path, database, '-c', *outputList, '-o', 'cli.csv', *arguments)
+	assert process.returncode == 0, process.stderr
+
+	conn = extractionEngine.connectDatabase(database, readOnly=True)
+	try:
+		dataFile, rowsWritten = extractionEngine.extractToFile(conn, outputList, str(tmp_path / 'engine.csv'), **engineArguments)
+	finally:
+		conn.close()
+
+	assert (tmp_path / 'cli.csv').read_text() == (tmp_path / 'engine.csv').read_text()
+	assert process.stdout.strip() == 'Exported {0} rows to cli.csv'.format(rowsWritten)
+
+
+def test_unknownColumnIsReported(tmp_path, database):
+
+	process = runCLI(tmp_path, database, '-c', 'dataLogs_gps.t_timestamp', 'dataLogs_gps.heading', '-o', 'cli.csv')
+
+	assert process.returncode != 0
+	assert 'dataLogs_gps.heading' in process.stderr
+	assert not (tmp_path / 'cli.csv').exists()
+
+
+def test_listPrintsTables(tmp_path, database):
+
+	tableRows = createLogDatabase(tmp_path / 'other.db', 1)
+	process = runCLI(tmp_path, tmp_path / 'other.db', '--list')
+
+	assert process.returncode == 0, process.stderr
+	lines = process.stdout.splitlines()
+	assert lines[0] == 'dataLogs_gps : {0} rows from {1} to {2}'.format(len(tableRows['gps']), tableRows['gps'][0]['t_timestamp'], tableRows['gps'][-1]['t_timestamp'])
+	assert '\tlatitude REAL' in lines
+	assert any(line.startswith('dataLogs_wind : {0} rows'.format(len(tableRows['wind']))) for line in lines)
+
+
+def test_incrementalRunsOnlyAppendNewRows(tmp_path, database):
+
+	arguments = [database, '-c', *outputList, '-o', 'cli.csv', '-i']
+	first = runCLI(tmp_path, *arguments)
+	assert first.returncode == 0, first.stderr
+	assert (tmp_path / 'cli.csv.state.json').is_file()
+
+	final = runCLI(tmp_path, *arguments, '--final')
+	again = runCLI(tmp_path, *arguments)
+	assert final.returncode == again.returncode == 0
+	assert again.stdout.strip() == 'Exported 0 rows to cli.csv'
+
+	conn = extractionEngine.connectDatabase(database, readOnly=True)
+	try:
+		extractionEngine.extractToFile(conn, outputList, str(tmp_path / 'engine.csv'))
+	finally:
+		conn.close()
+	assert (tmp_path / 'cli.csv').read_text() == (tmp_path / 'engine.csv').read_text()
@@ -0,0 +1,169 @@
+import csv
+import sqlite3
+
+import numpy as np
+import pytest
+
+import extractionEngine
+import outputFormats
+from test_extractionEngine import createDatabase
+
+"""
+Tests of outputFormats.py, run with : python3 -m pytest
+The same query is exported to every format, typed outputs are read back and compared with the csv file
+"""
+
+#Both tables have t_timestamp and id, rc_on has empty values, wind rows are missing where no wind row is within tolerance
+outputList = ['gps.t_timestamp', 'gps.id', 'gps.latitude', 'gps.rc_on', 'gps.note', 'wind.t_timestamp', 'wind.id', 'wind.speed']
+outputKinds = ['timestamp', 'int', 'float', 'int', 'text', 'timestamp', 'int', 'float']
+
+
+"""
+createTextDatabase writes the test database with a text column (note) added to gps, empty on most rows
+"""
+def createTextDatabase(dbPath, seed):
+
+	createDatabase(dbPath, seed)
+
+	conn = sqlite3.connect(dbPath)
+	conn.execute('ALTER TABLE gps ADD COLUMN note TEXT')
+	conn.execute('UPDATE gps SET note = \'tack \' || id WHERE id % 7 = 0')
+	conn.execute('UPDATE gps SET note = \'\' WHERE id % 11 = 0')
+	conn.commit()
+	conn.close()
+
+
+"""
+extract exports outputList from dbPath to dataFile, in batches of batchSize rows
+"""
+def extract(dbPath, dataFile, outputFormat, batchSize, fromTimestamp=None):
+
+	conn = extractionEngine.connectDatabase(dbPath, readOnly=True)
+	try:
+		return extractionEngine.extractToFile(conn, outputList, str(dataFile), batchSize, outputFormat=outputFormat, fromTimestamp=fromTimestamp)[1]
+	finally:
+		conn.close()
+
+
+"""
+readCSVColumns returns the header and the values of each column of a csv output, converted to the column's kind (None if empty)
+"""
+def readCSVColumns(dataFile, columnKinds):
+
+	with open(dataFile, newline='') as f:
+		lines = list(csv.reader(f))
+
+	convert = {'timestamp': outputFormats.parseTimestamp, 'int': int, 'float': float, 'text': str}
+	columns = []
+	for n, kind in enumerate(columnKinds):
+		columns.append([None if line[n] == '' else convert[kind](line[n]) for line in lines[1:]])
+
+	return lines[0], columns
+
+
+"""
+toValues converts a column read back from a typed output to the same values as readCSVColumns (NaN, NaT and '' become None)
+"""
+def toValues(values, kind):
+
+	values = [value.item() if isinstance(value, np.generic) else value for value in values]
+	if kind == 'text':
+		return [None if value in ('', None) else value for value in values]
+	if kind == 'int':
+		return [None if value is None or value != value else int(value) for value in values]
+
+	return [None if value is None or value != value else value for value in values]
+
+
+@pytest.fixture
+def database(tmp_path):
+
+	dbPath = tmp_path / 'asr.db'
+	createTextDatabase(dbPath, 0)
+
+	return dbPath
+
+
+def test_columnKindsFollowDeclaredTypes(database):
+
+	conn = sqlite3.connect(database)
+	try:
+		columnKinds = extractionEngine.getColumnKinds(conn, outputList)
+	finally:
+		conn.close()
+
+	assert columnKinds == outputKinds
+
+
+@pytest.mark.parametrize('batchSize', [1, 37, 100000])
+def test_npzMatchesCSV(tmp_path, database, batchSize):
+
+	rowsWritten = extract(database, tmp_path / 'out.csv', 'csv', batchSize)
+	assert extract(database, tmp_path / 'out.npz', 'npz', batchSize) == rowsWritten
+
+	header, csvColumns = readCSVColumns(tmp_path / 'out.csv', outputKinds)
+	assert header == outputFormats.createHeader(outputList)
+	assert None in csvColumns[3] and None in csvColumns[4] and None in csvColumns[5]
+
+	with np.load(tmp_path / 'out.npz') as archive:
+		names = outputFormats.createColumnNames(outputList)
+		assert sorted(archive.files) == sorted(names)
+		arrays = [archive[name] for name in names]
+
+	assert [array.dtype.kind for array in arrays] == ['M', 'i', 'f', 'f', 'U', 'M', 'f', 'f']
+	for array, kind, csvColumn in zip(arrays, outputKinds, csvColumns):
+		assert len(array) == rowsWritten
+		assert toValues(array, kind) == csvColumn
+
+
+@pytest.mark.parametrize('outputFormat', ['feather', 'parquet'])
+@pytest.mark.parametrize('batchSize', [1, 37, 100000])
+def test_arrowFormatsMatchCSV(tmp_path, database, outputFormat, batchSize):
+
+	pa = pytest.importorskip('pyarrow')
+	pq = pytest.importorskip('pyarrow.parquet')
+
+	rowsWritten = extract(database, tmp_path / 'out.csv', 'csv', batchSize)
+	assert extract(database, tmp_path / ('out.' + outputFormat), outputFormat, batchSize) == rowsWritten
+
+	if outputFormat == 'parquet':
+		table = pq.read_table(tmp_path / 'out.parquet')
+	else:
+		with pa.memory_map(str(tmp_path / 'out.feather')) as source:
+			table = pa.ipc.open_file(source).read_all()
+
+	assert table.column_names == outputFormats.createColumnNames(outputList)
+	assert [str(field.type) for field in table.schema] == ['timestamp[ms]', 'int64', 'double', 'int64', 'string', 'timestamp[ms]', 'int64', 'double']
+	assert table.num_rows == rowsWritten
+
+	header, csvColumns = readCSVColumns(tmp_path / 'out.csv', outputKinds)
+	for name, kind, csvColumn in zip(table.column_names, outputKinds, csvColumns):
+		assert toValues(table.column(name).to_pylist(), kind) == csvColumn
+
+
+@pytest.mark.parametrize('outputFormat', outputFormats.outputFormats)
+def test_emptyExtractionWritesEmptyColumns(tmp_path, database, outputFormat):
+
+	if outputFormat in ('feather', 'parquet'):
+		pytest.importorskip('pyarrow')
+
+	dataFile = tmp_path / ('out.' + outputFormat)
+	assert extract(database, dataFile, outputFormat, 50, fromTimestamp='2100-01-01_00:00:00.000') == 0
+
+	if outputFormat == 'csv':
+		assert dataFile.read_text() == ','.join(outputFormats.createHeader(outputList)) + '\n'
+	elif outputFormat == 'npz':
+		with np.load(dataFile) as archive:
+			assert all(len(archive[name]) == 0 for name in archive.files)
+	elif outputFormat == 'parquet':
+		import pyarrow.parquet as pq
+		assert pq.read_table(dataFile).num_rows == 0
+	else:
+		import pyarrow as pa
+		assert pa.ipc.open_file(str(dataFile)).read_all().num_rows == 0
+
+
+def test_typedOutputsCantBeAppended(tmp_path):
+
+	with pytest.raises(ValueError):
+		outputFormats.createWriter('npz', str(tmp_path / 'out.npz'), outputList, ['text'] * len(outputList), append=True)
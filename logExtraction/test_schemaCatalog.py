@@ -0,0 +1,122 @@
+import sqlite3
+
+import pytest
+
+import schemaCatalog
+from test_extractionEngine import createDatabase
+
+"""
+Tests of schemaCatalog.py, run with : python3 -m pytest
+Catalogs are checked against the rows written to small databases, and SchemaCatalog.build is counted to see when the cache is used
+"""
+
+
+"""
+countBuilds replaces SchemaCatalog.build by a wrapper counting its calls, returns the list the calls are appended to
+"""
+def countBuilds(monkeypatch):
+
+	calls = []
+	build = schemaCatalog.SchemaCatalog.build
+
+	def countingBuild(conn):
+		calls.append(conn)
+		return build(conn)
+
+	monkeypatch.setattr(schemaCatalog.SchemaCatalog, 'build', countingBuild)
+
+	return calls
+
+
+"""
+assertDescribes checks that catalog describes the rows of each table
+"""
+def assertDescribes(catalog, tableRows):
+
+	for table, rows in tableRows.items():
+		assert catalog.columns(table) == list(rows[0])
+		assert catalog.tables[table]['rows'] == len(rows)
+		assert catalog.tables[table]['firstTimestamp'] == min(row['t_timestamp'] for row in rows)
+		assert catalog.tables[table]['lastTimestamp'] == max(row['t_timestamp'] for row in rows)
+
+
+def test_catalogIsBuiltOnceAndReused(tmp_path, monkeypatch):
+
+	dbPath = tmp_path / 'asr.db'
+	tableRows = createDatabase(dbPath, 0)
+	builds = countBuilds(monkeypatch)
+
+	catalog = schemaCatalog.loadCatalog(dbPath)
+	assertDescribes(catalog, tableRows)
+	assert len(builds) == 1
+
+	for n in range(3):
+		cachedCatalog = schemaCatalog.loadCatalog(dbPath)
+		assert cachedCatalog.tables == catalog.tables
+	assert len(builds) == 1
+
+
+def test_catalogIsRebuiltWhenTheDatabaseChanges(tmp_path, monkeypatch):
+
+	dbPath = tmp_path / 'asr.db'
+	tableRows = createDatabase(dbPath, 1)
+	builds = countBuilds(monkeypatch)
+	schemaCatalog.loadCatalog(dbPath)
+
+	conn = sqlite3.connect(dbPath)
+	conn.executemany('INSERT INTO wind VALUES (:id, :t_timestamp, :speed, :direction)', [dict(row, id=row['id'] + len(tableRows['wind'])) for row in tableRows['wind']])
+	conn.commit()
+	conn.close()
+	tableRows['wind'] = tableRows['wind'] * 2
+
+	assertDescribes(schemaCatalog.loadCatalog(dbPath), tableRows)
+	assert len(builds) == 2
+
+
+def test_catalogIsRebuiltWhenTheWriteAheadLogChanges(tmp_path, monkeypatch):
+
+	dbPath = tmp_path / 'asr.db'
+	tableRows = createDatabase(dbPath, 2)
+	builds = countBuilds(monkeypatch)
+
+	#The logger keeps its connection open, new rows stay in the write-ahead log
+	loggerConn = sqlite3.connect(dbPath)
+	loggerConn.execute('PRAGMA journal_mode=WAL')
+	loggerConn.execute('PRAGMA wal_autocheckpoint=0')
+	try:
+		assertDescribes(schemaCatalog.loadCatalog(dbPath), tableRows)
+
+		databaseKey = schemaCatalog.databaseKey(dbPath)
+		newRow = dict(tableRows['gps'][-1], id=len(tableRows['gps']) + 1, t_timestamp='2018-06-28_23:00:00.000')
+		loggerConn.execute('INSERT INTO gps VALUES (:id, :t_timestamp, :latitude, :longitude, :rc_on)', newRow)
+		loggerConn.commit()
+		tableRows['gps'].append(newRow)
+		assert schemaCatalog.databaseKey(dbPath)[:2] == databaseKey[:2]
+
+		assertDescribes(schemaCatalog.loadCatalog(dbPath), tableRows)
+		assert len(builds) == 2
+		schemaCatalog.loadCatalog(dbPath)
+		assert len(builds) == 2
+	finally:
+		loggerConn.close()
+
+
+def test_unwritableCacheIsSkipped(tmp_path, monkeypatch):
+
+	dbPath = tmp_path / 'asr.db'
+	tableRows = createDatabase(dbPath, 3)
+	builds = countBuilds(monkeypatch)
+	cacheFile = tmp_path / 'missing' / 'asr.db.catalog.json'
+
+	for n in range(2):
+		assertDescribes(schemaCatalog.loadCatalog(dbPath, cacheFile=cacheFile), tableRows)
+	assert len(builds) == 2
+
+
+@pytest.mark.parametrize('item, expected', [('gps.latitude', True), ('wind.direction', True), ('gps.direction', False), ('compass.heading', False)])
+def test_hasColumn(tmp_path, item, expected):
+
+	dbPath = tmp_path / 'asr.db'
+	createDatabase(dbPath, 4)
+
+	assert schemaCatalog.loadCatalog(dbPath).hasColumn(item) == expected
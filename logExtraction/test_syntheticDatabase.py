@@ -0,0 +1,165 @@
+import os
+import queue
+import random
+import sqlite3
+
+import pytest
+
+import benchmarkExtraction
+import extractionEngine
+import syntheticDatabase
+
+"""
+Tests of syntheticDatabase.py and benchmarkExtraction.py, run with : python3 -m pytest
+Generated databases are read back with plain SQL, benchmark scenarios are run in the test process
+"""
+
+totalRows = 6000
+
+
+"""
+readTables returns the rows (t_timestamp, values...) of every dataLogs table of dbPath, in id order
+"""
+def readTables(dbPath):
+
+	conn = sqlite3.connect(dbPath)
+	try:
+		return {table: conn.execute('SELECT * FROM {0} ORDER BY id'.format(table)).fetchall() for table in syntheticDatabase.tableRates}
+	finally:
+		conn.close()
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+
+	dbPath = str(tmp_path_factory.mktemp('synthetic') / 'synthetic.db')
+	rowCounts = syntheticDatabase.createDatabase(dbPath, totalRows, seed=3)
+
+	return dbPath, rowCounts
+
+
+def test_tablesFollowTheirRates(database):
+
+	dbPath, rowCounts = database
+	tables = readTables(dbPath)
+
+	assert {table: len(rows) for table, rows in tables.items()} == rowCounts
+	#Duplicated rows add a little to the requested size
+	assert totalRows <= sum(rowCounts.values()) < totalRows * 1.02
+	duration = totalRows / sum(syntheticDatabase.tableRates.values())
+	for table, rate in syntheticDatabase.tableRates.items():
+		assert int(duration * rate) <= rowCounts[table] < int(duration * rate) * 1.02
+
+
+def test_rowsLookLikeTheLoggers(database):
+
+	dbPath, rowCounts = database
+
+	duplicates, nullRows = 0, []
+	for table, rows in readTables(dbPath).items():
+		timestamps = [row[1] for row in rows]
+		assert all(extractionEngine.normalizeTimestamp(timestamp) == timestamp for timestamp in timestamps)
+		#Time only goes forward, duplicates repeat the whole row
+		assert all(timestamps[n] <= timestamps[n + 1] for n in range(len(timestamps) - 1))
+		assert all(rows[n][1:] == rows[n + 1][1:] for n in range(len(rows) - 1) if timestamps[n] == timestamps[n + 1])
+		duplicates += sum(timestamps[n] == timestamps[n + 1] for n in range(len(timestamps) - 1))
+		nullRows += [row for row in rows if -2000 in row[2:]]
+
+	#Null data is written in every column at once
+	assert duplicates > 0 and nullRows
+	assert all(set(row[2:]) == {-2000} for row in nullRows)
+
+
+def test_sameSeedGivesTheSameDatabase(tmp_path, database):
+
+	dbPath, rowCounts = database
+	syntheticDatabase.createDatabase(str(tmp_path / 'same.db'), totalRows, seed=3)
+	syntheticDatabase.createDatabase(str(tmp_path / 'other.db'), totalRows, seed=4)
+
+	assert readTables(str(tmp_path / 'same.db')) == readTables(dbPath)
+	assert readTables(str(tmp_path / 'other.db')) != readTables(dbPath)
+
+
+def test_boatOnlyDependsOnTime():
+
+	boat = syntheticDatabase.Boat(random.Random(0), 600)
+
+	for second in (0, 10, 599):
+		assert boat.state(second) == (boat.lats[second], boat.lons[second], boat.speeds[second], boat.courses[second], boat.rcOn[second])
+	for t in (0.25, 123.5, 400.75):
+		lat, lon, speed, course, rcOn = boat.state(t)
+		assert min(boat.lats[int(t)], boat.lats[int(t) + 1]) <= lat <= max(boat.lats[int(t)], boat.lats[int(t) + 1])
+		assert boat.state(t) == boat.state(t)
+	#Before the start and after the end, the boat waits at the ends of its track
+	assert boat.state(-5) == boat.state(0)
+	assert boat.state(10 ** 6)[:2] == (boat.lats[-1], boat.lons[-1])
+	assert set(boat.rcOn) == {0, 1}
+
+
+def test_waypointsAreAlongTheTrack(database):
+
+	dbPath, rowCounts = database
+	conn = sqlite3.connect(dbPath)
+	try:
+		waypoints = conn.execute('SELECT latitude, longitude FROM current_Mission ORDER BY id').fetchall()
+		positions = conn.execute('SELECT latitude, longitude FROM dataLogs_gps WHERE latitude != -2000').fetchall()
+	finally:
+		conn.close()
+
+	assert len(waypoints) == 5
+	for lat, lon in waypoints:
+		assert min((lat - gpsLat) ** 2 + (lon - gpsLon) ** 2 for gpsLat, gpsLon in positions) < 1e-8 #About 10 m
+
+
+@pytest.mark.parametrize('name, outputList, options', benchmarkExtraction.scenarios)
+def test_scenariosReportTheirMeasures(tmp_path, database, name, outputList, options):
+
+	dbPath, rowCounts = database
+	resultQueue = queue.Queue()
+	benchmarkExtraction.runScenario(dbPath, outputList, options, str(tmp_path), resultQueue)
+	result = resultQueue.get_nowait()
+
+	if 'skipped' in result:
+		pytest.skip(result['skipped'])
+	assert 'error' not in result, result['error']
+	assert 0 < result['rows'] <= rowCounts[outputList[0].split('.')[0]]
+	assert result['wallTime'] > 0 and result['rowsPerSecond'] > 0
+	assert result['peakMemory'] >= result['baseMemory'] > 0
+	assert result['outputSize'] > 0
+	#The output is deleted once measured
+	assert os.listdir(tmp_path) == []
+
+
+def test_failedScenarioReportsItsError(tmp_path, database):
+
+	dbPath, rowCounts = database
+	resultQueue = queue.Queue()
+	benchmarkExtraction.runScenario(dbPath, ['dataLogs_gps.t_timestamp', 'dataLogs_gps.missing'], {}, str(tmp_path), resultQueue)
+
+	assert 'missing' in resultQueue.get_nowait()['error']
+	assert os.listdir(tmp_path) == []
+
+
+def test_deadScenarioProcessIsReported():
+
+	class DeadProcess:
+		exitcode = -9
+		def is_alive(self):
+			return False
+
+	assert benchmarkExtraction.getResult(DeadProcess(), queue.Queue()) == {'error': 'process exited with code -9'}
+
+
+def test_preparedDatabaseIsIndexedAndReused(tmp_path):
+
+	dbPath = benchmarkExtraction.prepareDatabase(str(tmp_path), 1000)
+	conn = sqlite3.connect(dbPath)
+	try:
+		assert all(extractionEngine.timestampIndexExists(conn, table) for table in syntheticDatabase.tableRates)
+	finally:
+		conn.close()
+	assert sorted(os.listdir(tmp_path)) == ['synthetic_1000.db']
+
+	modificationTime = os.stat(dbPath).st_mtime_ns
+	assert benchmarkExtraction.prepareDatabase(str(tmp_path), 1000) == dbPath
+	assert os.stat(dbPath).st_mtime_ns == modificationTime